@@ -1,22 +1,53 @@
 import asyncio
-import hashlib
-import hmac
+import contextlib
 import ipaddress
 import json
 import math
 import os
-import secrets
-import socket
 import time
 import uuid
+from datetime import datetime
 
 import aiocoap
 import paho.mqtt.client as mqtt
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-
-from Couches.Backend.db import Measure, Runner, RunnerCredential, RunnerDevice, Session, SessionLocal
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from Couches.Backend.db import (
+    Measure,
+    MeasureRollup,
+    Runner,
+    RunnerCredential,
+    RunnerDevice,
+    Session,
+    SessionLocal,
+    SessionStats,
+    engine,
+    run_db,
+    uuid7,
+)
+from Couches.Backend import export
+from Couches.Backend.cache import TTLCache
+from Couches.Backend.export import after_cursor, encode_cursor, iter_csv, iter_ndjson
+from Couches.Backend.ingest import MqttIngest
+from Couches.Backend.live import LiveHub, iter_sse
+from Couches.Backend.measure_writer import MeasureWriter
+from Couches.Backend.passwords import (
+    KdfPool,
+    KdfSaturated,
+    hash_password as _hash_password,
+    verify_and_rehash,
+)
+from Couches.Backend.partitions import MEASURE_PARTITION_CHECK_S, run_partition_maintenance
+from Couches.Backend.rollups import ROLLUP_RESOLUTIONS_S, pick_resolution, rollup_payload
+from Couches.Backend.session_stats import stats_payload
+from Couches.Backend.track import TrackCache, clip_to_bbox, encode_polyline, tolerance_for_zoom
+from Couches.CoAPServices.resolver import HostResolver
 from Couches.CONF import CONF
+from Couches.Couche3.Codec import encode_sample
 from Couches.Couche3.Validation import Validation
 
 COAP_ROUTEUR_HOST = os.getenv("COAP_ROUTEUR_HOST", "coap-routeur")
@@ -24,7 +55,20 @@ SHARED_KEY = os.getenv("SHARED_KEY", "zolis-key")
 COLLECT_RETRIES = int(os.getenv("COLLECT_RETRIES", "1"))
 COLLECT_DELAY_S = float(os.getenv("COLLECT_DELAY_S", "0.3"))
 COLLECT_TIMEOUT_S = float(os.getenv("COLLECT_TIMEOUT_S", "8.0"))
+COLLECT_COALESCE_S = float(os.getenv("COLLECT_COALESCE_S", "0.25"))
+COLLECT_TARGET_DEVICES = os.getenv("COLLECT_TARGET_DEVICES", "1") == "1"
+COLLECT_MAX_CONCURRENCY = int(os.getenv("COLLECT_MAX_CONCURRENCY", "16"))
+SCHEDULE_INTERVAL_S = float(os.getenv("SCHEDULE_INTERVAL_S", "2.5"))
+SCHEDULE_MIN_INTERVAL_S = float(os.getenv("SCHEDULE_MIN_INTERVAL_S", "0.5"))
+SCHEDULE_ON_SESSION = os.getenv("SCHEDULE_ON_SESSION", "1") == "1"
+SCHEDULE_IDLE_S = float(os.getenv("SCHEDULE_IDLE_S", "0"))
 PASSWORD_MIN_LEN = int(os.getenv("PASSWORD_MIN_LEN", "8"))
+MEASURES_PAGE_MAX = int(os.getenv("MEASURES_PAGE_MAX", "5000"))
+TRACK_DEFAULT_TOLERANCE_M = float(os.getenv("TRACK_DEFAULT_TOLERANCE_M", "2.0"))
+MQTT_ENCODING = os.getenv("MQTT_ENCODING", "cbor")
+MQTT_QOS = int(os.getenv("MQTT_QOS", "0"))
+MQTT_RETAIN_LATEST = os.getenv("MQTT_RETAIN_LATEST", "1") == "1"
+MQTT_LEGACY_TOPICS = os.getenv("MQTT_LEGACY_TOPICS", "0") == "1"
 
 app = FastAPI()
 app.add_middleware(
@@ -33,6 +77,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 latest_data = {
@@ -49,34 +94,26 @@ latest_data = {
 runners = {}
 validator = Validation()
 
+collect_stats = {
+    "requests": 0,
+    "routeur_calls": 0,
+    "coalesced": 0,
+    "session_coalesced": 0,
+    "errors": 0,
+    "slot_waits": 0,
+}
 
-def _normalize_email(email):
-    return (email or "").strip().lower()
-
-
-def _hash_password(password):
-    salt = secrets.token_hex(16)
-    iterations = 200000
-    digest = hashlib.pbkdf2_hmac(
-        "sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations
-    ).hex()
-    return f"pbkdf2_sha256${iterations}${salt}${digest}"
+collect_schedules = {}
+measure_writer = MeasureWriter(engine)
+track_cache = TrackCache()
+read_cache = TTLCache()
+live_hub = LiveHub()
+kdf_pool = KdfPool()
+resolver = HostResolver()
 
 
-def _verify_password(password, encoded):
-    try:
-        algo, iterations, salt, expected = encoded.split("$", 3)
-        if algo != "pbkdf2_sha256":
-            return False
-        digest = hashlib.pbkdf2_hmac(
-            "sha256",
-            password.encode("utf-8"),
-            salt.encode("utf-8"),
-            int(iterations),
-        ).hex()
-        return hmac.compare_digest(digest, expected)
-    except Exception:
-        return False
+def _normalize_email(email):
+    return (email or "").strip().lower()
 
 
 def _normalize_devices(devices):
@@ -138,6 +175,20 @@ def _publish_session_topics(session_id, payload):
         return
 
     now = time.time()
+    latest_payload = dict(payload)
+    latest_payload["ts"] = now
+
+    # One consolidated message per sample; retained so a new subscriber gets
+    # the current state as soon as it subscribes.
+    client.publish(
+        f"/tracking/{session_id}/latest",
+        encode_sample(latest_payload, MQTT_ENCODING),
+        qos=MQTT_QOS,
+        retain=MQTT_RETAIN_LATEST,
+    )
+    if not MQTT_LEGACY_TOPICS:
+        return
+
     gps_payload = {
         "session_id": session_id,
         "lat": payload["gps"]["latitude"],
@@ -156,13 +207,9 @@ def _publish_session_topics(session_id, payload):
         "batterie": payload["batterie"],
         "timestamp": now,
     }
-    latest_payload = dict(payload)
-    latest_payload["ts"] = now
-
-    client.publish(f"/tracking/{session_id}/gps", json.dumps(gps_payload))
-    client.publish(f"/tracking/{session_id}/temperature", json.dumps(temp_payload))
-    client.publish(f"/tracking/{session_id}/battery", json.dumps(batt_payload))
-    client.publish(f"/tracking/{session_id}/latest", json.dumps(latest_payload))
+    client.publish(f"/tracking/{session_id}/gps", json.dumps(gps_payload), qos=MQTT_QOS)
+    client.publish(f"/tracking/{session_id}/temperature", json.dumps(temp_payload), qos=MQTT_QOS)
+    client.publish(f"/tracking/{session_id}/battery", json.dumps(batt_payload), qos=MQTT_QOS)
 
 
 def haversine_m(lat1, lon1, lat2, lon2):
@@ -177,13 +224,6 @@ def haversine_m(lat1, lon1, lat2, lon2):
     return r * c
 
 
-def _resolve_ipv4(host):
-    try:
-        return socket.gethostbyname(host)
-    except Exception:
-        return host
-
-
 def _extract_sensor_values(data):
     lat = data.get("gps", {}).get("latitude")
     lon = data.get("gps", {}).get("longitude")
@@ -206,32 +246,136 @@ def _extract_sensor_values(data):
     return lat, lon, temperature, humidite, pression, batterie
 
 
-async def coap_collect(retries=COLLECT_RETRIES, delay_s=COLLECT_DELAY_S):
-    host = _resolve_ipv4(COAP_ROUTEUR_HOST)
-    protocol = await aiocoap.Context.create_client_context()
+def _idle_coap_clients():
+    clients = getattr(app.state, "coap_clients", None)
+    if clients is None:
+        clients = app.state.coap_clients = []
+    return clients
+
+
+@contextlib.asynccontextmanager
+async def _coap_client():
+    # One client context per collect in flight: aiocoap allows one outstanding
+    # CON exchange per peer and context (NSTART=1), which would serialize every
+    # runner's collect behind the others. Contexts are reused, and the collect
+    # slots bound how many exist.
+    idle = _idle_coap_clients()
+    protocol = idle.pop() if idle else await aiocoap.Context.create_client_context()
     try:
-        last_error = None
-        for _ in range(retries):
-            try:
+        yield protocol
+    finally:
+        idle.append(protocol)
+
+
+def _collect_slots():
+    # Bounds routeur requests in flight across all runners; created lazily so
+    # it binds to the running loop.
+    slots = getattr(app.state, "collect_slots", None)
+    if slots is None:
+        slots = app.state.collect_slots = asyncio.Semaphore(COLLECT_MAX_CONCURRENCY)
+    return slots
+
+
+async def coap_collect(devices=None, session_id=None, retries=COLLECT_RETRIES, delay_s=COLLECT_DELAY_S):
+    body = {"key": SHARED_KEY}
+    if devices:
+        body["devices"] = devices
+    if session_id:
+        # Echoed by the routeur on MQTT so ingest can skip what we store here.
+        body["session_id"] = session_id
+    slots = _collect_slots()
+    last_error = None
+    for _ in range(retries):
+        try:
+            uri = f"coap://{await resolver.resolve(COAP_ROUTEUR_HOST)}/collect"
+            if slots.locked():
+                collect_stats["slot_waits"] += 1
+            async with slots, _coap_client() as protocol:
+                # CON: a datagram lost on the mesh is retransmitted by CoAP
+                # instead of costing the whole timeout.
                 request = aiocoap.Message(
                     code=aiocoap.POST,
-                    uri=f"coap://{host}/collect",
-                    payload=json.dumps({"key": SHARED_KEY}).encode("utf-8"),
+                    uri=uri,
+                    payload=json.dumps(body).encode("utf-8"),
                 )
                 response = await asyncio.wait_for(
                     protocol.request(request).response, timeout=COLLECT_TIMEOUT_S
                 )
-                payload = response.payload.decode("utf-8", errors="replace")
-                data = json.loads(payload)
-                if isinstance(data, dict) and data.get("error"):
-                    raise RuntimeError(data["error"])
-                return data
-            except Exception as exc:
-                last_error = exc
-                await asyncio.sleep(delay_s)
-        raise last_error if last_error else RuntimeError("collect failed")
-    finally:
-        await protocol.shutdown()
+            payload = response.payload.decode("utf-8", errors="replace")
+            data = json.loads(payload)
+            if isinstance(data, dict) and data.get("error"):
+                raise RuntimeError(data["error"])
+            return data
+        except Exception as exc:
+            last_error = exc
+            await asyncio.sleep(delay_s)
+    raise last_error if last_error else RuntimeError("collect failed")
+
+
+def _devices_key(devices):
+    if not devices:
+        return None
+    return (devices["gps"], devices["batterie"], devices["temperature"])
+
+
+def _flight_landed(flights, key, flight, task):
+    # Freshness counts from when the answer arrived, not from the request.
+    flight["finished"] = time.monotonic()
+    # Drop the entry once nobody can join it any more, so runners collected
+    # once don't leave their last result behind.
+    delay = 0 if task.cancelled() or task.exception() is not None else COLLECT_COALESCE_S
+    asyncio.get_running_loop().call_later(delay, _flight_expired, flights, key, flight)
+
+
+def _flight_expired(flights, key, flight):
+    if flights.get(key) is flight:
+        del flights[key]
+
+
+def _join_flight(flights, key):
+    """Return the task of key's flight if it is running or finished successfully
+    less than COLLECT_COALESCE_S ago, else None."""
+    flight = flights.get(key)
+    if flight is None:
+        return None
+    task = flight["task"]
+    if not task.done():
+        return task
+    fresh = flight["finished"] is not None and time.monotonic() - flight["finished"] < COLLECT_COALESCE_S
+    if fresh and not task.cancelled() and task.exception() is None:
+        return task
+    return None
+
+
+def _start_flight(flights, key, coro):
+    task = asyncio.ensure_future(coro)
+    flight = flights[key] = {"task": task, "finished": None}
+    task.add_done_callback(lambda done: _flight_landed(flights, key, flight, done))
+    return task
+
+
+async def coalesced_collect(devices=None, session_id=None):
+    # Join the in-flight routeur request for the same device set, or reuse its
+    # successful result if it finished less than COLLECT_COALESCE_S ago.
+    # Each runner's devices get their own flight, so one slow mesh only delays
+    # its own sessions.
+    collect_stats["requests"] += 1
+    flights = getattr(app.state, "collect_flights", None)
+    if flights is None:
+        flights = app.state.collect_flights = {}
+    key = _devices_key(devices)
+    task = _join_flight(flights, key)
+    if task is not None:
+        collect_stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    task = _start_flight(flights, key, coap_collect(devices, session_id))
+    collect_stats["routeur_calls"] += 1
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        collect_stats["errors"] += 1
+        raise
 
 
 @app.on_event("startup")
@@ -247,18 +391,21 @@ async def startup():
     client.loop_start()
     app.state.mqtt_sub = client
 
-    app.state.last_point = None
-    app.state.total_distance_m = 0.0
+    # Distance state for MQTT samples that belong to no session.
+    app.state.unassigned_runtime = {"last_point": None, "total_distance_m": 0.0}
     app.state.current_session_id = None
     app.state.session_runtime = {}
+    app.state.collect_flights = {}
+    app.state.session_flights = {}
+    app.state.coap_clients = []
 
     # Wait for PostgreSQL readiness before creating schema.
-    from Couches.Backend.db import Base, engine
+    from Couches.Backend.db import Base
 
     last_error = None
     for _ in range(60):
         try:
-            Base.metadata.create_all(bind=engine)
+            await run_db(Base.metadata.create_all, bind=engine)
             last_error = None
             break
         except Exception as exc:
@@ -267,6 +414,39 @@ async def startup():
     if last_error is not None:
         raise RuntimeError(f"database not ready after retry: {last_error}")
 
+    # A fresh partitioned table has no partitions yet; create them before any write.
+    app.state.partition_maintenance = await run_db(run_partition_maintenance, engine)
+    app.state.partition_task = asyncio.ensure_future(_partition_maintenance_loop())
+    measure_writer.start()
+    mqtt_ingest.start()
+
+
+async def _partition_maintenance_loop():
+    while True:
+        await asyncio.sleep(MEASURE_PARTITION_CHECK_S)
+        try:
+            app.state.partition_maintenance = await run_db(run_partition_maintenance, engine)
+        except Exception as exc:
+            app.state.partition_maintenance = {"error": f"{type(exc).__name__}: {exc}"}
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    task = getattr(app.state, "partition_task", None)
+    if task is not None:
+        task.cancel()
+    for session_id in list(collect_schedules):
+        await stop_schedule(session_id)
+    # Drain ingest first: it feeds the measure writer.
+    await mqtt_ingest.stop()
+    await measure_writer.stop()
+    kdf_pool.stop()
+
+    clients = getattr(app.state, "coap_clients", None) or []
+    app.state.coap_clients = []
+    for protocol in clients:
+        await protocol.shutdown()
+
 
 def on_mqtt_connect(client, userdata, flags, reason_code, properties):
     if reason_code == 0:
@@ -278,38 +458,59 @@ def api_latest():
     return latest_data
 
 
+@app.get("/api/metrics")
+def api_metrics():
+    return {
+        "collect": dict(collect_stats),
+        "schedules": {
+            "active": sum(1 for s in collect_schedules.values() if not s["task"].done()),
+        },
+        "measure_writer": measure_writer.snapshot(),
+        "partitions": getattr(app.state, "partition_maintenance", None),
+        "track_cache": track_cache.snapshot(),
+        "read_cache": read_cache.snapshot(),
+        "live": live_hub.snapshot(),
+        "kdf": kdf_pool.snapshot(),
+        "mqtt_ingest": mqtt_ingest.snapshot(),
+        "resolver": resolver.snapshot(),
+    }
+
+
 def _find_runner_by_email(db, email):
     normalized = _normalize_email(email)
+    # Matches the lower(email) index. Databases migrated with emails that
+    # only differ by case keep several runners per address: newest wins.
     return (
         db.query(Runner)
-        .filter(Runner.email == normalized)
+        .filter(func.lower(Runner.email) == normalized)
         .order_by(Runner.created_at.desc())
         .first()
     )
 
 
-@app.post("/api/runners")
-def create_runner(payload: dict):
-    name = (payload.get("name") or "").strip()
-    email = _normalize_email(payload.get("email"))
-    password = payload.get("password") or ""
-    devices = _normalize_devices(payload.get("devices"))
-    if not name or not email or not password:
-        raise HTTPException(status_code=400, detail="name, email, password and devices are required")
-    if len(password) < PASSWORD_MIN_LEN:
-        raise HTTPException(
-            status_code=400, detail=f"password must be at least {PASSWORD_MIN_LEN} chars"
-        )
+async def _run_kdf(fn, *args):
+    try:
+        return await kdf_pool.run(fn, *args)
+    except KdfSaturated as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
 
+
+def _email_registered(email):
     with SessionLocal() as db:
-        runner = _find_runner_by_email(db, email)
-        if runner is not None:
-            raise HTTPException(status_code=409, detail="email already registered")
+        return _find_runner_by_email(db, email) is not None
+
 
+def _insert_runner(name, email, password_hash, devices):
+    with SessionLocal() as db:
         runner = Runner(id=str(uuid.uuid4()), name=name, email=email)
         db.add(runner)
-        db.flush()
-        credential = RunnerCredential(runner_id=runner.id, password_hash=_hash_password(password))
+        try:
+            db.flush()
+        except IntegrityError:
+            # Lost a race with a concurrent registration of the same email.
+            db.rollback()
+            raise HTTPException(status_code=409, detail="email already registered")
+        credential = RunnerCredential(runner_id=runner.id, password_hash=password_hash)
         db.add(credential)
         _set_runner_devices(db, runner.id, devices)
 
@@ -317,11 +518,31 @@ def create_runner(payload: dict):
         db.add(run_session)
         db.flush()
         db.commit()
-        runner_id = runner.id
-        runner_name = runner.name
-        runner_email = runner.email
-        run_session_id = run_session.id
+        return runner.id, runner.name, runner.email, run_session.id
 
+
+@app.post("/api/runners")
+async def create_runner(payload: dict):
+    name = (payload.get("name") or "").strip()
+    email = _normalize_email(payload.get("email"))
+    password = payload.get("password") or ""
+    devices = _normalize_devices(payload.get("devices"))
+    if not name or not email or not password:
+        raise HTTPException(status_code=400, detail="name, email, password and devices are required")
+    if len(password) < PASSWORD_MIN_LEN:
+        raise HTTPException(
+            status_code=400, detail=f"password must be at least {PASSWORD_MIN_LEN} chars"
+        )
+
+    # Checked before hashing so duplicates do not cost a KDF run.
+    if await run_db(_email_registered, email):
+        raise HTTPException(status_code=409, detail="email already registered")
+    password_hash = await _run_kdf(_hash_password, password)
+    runner_id, runner_name, runner_email, run_session_id = await run_db(
+        _insert_runner, name, email, password_hash, devices
+    )
+
+    start_runner_schedule(runner_id, run_session_id)
     app.state.current_session_id = run_session_id
 
     runner_payload = {
@@ -337,31 +558,26 @@ def create_runner(payload: dict):
 
 
 @app.post("/api/register")
-def register(payload: dict):
+async def register(payload: dict):
     merged = dict(payload or {})
     merged.setdefault("devices", payload.get("devices") or {})
-    return create_runner(merged)
-
+    return await create_runner(merged)
 
-@app.post("/api/login")
-def login(payload: dict):
-    email = _normalize_email(payload.get("email"))
-    password = payload.get("password") or ""
-    new_session = bool(payload.get("new_session", False))
-
-    if not email:
-        raise HTTPException(status_code=400, detail="email is required")
-    if not password:
-        raise HTTPException(status_code=400, detail="password is required")
 
+def _load_credential(email):
     with SessionLocal() as db:
         runner = _find_runner_by_email(db, email)
         if runner is None:
             raise HTTPException(status_code=404, detail="user not found")
-
         credential = db.get(RunnerCredential, runner.id)
-        if credential is None or not _verify_password(password, credential.password_hash):
-            raise HTTPException(status_code=401, detail="invalid credentials")
+        return runner.id, credential.password_hash if credential is not None else None
+
+
+def _open_login_session(runner_id, new_session, rehashed):
+    with SessionLocal() as db:
+        runner = db.get(Runner, runner_id)
+        if rehashed is not None:
+            db.get(RunnerCredential, runner_id).password_hash = rehashed
 
         run_session = None
         if not new_session:
@@ -384,8 +600,32 @@ def login(payload: dict):
             "email": runner.email,
             "devices": _device_payload(db, runner.id),
         }
-        run_session_id = run_session.id
+        return runner_payload, run_session.id
+
 
+@app.post("/api/login")
+async def login(payload: dict):
+    email = _normalize_email(payload.get("email"))
+    password = payload.get("password") or ""
+    new_session = bool(payload.get("new_session", False))
+
+    if not email:
+        raise HTTPException(status_code=400, detail="email is required")
+    if not password:
+        raise HTTPException(status_code=400, detail="password is required")
+
+    runner_id, password_hash = await run_db(_load_credential, email)
+    if password_hash is None:
+        raise HTTPException(status_code=401, detail="invalid credentials")
+    # Hashes made with an older PASSWORD_ITERATIONS are upgraded on success.
+    valid, rehashed = await _run_kdf(verify_and_rehash, password, password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="invalid credentials")
+
+    runner_payload, run_session_id = await run_db(_open_login_session, runner_id, new_session, rehashed)
+
+    read_cache.invalidate_prefix(("runner_sessions", runner_payload["id"]))
+    start_runner_schedule(runner_payload["id"], run_session_id)
     app.state.current_session_id = run_session_id
 
     return {
@@ -394,57 +634,84 @@ def login(payload: dict):
     }
 
 
+def _session_payload(run_session, stats):
+    return {
+        "id": run_session.id,
+        "runner_id": run_session.runner_id,
+        "started_at": run_session.started_at.isoformat(),
+        "total_distance_m": run_session.total_distance_m,
+        "stats": stats_payload(stats),
+    }
+
+
 @app.get("/api/runners/{runner_id}/sessions")
 def list_runner_sessions(runner_id: str, limit: int = 100):
+    cache_key = ("runner_sessions", runner_id, limit)
+    cached = read_cache.get(cache_key)
+    if cached is not None:
+        return cached
     with SessionLocal() as db:
         runner = db.get(Runner, runner_id)
         if runner is None:
             raise HTTPException(status_code=404, detail="runner not found")
 
         sessions = (
-            db.query(Session)
+            db.query(Session, SessionStats)
+            .outerjoin(SessionStats, SessionStats.session_id == Session.id)
             .filter(Session.runner_id == runner_id)
             .order_by(Session.started_at.desc())
             .limit(limit)
             .all()
         )
 
-        return [
-            {
-                "id": run_session.id,
-                "runner_id": run_session.runner_id,
-                "started_at": run_session.started_at.isoformat(),
-                "total_distance_m": run_session.total_distance_m,
-            }
-            for run_session in sessions
-        ]
+        payload = [_session_payload(run_session, stats) for run_session, stats in sessions]
 
+    return read_cache.add(cache_key, payload)
 
-@app.post("/api/runners/{runner_id}/sessions")
-def create_runner_session(runner_id: str):
+
+def _insert_runner_session(runner_id):
     with SessionLocal() as db:
         runner = db.get(Runner, runner_id)
         if runner is None:
-            raise HTTPException(status_code=404, detail="runner not found")
+            return None
 
         run_session = Session(runner_id=runner_id)
         db.add(run_session)
         db.flush()
         db.commit()
-        run_session_id = run_session.id
+        return run_session.id
 
+
+@app.post("/api/runners/{runner_id}/sessions")
+async def create_runner_session(runner_id: str):
+    run_session_id = await run_db(_insert_runner_session, runner_id)
+    if run_session_id is None:
+        raise HTTPException(status_code=404, detail="runner not found")
+
+    read_cache.invalidate_prefix(("runner_sessions", runner_id))
+    # The runner moved on: its previous session stops polling the mesh.
+    start_runner_schedule(runner_id, run_session_id)
     app.state.current_session_id = run_session_id
     return {"session_id": run_session_id}
 
 
-def _runtime_for_session(db, session_id):
+def _session_measures(db, run_session):
+    # No measure predates its session; bounding ts lets Postgres prune the
+    # monthly partitions of measures that are older than the session.
+    return db.query(Measure).filter(
+        Measure.session_id == run_session.id,
+        Measure.ts >= run_session.started_at,
+    )
+
+
+def _runtime_for_session(db, run_session):
+    session_id = run_session.id
     runtime = app.state.session_runtime.get(session_id)
     if runtime is not None:
         return runtime
 
     last_measure = (
-        db.query(Measure)
-        .filter(Measure.session_id == session_id)
+        _session_measures(db, run_session)
         .order_by(Measure.ts.desc())
         .first()
     )
@@ -456,73 +723,114 @@ def _runtime_for_session(db, session_id):
             "last_point": (last_measure.lat, last_measure.lon),
             "total_distance_m": float(last_measure.distance_m),
         }
+    # The runner's registered sensors, targeted by every collect of the session.
+    runtime["devices"] = _device_payload(db, run_session.runner_id)
 
-    app.state.session_runtime[session_id] = runtime
-    return runtime
+    # May run on several DB threads at once; keep whichever runtime landed first.
+    return app.state.session_runtime.setdefault(session_id, runtime)
 
 
-def _persist_measure(db, session_id, payload):
-    measure = Measure(
-        session_id=session_id,
-        lat=payload["gps"]["latitude"],
-        lon=payload["gps"]["longitude"],
-        temperature=payload["temperature"],
-        humidite=payload["humidite"],
-        pression=payload["pression"],
-        batterie=payload["batterie"],
-        distance_m=payload["distance_m"],
+async def _persist_measure(session_id, payload):
+    await measure_writer.put(
+        {
+            "id": uuid7(),
+            "session_id": session_id,
+            "ts": datetime.utcnow(),
+            "lat": payload["gps"]["latitude"],
+            "lon": payload["gps"]["longitude"],
+            "temperature": payload["temperature"],
+            "humidite": payload["humidite"],
+            "pression": payload["pression"],
+            "batterie": payload["batterie"],
+            "distance_m": payload["distance_m"],
+        }
     )
-    db.add(measure)
 
-    run_session = db.get(Session, session_id)
-    if run_session is not None:
-        run_session.total_distance_m = payload["distance_m"]
 
-    db.commit()
+def _load_session_runtime(session_id):
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        if run_session is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        return _runtime_for_session(db, run_session)
+
+
+def _enrich_sample(runtime, session_id, values):
+    lat, lon, temperature, humidite, pression, batterie = values
+
+    # Distance bookkeeping stays on the event loop so samples of one session
+    # are accumulated in order.
+    if runtime["last_point"] is not None:
+        prev_lat, prev_lon = runtime["last_point"]
+        runtime["total_distance_m"] += haversine_m(prev_lat, prev_lon, lat, lon)
+
+    runtime["last_point"] = (lat, lon)
+    distance_m = round(runtime["total_distance_m"], 2)
+
+    return {
+        "gps": {"latitude": lat, "longitude": lon},
+        "temperature": temperature,
+        "humidite": humidite,
+        "pression": pression,
+        "batterie": batterie,
+        "distance_m": distance_m,
+        "session_id": session_id,
+    }
+
+
+def _fan_out_sample(session_id, processed, publish=True):
+    if publish:
+        _publish_session_topics(session_id, processed)
+    latest_data.update(processed)
+    latest_data["ts"] = time.time()
+
+    # Write-through: pollers of this session are served from memory.
+    latest = dict(processed, ts=latest_data["ts"])
+    read_cache.set(("latest", session_id), latest)
+    read_cache.update(
+        ("session", session_id),
+        lambda cached: dict(cached, total_distance_m=processed["distance_m"]),
+    )
+    live_hub.publish(session_id, latest)
+
+
+async def collect_session_sample(session_id):
+    # A schedule tick and a "collect now" on the same session share one
+    # sample: joiners get the row already stored instead of storing it again.
+    flights = getattr(app.state, "session_flights", None)
+    if flights is None:
+        flights = app.state.session_flights = {}
+    task = _join_flight(flights, session_id)
+    if task is None:
+        task = _start_flight(flights, session_id, _collect_session_sample(session_id))
+    else:
+        collect_stats["session_coalesced"] += 1
+    return await asyncio.shield(task)
+
+
+async def _collect_session_sample(session_id):
+    runtime = await run_db(_load_session_runtime, session_id)
+    devices = runtime.get("devices") if COLLECT_TARGET_DEVICES else None
+    raw = await coalesced_collect(devices, session_id)
+    if not isinstance(raw, dict):
+        raise HTTPException(status_code=502, detail="invalid payload")
+    processed = _enrich_sample(runtime, session_id, _extract_sensor_values(raw))
+    await _persist_measure(session_id, processed)
+    _fan_out_sample(session_id, processed)
+    return processed
 
 
 @app.post("/api/collect")
 async def collect(payload: dict = Body(default_factory=dict)):
     try:
-        raw = await coap_collect()
-        if not isinstance(raw, dict):
-            raise HTTPException(status_code=502, detail="invalid payload")
-
         session_id = (payload or {}).get("session_id") or app.state.current_session_id
-        if not session_id:
-            return raw
-
-        with SessionLocal() as db:
-            run_session = db.get(Session, session_id)
-            if run_session is None:
-                raise HTTPException(status_code=404, detail="session not found")
-
-            lat, lon, temperature, humidite, pression, batterie = _extract_sensor_values(raw)
-
-            runtime = _runtime_for_session(db, session_id)
-            if runtime["last_point"] is not None:
-                prev_lat, prev_lon = runtime["last_point"]
-                runtime["total_distance_m"] += haversine_m(prev_lat, prev_lon, lat, lon)
-
-            runtime["last_point"] = (lat, lon)
-            distance_m = round(runtime["total_distance_m"], 2)
-
-            processed = {
-                "gps": {"latitude": lat, "longitude": lon},
-                "temperature": temperature,
-                "humidite": humidite,
-                "pression": pression,
-                "batterie": batterie,
-                "distance_m": distance_m,
-                "session_id": session_id,
-            }
-
-            _persist_measure(db, session_id, processed)
+        if session_id:
+            return await collect_session_sample(session_id)
 
-        _publish_session_topics(session_id, processed)
-        latest_data.update(processed)
-        latest_data["ts"] = time.time()
-        return processed
+        raw = await coalesced_collect()
+        if not isinstance(raw, dict):
+            raise HTTPException(status_code=502, detail="invalid payload")
+        return raw
     except HTTPException:
         raise
     except Exception as exc:
@@ -531,32 +839,215 @@ async def collect(payload: dict = Body(default_factory=dict)):
         )
 
 
+def _session_exists(session_id):
+    with SessionLocal() as db:
+        return db.get(Session, session_id) is not None
+
+
+def _session_runner_id(session_id):
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        return run_session.runner_id if run_session is not None else None
+
+
+def _schedule_status(session_id):
+    schedule = collect_schedules.get(session_id)
+    if schedule is None:
+        return {"session_id": session_id, "running": False}
+    return {
+        "session_id": session_id,
+        "running": not schedule["task"].done(),
+        "interval_s": schedule["interval_s"],
+        "started_at": schedule["started_at"],
+        "samples": schedule["samples"],
+        "errors": schedule["errors"],
+        "last_sample_ts": schedule["last_sample_ts"],
+        "last_error": schedule["last_error"],
+    }
+
+
+def _schedule_idle(session_id, schedule):
+    # Opt-in (SCHEDULE_IDLE_S > 0): viewers then keep a schedule alive by
+    # polling its status or holding the live stream open, and nobody doing
+    # either for SCHEDULE_IDLE_S stops it. By default a schedule lives until
+    # it is stopped or its runner starts another session.
+    if SCHEDULE_IDLE_S <= 0:
+        return False
+    if live_hub.subscribers.get(session_id):
+        schedule["seen"] = time.monotonic()
+    return time.monotonic() - schedule["seen"] >= SCHEDULE_IDLE_S
+
+
+def _retire_schedule(session_id, schedule):
+    if collect_schedules.get(session_id) is schedule:
+        del collect_schedules[session_id]
+
+
+async def _run_schedule(session_id, schedule):
+    next_at = time.monotonic()
+    while True:
+        try:
+            await collect_session_sample(session_id)
+            schedule["samples"] += 1
+            schedule["last_sample_ts"] = time.time()
+            schedule["last_error"] = None
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as exc:
+            schedule["errors"] += 1
+            schedule["last_error"] = exc.detail
+            if exc.status_code == 404:
+                _retire_schedule(session_id, schedule)
+                return
+        except Exception as exc:
+            schedule["errors"] += 1
+            schedule["last_error"] = f"{type(exc).__name__}: {exc}"
+
+        if _schedule_idle(session_id, schedule):
+            _retire_schedule(session_id, schedule)
+            return
+
+        # Keep a fixed cadence; skip ticks missed while a collect overran.
+        next_at += schedule["interval_s"]
+        now = time.monotonic()
+        if next_at < now:
+            next_at = now
+        await asyncio.sleep(next_at - now)
+
+
+def start_schedule(session_id, interval_s=SCHEDULE_INTERVAL_S, runner_id=None):
+    interval_s = max(float(interval_s), SCHEDULE_MIN_INTERVAL_S)
+    schedule = collect_schedules.get(session_id)
+    if schedule is not None and not schedule["task"].done():
+        schedule["interval_s"] = interval_s
+        schedule["seen"] = time.monotonic()
+        return schedule
+
+    schedule = {
+        "runner_id": runner_id,
+        "seen": time.monotonic(),
+        "interval_s": interval_s,
+        "started_at": time.time(),
+        "samples": 0,
+        "errors": 0,
+        "last_sample_ts": None,
+        "last_error": None,
+    }
+    schedule["task"] = asyncio.ensure_future(_run_schedule(session_id, schedule))
+    collect_schedules[session_id] = schedule
+    return schedule
+
+
+def touch_schedule(session_id):
+    schedule = collect_schedules.get(session_id)
+    if schedule is not None:
+        schedule["seen"] = time.monotonic()
+
+
+def stop_runner_schedules(runner_id, keep=None):
+    """Stop the schedules of runner_id's other sessions, e.g. once it opens a new one."""
+    stopped = []
+    for session_id, schedule in list(collect_schedules.items()):
+        if schedule["runner_id"] == runner_id and session_id != keep:
+            _retire_schedule(session_id, schedule)
+            schedule["task"].cancel()
+            stopped.append(session_id)
+    return stopped
+
+
+def start_runner_schedule(runner_id, session_id):
+    """Sample session_id, runner_id's current session, and stop its others.
+
+    Called when a session is created or its runner logs in, so recording does
+    not depend on a browser tab staying open. A running schedule keeps its
+    cadence.
+    """
+    stop_runner_schedules(runner_id, keep=session_id)
+    if not SCHEDULE_ON_SESSION:
+        return None
+    schedule = collect_schedules.get(session_id)
+    if schedule is not None and not schedule["task"].done():
+        return schedule
+    return start_schedule(session_id, runner_id=runner_id)
+
+
+async def stop_schedule(session_id):
+    schedule = collect_schedules.pop(session_id, None)
+    if schedule is None:
+        return False
+    schedule["task"].cancel()
+    try:
+        await schedule["task"]
+    except BaseException:
+        pass
+    return True
+
+
+@app.post("/api/sessions/{session_id}/schedule")
+async def api_start_schedule(session_id: str, payload: dict = Body(default_factory=dict)):
+    runner_id = await run_db(_session_runner_id, session_id)
+    if runner_id is None:
+        raise HTTPException(status_code=404, detail="session not found")
+
+    try:
+        interval_s = float((payload or {}).get("interval_s") or SCHEDULE_INTERVAL_S)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="interval_s must be a number")
+
+    start_schedule(session_id, interval_s, runner_id)
+    return _schedule_status(session_id)
+
+
+@app.delete("/api/sessions/{session_id}/schedule")
+async def api_stop_schedule(session_id: str):
+    stopped = await stop_schedule(session_id)
+    status = _schedule_status(session_id)
+    status["stopped"] = stopped
+    return status
+
+
+@app.get("/api/sessions/{session_id}/schedule")
+async def api_schedule_status(session_id: str):
+    # Viewers poll this; with SCHEDULE_IDLE_S set it doubles as the heartbeat.
+    touch_schedule(session_id)
+    return _schedule_status(session_id)
+
+
+@app.get("/api/schedules")
+def api_list_schedules():
+    return [_schedule_status(session_id) for session_id in list(collect_schedules)]
+
+
 @app.get("/api/sessions/{session_id}")
 def get_session(session_id: str):
+    cached = read_cache.get(("session", session_id))
+    if cached is not None:
+        return cached
     with SessionLocal() as db:
         run_session = db.get(Session, session_id)
         if run_session is None:
             raise HTTPException(status_code=404, detail="session not found")
-        return {
-            "id": run_session.id,
-            "runner_id": run_session.runner_id,
-            "started_at": run_session.started_at.isoformat(),
-            "total_distance_m": run_session.total_distance_m,
-        }
+        payload = _session_payload(run_session, db.get(SessionStats, session_id))
+    return read_cache.add(("session", session_id), payload)
 
 
 @app.get("/api/sessions/{session_id}/measures")
-def get_measures(session_id: str, limit: int = 1000):
+def get_measures(session_id: str, response: Response, limit: int = 1000, cursor: str = None):
+    limit = max(1, min(limit, MEASURES_PAGE_MAX))
     with SessionLocal() as db:
         run_session = db.get(Session, session_id)
         if run_session is None:
             raise HTTPException(status_code=404, detail="session not found")
-        q = (
-            db.query(Measure)
-            .filter(Measure.session_id == session_id)
-            .order_by(Measure.ts.asc())
-            .limit(limit)
-        )
+        try:
+            q = after_cursor(_session_measures(db, run_session), cursor)
+        except Exception:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        page = q.order_by(Measure.ts.asc(), Measure.id.asc()).limit(limit + 1).all()
+
+        if len(page) > limit:
+            page = page[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(page[-1].ts, page[-1].id)
+
         return [
             {
                 "ts": m.ts.isoformat(),
@@ -568,26 +1059,158 @@ def get_measures(session_id: str, limit: int = 1000):
                 "batterie": m.batterie,
                 "distance_m": m.distance_m,
             }
-            for m in q
+            for m in page
         ]
 
 
+@app.get("/api/sessions/{session_id}/measures/export")
+def export_measures(session_id: str, format: str = "ndjson"):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        if run_session is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        db.expunge(run_session)
+
+    if format == "csv":
+        body, media_type = iter_csv(run_session), "text/csv"
+    else:
+        body, media_type = iter_ndjson(run_session), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="session-{session_id}.{format}"'},
+    )
+
+
+@app.get("/api/sessions/{session_id}/rollups")
+def get_rollups(session_id: str, points: int = 500, resolution_s: int = None):
+    if resolution_s is not None and resolution_s not in ROLLUP_RESOLUTIONS_S:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution_s must be one of {list(ROLLUP_RESOLUTIONS_S)}",
+        )
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        if run_session is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        stats = db.get(SessionStats, session_id)
+        if stats is None:
+            return {"session_id": session_id, "resolution_s": None, "buckets": []}
+
+        if resolution_s is None:
+            duration_s = (stats.last_ts - stats.first_ts).total_seconds()
+            resolution_s = pick_resolution(duration_s, max(1, points))
+        rollups = (
+            db.query(MeasureRollup)
+            .filter(
+                MeasureRollup.session_id == session_id,
+                MeasureRollup.resolution_s == resolution_s,
+            )
+            .order_by(MeasureRollup.bucket_start.asc())
+            .all()
+        )
+        return {
+            "session_id": session_id,
+            "resolution_s": resolution_s,
+            "buckets": [rollup_payload(rollup) for rollup in rollups],
+        }
+
+
+def _parse_bbox(bbox):
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lat,min_lon,max_lat,max_lon")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="bbox must be min_lat,min_lon,max_lat,max_lon")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+@app.get("/api/sessions/{session_id}/track")
+def get_track(
+    session_id: str,
+    zoom: float = Query(None, ge=0, le=22),
+    tolerance_m: float = None,
+    bbox: str = None,
+):
+    viewport = _parse_bbox(bbox) if bbox else None
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        if run_session is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        db.expunge(run_session)
+
+    if tolerance_m is None and zoom is not None:
+        if viewport is not None:
+            latitude = (viewport[0] + viewport[2]) / 2
+        else:
+            runtime = app.state.session_runtime.get(session_id) or {}
+            latitude = (runtime.get("last_point") or (0.0, 0.0))[0]
+        tolerance_m = tolerance_for_zoom(zoom, latitude)
+    if tolerance_m is None:
+        tolerance_m = TRACK_DEFAULT_TOLERANCE_M
+
+    points, tolerance_m = track_cache.track(run_session, tolerance_m)
+    runs = clip_to_bbox(points, viewport) if viewport is not None else [points]
+    return {
+        "session_id": session_id,
+        "tolerance_m": tolerance_m,
+        "points": sum(len(run) for run in runs),
+        "polylines": [encode_polyline(run) for run in runs if run],
+    }
+
+
+COLUMNAR_MEDIA_TYPES = {
+    "zolc": "application/vnd.zolis.columnar",
+    "arrow": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@app.get("/api/sessions/{session_id}/measures/columns")
+def export_measure_columns(session_id: str, format: str = "zolc"):
+    if format not in COLUMNAR_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be zolc, arrow or parquet")
+    if format != "zolc" and export.pyarrow is None:
+        raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow")
+    with SessionLocal() as db:
+        run_session = db.get(Session, session_id)
+        if run_session is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        db.expunge(run_session)
+
+    columns = export.read_columns(run_session)
+    if format == "zolc":
+        body = export.encode_columnar(columns)
+    else:
+        body = export.encode_arrow(columns, format)
+    return Response(
+        content=body,
+        media_type=COLUMNAR_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="session-{session_id}.{format}"'},
+    )
+
+
 @app.get("/api/sessions/{session_id}/latest")
 def get_session_latest(session_id: str):
+    cached = read_cache.get(("latest", session_id))
+    if cached is not None:
+        return cached
     with SessionLocal() as db:
         run_session = db.get(Session, session_id)
         if run_session is None:
             raise HTTPException(status_code=404, detail="session not found")
 
         measure = (
-            db.query(Measure)
-            .filter(Measure.session_id == session_id)
+            _session_measures(db, run_session)
             .order_by(Measure.ts.desc())
             .first()
         )
 
         if measure is None:
-            return {
+            payload = {
                 "gps": {"latitude": 0.0, "longitude": 0.0},
                 "temperature": None,
                 "humidite": None,
@@ -597,43 +1220,80 @@ def get_session_latest(session_id: str):
                 "session_id": session_id,
                 "ts": None,
             }
+        else:
+            payload = {
+                "gps": {"latitude": measure.lat, "longitude": measure.lon},
+                "temperature": measure.temperature,
+                "humidite": measure.humidite,
+                "pression": measure.pression,
+                "batterie": measure.batterie,
+                "distance_m": measure.distance_m,
+                "session_id": session_id,
+                "ts": measure.ts.timestamp(),
+            }
 
-        return {
-            "gps": {"latitude": measure.lat, "longitude": measure.lon},
-            "temperature": measure.temperature,
-            "humidite": measure.humidite,
-            "pression": measure.pression,
-            "batterie": measure.batterie,
-            "distance_m": measure.distance_m,
-            "session_id": session_id,
-            "ts": measure.ts.timestamp(),
-        }
+    return read_cache.add(("latest", session_id), payload)
 
 
-def on_mqtt_message(client, userdata, msg):
-    try:
-        data = json.loads(msg.payload.decode("utf-8", errors="replace"))
-    except Exception:
-        return
+@app.get("/api/sessions/{session_id}/stream")
+async def stream_session(session_id: str):
+    # Server-Sent Events: the current state first, then every new sample.
+    initial = await run_db(get_session_latest, session_id)
+    return StreamingResponse(
+        iter_sse(live_hub, session_id, initial=initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+def _mqtt_session_id(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError("invalid session_id")
     try:
-        lat, lon, temperature, humidite, pression, batterie = _extract_sensor_values(data)
-    except Exception:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise ValueError("invalid session_id")
+
+
+def _decode_mqtt_sample(payload):
+    data = json.loads(payload.decode("utf-8", errors="replace"))
+    if not isinstance(data, dict):
+        raise ValueError("not an object")
+    session_id = _mqtt_session_id(data.get("session_id"))
+    if data.get("source") == "collect" and (session_id or data.get("targeted")):
+        # The routeur's echo of one of our collects: collect_session_sample
+        # already stored it, and a runner's own devices must never be filed
+        # under whichever session logged in last.
+        return None
+    values = _extract_sensor_values(data)
+    # Publishers that do not know the session only feed the unassigned live
+    # view: the last runner to log in is not necessarily theirs.
+    return session_id, values
+
+
+async def _ingest_session_samples(session_id, samples):
+    if session_id is None:
+        # No session to store into: only the global live view moves.
+        for values in samples:
+            processed = _enrich_sample(app.state.unassigned_runtime, None, values)
+        processed.pop("session_id")
+        latest_data.update(processed)
+        latest_data["ts"] = time.time()
         return
 
-    if app.state.last_point is not None:
-        prev_lat, prev_lon = app.state.last_point
-        app.state.total_distance_m += haversine_m(prev_lat, prev_lon, lat, lon)
-    app.state.last_point = (lat, lon)
+    runtime = await run_db(_load_session_runtime, session_id)
+    for values in samples:
+        processed = _enrich_sample(runtime, session_id, values)
+        await _persist_measure(session_id, processed)
+        _fan_out_sample(session_id, processed, publish=False)
+    # Subscribers of /tracking only keep the latest state; one message per batch.
+    _publish_session_topics(session_id, processed)
 
-    payload = {
-        "gps": {"latitude": lat, "longitude": lon},
-        "temperature": temperature,
-        "humidite": humidite,
-        "pression": pression,
-        "batterie": batterie,
-        "distance_m": round(app.state.total_distance_m, 2),
-    }
 
-    latest_data.update(payload)
-    latest_data["ts"] = time.time()
+mqtt_ingest = MqttIngest(_decode_mqtt_sample, _ingest_session_samples)
+
+
+def on_mqtt_message(client, userdata, msg):
+    mqtt_ingest.submit(msg.payload)
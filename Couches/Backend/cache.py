@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+READ_CACHE_MAX = int(os.getenv("READ_CACHE_MAX", "4096"))
+READ_CACHE_TTL_S = float(os.getenv("READ_CACHE_TTL_S", "5.0"))
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ttl_s.
+
+    Shared between the event loop and FastAPI's threadpool, hence the lock.
+    """
+
+    def __init__(self, max_entries=READ_CACHE_MAX, ttl_s=READ_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "writes": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl_s=None):
+        with self.lock:
+            self._store(key, value, ttl_s)
+
+    def add(self, key, value, ttl_s=None):
+        # Read paths fill the cache with add() so a value loaded from the DB
+        # never overwrites a newer one written through while it was loading;
+        # check and insert happen under one lock for that reason.
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return entry[1]
+            self._store(key, value, ttl_s)
+        return value
+
+    def _store(self, key, value, ttl_s):
+        # Caller holds self.lock.
+        self.entries[key] = (time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s), value)
+        self.entries.move_to_end(key)
+        self.stats["writes"] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def update(self, key, fn):
+        # Replace a cached value in place (keeping its expiry) if it is present.
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            self.entries[key] = (entry[0], fn(entry[1]))
+            self.stats["writes"] += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key[: len(prefix)] == prefix]:
+                del self.entries[key]
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
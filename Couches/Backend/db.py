@@ -1,5 +1,11 @@
+import asyncio
+import functools
 import os
+import secrets
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from sqlalchemy import (
@@ -7,16 +13,50 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
+    Integer,
     String,
+    Uuid,
     create_engine,
+    func,
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://zolis:zolis@db:5432/zolis")
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
 
 Base = declarative_base()
 
+_uuid7_lock = threading.Lock()
+_uuid7_last = [0, 0]
+
+
+def uuid7():
+    """UUIDv7: 48-bit unix ms timestamp, then a per-ms counter, then random bits.
+
+    Ids generated by this process sort by creation time, so inserts append to
+    the right edge of the primary key index.
+    """
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _uuid7_last[0]:
+            ms = _uuid7_last[0]
+            counter = _uuid7_last[1] + 1
+            if counter > 0xFFF:
+                ms += 1
+                counter = 0
+        else:
+            counter = 0
+        _uuid7_last[0], _uuid7_last[1] = ms, counter
+
+    value = (ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= secrets.randbits(62)
+    return uuid.UUID(int=value)
+
 
 class Runner(Base):
     __tablename__ = "runners"
@@ -30,6 +70,8 @@ class Runner(Base):
     credential = relationship("RunnerCredential", back_populates="runner", uselist=False)
     devices = relationship("RunnerDevice", back_populates="runner", uselist=False)
 
+    __table_args__ = (Index("uq_runners_email_lower", func.lower(email), unique=True),)
+
 
 class RunnerCredential(Base):
     __tablename__ = "runner_credentials"
@@ -64,13 +106,16 @@ class Session(Base):
     runner = relationship("Runner", back_populates="sessions")
     measures = relationship("Measure", back_populates="session")
 
+    __table_args__ = (Index("ix_sessions_runner_started", runner_id, started_at),)
+
 
 class Measure(Base):
     __tablename__ = "measures"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(Uuid, primary_key=True, default=uuid7)
     session_id = Column(String, ForeignKey("sessions.id"), nullable=False)
-    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Part of the key because measures is range-partitioned on ts (0004).
+    ts = Column(DateTime, default=datetime.utcnow, primary_key=True)
     lat = Column(Float, nullable=False)
     lon = Column(Float, nullable=False)
     temperature = Column(Float, nullable=False)
@@ -81,6 +126,74 @@ class Measure(Base):
 
     session = relationship("Session", back_populates="measures")
 
+    __table_args__ = (
+        Index("ix_measures_session_ts", session_id, ts),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+
+class SessionStats(Base):
+    __tablename__ = "session_stats"
+
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    sample_count = Column(Integer, default=0, nullable=False)
+    first_ts = Column(DateTime, nullable=False)
+    last_ts = Column(DateTime, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    humidite_min = Column(Float, nullable=False)
+    humidite_max = Column(Float, nullable=False)
+    humidite_sum = Column(Float, nullable=False)
+    pression_min = Column(Float, nullable=False)
+    pression_max = Column(Float, nullable=False)
+    pression_sum = Column(Float, nullable=False)
+    batterie_first = Column(Float, nullable=False)
+    batterie_last = Column(Float, nullable=False)
+    lat_min = Column(Float, nullable=False)
+    lat_max = Column(Float, nullable=False)
+    lon_min = Column(Float, nullable=False)
+    lon_max = Column(Float, nullable=False)
+
+
+class MeasureRollup(Base):
+    __tablename__ = "measure_rollups"
+
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    resolution_s = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    sample_count = Column(Integer, default=0, nullable=False)
+    last_ts = Column(DateTime, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    temperature_last = Column(Float, nullable=False)
+    humidite_min = Column(Float, nullable=False)
+    humidite_max = Column(Float, nullable=False)
+    humidite_sum = Column(Float, nullable=False)
+    humidite_last = Column(Float, nullable=False)
+    pression_min = Column(Float, nullable=False)
+    pression_max = Column(Float, nullable=False)
+    pression_sum = Column(Float, nullable=False)
+    pression_last = Column(Float, nullable=False)
+    batterie_min = Column(Float, nullable=False)
+    batterie_max = Column(Float, nullable=False)
+    batterie_sum = Column(Float, nullable=False)
+    batterie_last = Column(Float, nullable=False)
+    distance_m_min = Column(Float, nullable=False)
+    distance_m_max = Column(Float, nullable=False)
+    distance_m_sum = Column(Float, nullable=False)
+    distance_m_last = Column(Float, nullable=False)
+
 
 engine = create_engine(DATABASE_URL, future=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+# Async handlers run blocking ORM work here so the event loop never waits on
+# psycopg2; the pool size bounds concurrent DB work from the async paths.
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,146 @@
+"""Vectorized distances and the bulk distance backfill job.
+
+Run the backfill from the repository root, for example after fixing bad GPS
+points:
+
+    python -m Couches.Backend.distance --all --workers 4
+    python -m Couches.Backend.distance --session <session_id>
+
+A running backend keeps the total of active sessions in memory; restart it
+after backfilling sessions that are still being recorded.
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import bindparam, create_engine, select, text, update
+
+from Couches.Backend.db import DATABASE_URL, Measure, Session
+
+EARTH_RADIUS_M = 6371000.0
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+
+
+def haversine_m_array(lat1, lon1, lat2, lon2):
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def cumulative_distance_m(lats, lons):
+    # Same bookkeeping as the collect path: an unrounded running total,
+    # rounded to the centimetre when stored.
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if lats.size == 0:
+        return np.zeros(0)
+    steps = haversine_m_array(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    return np.round(np.concatenate(([0.0], np.cumsum(steps))), 2)
+
+
+_worker_engine = None
+
+
+def _engine():
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = create_engine(DATABASE_URL, future=True)
+    return _worker_engine
+
+
+def recompute_session(session_id):
+    engine = _engine()
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(Measure.id, Measure.ts, Measure.lat, Measure.lon)
+            .where(Measure.session_id == session_id)
+            .order_by(Measure.ts.asc(), Measure.id.asc())
+        ).all()
+        if not rows:
+            total = 0.0
+        else:
+            lats = np.fromiter((row[2] for row in rows), dtype=float, count=len(rows))
+            lons = np.fromiter((row[3] for row in rows), dtype=float, count=len(rows))
+            distances = cumulative_distance_m(lats, lons)
+            total = float(distances[-1])
+            _write_distances(conn, session_id, rows, distances)
+
+        conn.execute(
+            update(Session.__table__)
+            .where(Session.__table__.c.id == session_id)
+            .values(total_distance_m=total)
+        )
+    return session_id, len(rows), total
+
+
+def _write_distances(conn, session_id, rows, distances):
+    if conn.dialect.name == "postgresql":
+        # One statement per session instead of one round trip per row.
+        conn.execute(
+            text(
+                "UPDATE measures AS m SET distance_m = u.distance_m "
+                "FROM unnest(CAST(:ids AS uuid[]), CAST(:distances AS float8[])) AS u(id, distance_m) "
+                "WHERE m.session_id = :session_id AND m.id = u.id"
+            ),
+            {
+                "ids": [str(row[0]) for row in rows],
+                "distances": distances.tolist(),
+                "session_id": session_id,
+            },
+        )
+        return
+
+    table = Measure.__table__
+    conn.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(distance_m=bindparam("b_distance")),
+        [{"b_id": row[0], "b_distance": value} for row, value in zip(rows, distances.tolist())],
+    )
+
+
+def backfill_distances(session_ids, workers=BACKFILL_WORKERS):
+    if workers <= 1:
+        return [recompute_session(session_id) for session_id in session_ids]
+    # spawn: forked workers would share the parent's engine and its sockets.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(recompute_session, session_ids))
+
+
+def _all_session_ids():
+    # Throwaway engine: the parent keeps no pooled connection around the pool.
+    engine = create_engine(DATABASE_URL, future=True)
+    try:
+        with engine.connect() as conn:
+            return [row[0] for row in conn.execute(select(Session.id))]
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute cumulative distances of sessions")
+    parser.add_argument("--session", action="append", default=[], help="Session id (repeatable)")
+    parser.add_argument("--all", action="store_true", help="Recompute every session")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args()
+
+    session_ids = list(args.session)
+    if args.all:
+        session_ids = _all_session_ids()
+    if not session_ids:
+        parser.error("pass --session or --all")
+
+    for session_id, count, total in backfill_distances(session_ids, workers=args.workers):
+        print(f"{session_id}: {count} measures, total {total:.2f} m")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
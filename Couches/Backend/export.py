@@ -0,0 +1,179 @@
+import base64
+import csv
+import io
+import json
+import os
+import struct
+import sys
+import uuid
+from array import array
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+
+from Couches.Backend.db import Measure, SessionLocal
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional: only needed for format=arrow|parquet
+    pyarrow = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+MEASURE_FIELDS = ["ts", "lat", "lon", "temperature", "humidite", "pression", "batterie", "distance_m"]
+MEASURE_COLUMNS = [getattr(Measure, name) for name in MEASURE_FIELDS]
+
+
+def encode_cursor(ts, measure_id):
+    raw = json.dumps([ts.isoformat(), str(measure_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, measure_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    return datetime.fromisoformat(ts), uuid.UUID(measure_id)
+
+
+def after_cursor(query, cursor):
+    # Keyset condition on the (ts, id) sort key; ties on ts are broken by id.
+    if not cursor:
+        return query
+    ts, measure_id = decode_cursor(cursor)
+    return query.where(tuple_(Measure.ts, Measure.id) > tuple_(ts, measure_id))
+
+
+def session_rows_query(run_session, *columns):
+    return (
+        select(*columns)
+        .where(Measure.session_id == run_session.id, Measure.ts >= run_session.started_at)
+        .order_by(Measure.ts.asc(), Measure.id.asc())
+    )
+
+
+def _stream_rows(run_session):
+    # stream_results uses a server-side cursor on Postgres, so memory only ever
+    # holds one chunk of rows whatever the session length.
+    with SessionLocal() as db:
+        result = db.execute(
+            session_rows_query(run_session, *MEASURE_COLUMNS).execution_options(
+                stream_results=True, yield_per=EXPORT_CHUNK_ROWS
+            )
+        )
+        for chunk in result.partitions(EXPORT_CHUNK_ROWS):
+            yield chunk
+
+
+def iter_ndjson(run_session):
+    for chunk in _stream_rows(run_session):
+        lines = []
+        for row in chunk:
+            item = dict(zip(MEASURE_FIELDS, row))
+            item["ts"] = item["ts"].isoformat()
+            lines.append(json.dumps(item))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_csv(run_session):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MEASURE_FIELDS)
+    yield buffer.getvalue().encode("utf-8")
+    for chunk in _stream_rows(run_session):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((row[0].isoformat(),) + tuple(row[1:]) for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+
+
+COLUMNAR_MAGIC = b"ZOLC"
+COLUMNAR_VERSION = 1
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def read_columns(run_session):
+    """Read a session into one typed array per column, straight from the cursor.
+
+    ts is int64 microseconds since the unix epoch (UTC), the rest float64.
+    """
+    columns = {"ts": array("q")}
+    for name in MEASURE_FIELDS[1:]:
+        columns[name] = array("d")
+    ts = columns["ts"]
+    values = [columns[name] for name in MEASURE_FIELDS[1:]]
+    for chunk in _stream_rows(run_session):
+        for row in chunk:
+            ts.append((row[0] - EPOCH) // ONE_MICROSECOND)
+            for column, value in zip(values, row[1:]):
+                column.append(value)
+    return columns
+
+
+def encode_columnar(columns):
+    """Pack columns in the ZOLC v1 layout, all integers little-endian:
+
+        magic      4 bytes  b"ZOLC"
+        version    uint16   1
+        columns    uint16   number of columns
+        rows       uint32   number of rows
+        then for each column:
+            name_len  uint8
+            name      name_len bytes, ascii
+            type      1 byte, "q" (int64) or "d" (float64)
+            data      rows * 8 bytes
+    """
+    rows = len(columns["ts"]) if columns else 0
+    parts = [struct.pack("<4sHHI", COLUMNAR_MAGIC, COLUMNAR_VERSION, len(columns), rows)]
+    for name, values in columns.items():
+        encoded = name.encode("ascii")
+        parts.append(struct.pack("<B", len(encoded)) + encoded + values.typecode.encode("ascii"))
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def decode_columnar(payload):
+    magic, version, count, rows = struct.unpack_from("<4sHHI", payload, 0)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError("not a ZOLC v1 payload")
+    offset = struct.calcsize("<4sHHI")
+    columns = {}
+    for _ in range(count):
+        name_len = payload[offset]
+        name = payload[offset + 1:offset + 1 + name_len].decode("ascii")
+        typecode = chr(payload[offset + 1 + name_len])
+        offset += 2 + name_len
+        values = array(typecode)
+        values.frombytes(payload[offset:offset + rows * values.itemsize])
+        if sys.byteorder == "big":
+            values.byteswap()
+        offset += rows * values.itemsize
+        columns[name] = values
+    return columns
+
+
+def encode_arrow(columns, file_format):
+    rows = len(columns["ts"])
+    fields, arrays = [], []
+    for name, values in columns.items():
+        if name == "ts":
+            arrow_type = pyarrow.timestamp("us")
+        else:
+            arrow_type = pyarrow.float64()
+        # Zero-copy: the Arrow array points at the array.array buffer.
+        arrays.append(pyarrow.Array.from_buffers(arrow_type, rows, [None, pyarrow.py_buffer(values)]))
+        fields.append(pyarrow.field(name, arrow_type, nullable=False))
+    table = pyarrow.Table.from_arrays(arrays, schema=pyarrow.schema(fields))
+
+    sink = pyarrow.BufferOutputStream()
+    if file_format == "parquet":
+        pyarrow.parquet.write_table(table, sink)
+    else:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
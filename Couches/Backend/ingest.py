@@ -0,0 +1,155 @@
+import asyncio
+import os
+import time
+
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "10000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_STAGE_QUEUE_MAX = int(os.getenv("INGEST_STAGE_QUEUE_MAX", "8"))
+
+
+class MqttIngest:
+    """Staged pipeline for telemetry received over MQTT.
+
+    paho's network thread only hands raw payloads to the event loop (submit).
+    A decode stage drains them in batches, decodes and validates each one
+    (decode returns None for payloads to ignore) and groups the survivors by
+    session; a handle stage then passes every session's samples, in arrival
+    order, to handle(session_id, samples). Samples decoded without a session
+    are counted as untagged and handed over under None.
+
+    The raw queue is bounded and drops new payloads when full, since paho's
+    thread must never block; the queue between the stages is bounded too, so
+    a slow handler pushes back on decoding instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        decode,
+        handle,
+        queue_max=INGEST_QUEUE_MAX,
+        batch_size=INGEST_BATCH_SIZE,
+        stage_queue_max=INGEST_STAGE_QUEUE_MAX,
+    ):
+        self.decode = decode
+        self.handle = handle
+        self.queue_max = queue_max
+        self.batch_size = batch_size
+        self.stage_queue_max = stage_queue_max
+        self.loop = None
+        self.raw = None
+        self.decoded = None
+        self.tasks = []
+        self.started_at = None
+        self.stats = {
+            "received": 0,
+            "dropped": 0,
+            "invalid": 0,
+            "skipped": 0,
+            "untagged": 0,
+            "batches": 0,
+            "handled": 0,
+            "handler_errors": 0,
+            "last_batch_size": 0,
+            "last_batch_ms": 0.0,
+        }
+
+    def start(self):
+        if self.tasks:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.raw = asyncio.Queue(maxsize=self.queue_max)
+        self.decoded = asyncio.Queue(maxsize=self.stage_queue_max)
+        self.started_at = time.monotonic()
+        self.tasks = [
+            asyncio.ensure_future(self._decode_stage()),
+            asyncio.ensure_future(self._handle_stage()),
+        ]
+
+    async def stop(self):
+        if not self.tasks:
+            return
+        # The sentinel flows through both stages behind everything queued.
+        self.loop = None
+        await self.raw.put(None)
+        await asyncio.gather(*self.tasks)
+        self.tasks = []
+
+    def submit(self, payload):
+        """Thread-safe; called from paho's network thread."""
+        loop = self.loop
+        if loop is None:
+            self.stats["dropped"] += 1
+            return
+        try:
+            loop.call_soon_threadsafe(self._enqueue, payload)
+        except RuntimeError:
+            # Event loop already closed during shutdown.
+            self.stats["dropped"] += 1
+
+    def _enqueue(self, payload):
+        self.stats["received"] += 1
+        if self.raw.full():
+            self.stats["dropped"] += 1
+            return
+        self.raw.put_nowait(payload)
+
+    async def _decode_stage(self):
+        while True:
+            payloads = [await self.raw.get()]
+            while len(payloads) < self.batch_size and not self.raw.empty():
+                payloads.append(self.raw.get_nowait())
+
+            stopping = payloads[-1] is None
+            groups = {}
+            for payload in payloads:
+                if payload is None:
+                    continue
+                # Grouping stays inside the guard: a malformed payload (for
+                # instance an unhashable session id) must not end the stage.
+                try:
+                    decoded = self.decode(payload)
+                    if decoded is None:
+                        self.stats["skipped"] += 1
+                        continue
+                    session_id, sample = decoded
+                    if session_id is None:
+                        self.stats["untagged"] += 1
+                    groups.setdefault(session_id, []).append(sample)
+                except Exception:
+                    self.stats["invalid"] += 1
+
+            if groups:
+                await self.decoded.put(groups)
+            if stopping:
+                await self.decoded.put(None)
+                return
+
+    async def _handle_stage(self):
+        while True:
+            groups = await self.decoded.get()
+            if groups is None:
+                return
+            started = time.perf_counter()
+            # Sessions are independent; within one, samples keep their order.
+            results = await asyncio.gather(
+                *(self.handle(session_id, samples) for session_id, samples in groups.items()),
+                return_exceptions=True,
+            )
+            size = 0
+            for (session_id, samples), result in zip(groups.items(), results):
+                if isinstance(result, Exception):
+                    self.stats["handler_errors"] += len(samples)
+                else:
+                    size += len(samples)
+            self.stats["batches"] += 1
+            self.stats["handled"] += size
+            self.stats["last_batch_size"] = size
+            self.stats["last_batch_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["raw_depth"] = self.raw.qsize() if self.raw is not None else 0
+        stats["decoded_depth"] = self.decoded.qsize() if self.decoded is not None else 0
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        stats["handled_per_s"] = round(stats["handled"] / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+
+LIVE_QUEUE_MAX = int(os.getenv("LIVE_QUEUE_MAX", "16"))
+LIVE_KEEPALIVE_S = float(os.getenv("LIVE_KEEPALIVE_S", "15"))
+
+
+class LiveHub:
+    """Fans processed samples out to the live viewers of each session.
+
+    The collect path publishes once per sample; every viewer gets its own
+    bounded queue. A viewer whose queue is full has fallen behind: its oldest
+    pending sample is dropped, since only the newest state matters on a live
+    map. Only touched from the event loop, so no locking.
+    """
+
+    def __init__(self, queue_max=LIVE_QUEUE_MAX):
+        self.queue_max = queue_max
+        self.subscribers = {}
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "subscribed": 0}
+
+    def subscribe(self, session_id):
+        queue = asyncio.Queue(maxsize=self.queue_max)
+        self.subscribers.setdefault(session_id, set()).add(queue)
+        self.stats["subscribed"] += 1
+        return queue
+
+    def unsubscribe(self, session_id, queue):
+        queues = self.subscribers.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[session_id]
+
+    def publish(self, session_id, payload):
+        self.stats["published"] += 1
+        for queue in self.subscribers.get(session_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(payload)
+            self.stats["delivered"] += 1
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["sessions"] = len(self.subscribers)
+        stats["viewers"] = sum(len(queues) for queues in self.subscribers.values())
+        return stats
+
+
+def sse_event(payload, event=None):
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(payload)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+async def iter_sse(hub, session_id, initial=None, keepalive_s=LIVE_KEEPALIVE_S):
+    queue = hub.subscribe(session_id)
+    try:
+        # Tell EventSource to wait a little before reconnecting after a drop.
+        yield b"retry: 2000\n\n"
+        if initial is not None:
+            yield sse_event(initial)
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=keepalive_s)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing out an idle stream and tells the
+                # client the stream is alive even when no samples arrive.
+                yield sse_event({}, event="ping")
+                continue
+            yield sse_event(payload)
+    finally:
+        hub.unsubscribe(session_id, queue)
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import bindparam, insert, update
+
+from Couches.Backend.db import Measure, Session, run_db
+from Couches.Backend.rollups import upsert_rollups
+from Couches.Backend.session_stats import upsert_session_stats
+
+MEASURE_BATCH_SIZE = int(os.getenv("MEASURE_BATCH_SIZE", "200"))
+MEASURE_FLUSH_INTERVAL_S = float(os.getenv("MEASURE_FLUSH_INTERVAL_S", "1.0"))
+MEASURE_QUEUE_MAX = int(os.getenv("MEASURE_QUEUE_MAX", "5000"))
+MEASURE_FLUSH_RETRIES = int(os.getenv("MEASURE_FLUSH_RETRIES", "3"))
+
+
+class MeasureWriter:
+    """Write-behind buffer for measures.
+
+    Rows are queued by the collect path and flushed in one transaction when
+    MEASURE_BATCH_SIZE rows are pending or MEASURE_FLUSH_INTERVAL_S elapsed.
+    The queue is bounded: put() waits while it is full. A batch that still
+    fails after MEASURE_FLUSH_RETRIES is bisected, so only the rows that
+    cannot be written are dropped.
+    """
+
+    def __init__(
+        self,
+        engine,
+        batch_size=MEASURE_BATCH_SIZE,
+        flush_interval_s=MEASURE_FLUSH_INTERVAL_S,
+        max_queue=MEASURE_QUEUE_MAX,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_queue = max_queue
+        self.queue = None
+        self.task = None
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "split_flushes": 0,
+            "dropped": 0,
+            "backpressure_waits": 0,
+            "last_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        # Wake the flusher with a sentinel so everything queued before it is written.
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def put(self, row):
+        if self.queue is None:
+            raise RuntimeError("MeasureWriter.put() called before start()")
+        if self.queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self.queue.put(row)
+        self.stats["queued"] += 1
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize() if self.queue is not None else 0
+        flushes = stats["flushes"]
+        stats["avg_flush_ms"] = round(stats["total_flush_ms"] / flushes, 3) if flushes else 0.0
+        stats["avg_flush_size"] = round(stats["written"] / flushes, 2) if flushes else 0.0
+        return stats
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            row = await self.queue.get()
+            if row is None:
+                stopping = True
+            else:
+                batch.append(row)
+                deadline = loop.time() + self.flush_interval_s
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if row is None:
+                        stopping = True
+                        break
+                    batch.append(row)
+
+            if stopping:
+                while not self.queue.empty():
+                    row = self.queue.get_nowait()
+                    if row is not None:
+                        batch.append(row)
+
+            for start in range(0, len(batch), self.batch_size):
+                await self._flush(batch[start:start + self.batch_size])
+
+    async def _flush(self, rows):
+        if not rows:
+            return
+        started = time.perf_counter()
+        for attempt in range(MEASURE_FLUSH_RETRIES):
+            try:
+                await run_db(self._write_batch, rows)
+                break
+            except Exception:
+                self.stats["failed_flushes"] += 1
+                if attempt + 1 < MEASURE_FLUSH_RETRIES:
+                    await asyncio.sleep(0.5)
+        else:
+            await self._isolate(rows)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(rows)
+        self.stats["last_flush_size"] = len(rows)
+        self.stats["last_flush_ms"] = round(elapsed_ms, 3)
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], round(elapsed_ms, 3))
+        self.stats["total_flush_ms"] += elapsed_ms
+
+    async def _isolate(self, rows):
+        # The batch kept failing: bisect it so that only the rows that cannot
+        # be written (FK violation, missing partition, ...) are dropped.
+        if len(rows) == 1:
+            self.stats["dropped"] += 1
+            return
+        middle = len(rows) // 2
+        for part in (rows[:middle], rows[middle:]):
+            self.stats["split_flushes"] += 1
+            try:
+                await run_db(self._write_batch, part)
+            except Exception:
+                await self._isolate(part)
+            else:
+                self.stats["written"] += len(part)
+
+    def _write_batch(self, rows):
+        # Distances are cumulative, so the last row of a session carries its total.
+        totals = {}
+        for row in rows:
+            totals[row["session_id"]] = row["distance_m"]
+
+        with self.engine.begin() as conn:
+            conn.execute(insert(Measure.__table__), rows)
+            conn.execute(
+                update(Session.__table__)
+                .where(Session.__table__.c.id == bindparam("b_id"))
+                .values(total_distance_m=bindparam("b_total")),
+                [{"b_id": session_id, "b_total": total} for session_id, total in totals.items()],
+            )
+            upsert_session_stats(conn, rows)
+            upsert_rollups(conn, rows)
@@ -0,0 +1,63 @@
+"""add indexes for hot read paths
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_credentials_and_devices
+Create Date: 2026-10-17 09:00:00.000000
+"""
+
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_credentials_and_devices"
+branch_labels = None
+depends_on = None
+
+
+def _case_duplicate_emails(conn):
+    rows = conn.execute(
+        sa.text(
+            "SELECT lower(email) AS email, count(*) AS runners FROM runners "
+            "GROUP BY lower(email) HAVING count(*) > 1 ORDER BY lower(email)"
+        )
+    ).all()
+    return [(row[0], row[1]) for row in rows]
+
+
+def upgrade():
+    # Latest measure / measures of a session: WHERE session_id = ? ORDER BY ts.
+    op.create_index("ix_measures_session_ts", "measures", ["session_id", "ts"])
+    # Sessions of a runner: WHERE runner_id = ? ORDER BY started_at DESC.
+    op.create_index("ix_sessions_runner_started", "sessions", ["runner_id", "started_at"])
+
+    # Login/registration lookups; emails are stored normalized but the index
+    # enforces case-insensitive uniqueness regardless of the writer. Older
+    # databases may hold runners whose emails only differ by case: those
+    # cannot be merged automatically, so they get a plain index (the API
+    # checks uniqueness before inserting) and are reported for cleanup.
+    duplicates = _case_duplicate_emails(op.get_bind())
+    if duplicates:
+        listed = ", ".join(f"{email} ({count} runners)" for email, count in duplicates)
+        logging.getLogger("alembic.runtime.migration").warning(
+            "emails registered more than once ignoring case, creating a "
+            "non-unique lower(email) index instead: %s",
+            listed,
+        )
+        op.create_index("ix_runners_email_lower", "runners", [sa.text("lower(email)")])
+        return
+    op.create_index(
+        "uq_runners_email_lower",
+        "runners",
+        [sa.text("lower(email)")],
+        unique=True,
+    )
+
+
+def downgrade():
+    # Either index, depending on what upgrade() found.
+    op.execute("DROP INDEX IF EXISTS uq_runners_email_lower")
+    op.execute("DROP INDEX IF EXISTS ix_runners_email_lower")
+    op.drop_index("ix_sessions_runner_started", table_name="sessions")
+    op.drop_index("ix_measures_session_ts", table_name="measures")
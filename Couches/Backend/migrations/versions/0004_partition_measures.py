@@ -0,0 +1,96 @@
+"""partition measures by month on ts
+
+Revision ID: 0004_partition_measures
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-17 10:00:00.000000
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_partition_measures"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+# Partitions created past the newest row; the backend maintenance task keeps
+# creating them ahead of time afterwards.
+PARTITIONS_AHEAD = 2
+
+MEASURE_COLUMNS = "id, session_id, ts, lat, lon, temperature, humidite, pression, batterie, distance_m"
+
+
+def _add_months(value, months):
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    op.execute("ALTER TABLE measures RENAME TO measures_unpartitioned")
+    op.execute("ALTER TABLE measures_unpartitioned RENAME CONSTRAINT measures_pkey TO measures_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_measures_session_ts RENAME TO ix_measures_unpartitioned_session_ts")
+
+    # The partition key has to be part of the primary key.
+    op.execute(
+        """
+        CREATE TABLE measures (
+            id VARCHAR NOT NULL,
+            session_id VARCHAR NOT NULL REFERENCES sessions (id),
+            ts TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            lat FLOAT NOT NULL,
+            lon FLOAT NOT NULL,
+            temperature FLOAT NOT NULL,
+            humidite FLOAT NOT NULL,
+            pression FLOAT NOT NULL,
+            batterie FLOAT NOT NULL,
+            distance_m FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts)
+        """
+    )
+    op.create_index("ix_measures_session_ts", "measures", ["session_id", "ts"])
+
+    now = datetime.utcnow()
+    first, last = bind.execute(sa.text("SELECT min(ts), max(ts) FROM measures_unpartitioned")).one()
+    first = first or now
+    last = max(last or now, now)
+    start = datetime(first.year, first.month, 1)
+    end = _add_months(datetime(last.year, last.month, 1), PARTITIONS_AHEAD + 1)
+    while start < end:
+        upper = _add_months(start, 1)
+        op.execute(
+            f"CREATE TABLE measures_p{start.year:04d}_{start.month:02d} PARTITION OF measures "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        start = upper
+
+    op.execute(f"INSERT INTO measures ({MEASURE_COLUMNS}) SELECT {MEASURE_COLUMNS} FROM measures_unpartitioned")
+    op.execute("DROP TABLE measures_unpartitioned")
+
+
+def downgrade():
+    op.execute("ALTER TABLE measures RENAME TO measures_partitioned")
+    op.execute("ALTER INDEX ix_measures_session_ts RENAME TO ix_measures_partitioned_session_ts")
+    op.execute("ALTER TABLE measures_partitioned RENAME CONSTRAINT measures_pkey TO measures_partitioned_pkey")
+
+    op.create_table(
+        "measures",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("sessions.id"), nullable=False),
+        sa.Column("ts", sa.DateTime(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("lon", sa.Float(), nullable=False),
+        sa.Column("temperature", sa.Float(), nullable=False),
+        sa.Column("humidite", sa.Float(), nullable=False),
+        sa.Column("pression", sa.Float(), nullable=False),
+        sa.Column("batterie", sa.Float(), nullable=False),
+        sa.Column("distance_m", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_measures_session_ts", "measures", ["session_id", "ts"])
+    op.execute(f"INSERT INTO measures ({MEASURE_COLUMNS}) SELECT {MEASURE_COLUMNS} FROM measures_partitioned")
+    # Drops the partitions with it.
+    op.execute("DROP TABLE measures_partitioned")
@@ -0,0 +1,31 @@
+"""store measure ids as time-ordered native uuids
+
+Revision ID: 0005_measure_uuid7_ids
+Revises: 0004_partition_measures
+Create Date: 2026-10-17 11:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0005_measure_uuid7_ids"
+down_revision = "0004_partition_measures"
+branch_labels = None
+depends_on = None
+
+# UUIDv7 built from the row timestamp: the 48 leading bits of a random uuid
+# are replaced by ts in unix milliseconds and the version nibble goes 4 -> 7.
+UUID7_FROM_TS = (
+    "encode(set_bit(set_bit(overlay(uuid_send(gen_random_uuid()) "
+    "placing substring(int8send(floor(extract(epoch FROM ts) * 1000)::bigint) FROM 3) "
+    "FROM 1 FOR 6), 52, 1), 53, 1), 'hex')::uuid"
+)
+
+
+def upgrade():
+    # Existing uuid4 strings are replaced rather than cast: nothing references
+    # measures.id, and time-ordered ids keep the rebuilt index compact.
+    op.execute(f"ALTER TABLE measures ALTER COLUMN id TYPE uuid USING {UUID7_FROM_TS}")
+
+
+def downgrade():
+    op.execute("ALTER TABLE measures ALTER COLUMN id TYPE varchar USING id::text")
@@ -0,0 +1,64 @@
+"""add incrementally maintained session_stats
+
+Revision ID: 0006_session_stats
+Revises: 0005_measure_uuid7_ids
+Create Date: 2026-10-17 12:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_session_stats"
+down_revision = "0005_measure_uuid7_ids"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "session_stats",
+        sa.Column("session_id", sa.String(), sa.ForeignKey("sessions.id"), primary_key=True),
+        sa.Column("sample_count", sa.Integer(), nullable=False),
+        sa.Column("first_ts", sa.DateTime(), nullable=False),
+        sa.Column("last_ts", sa.DateTime(), nullable=False),
+        sa.Column("temperature_min", sa.Float(), nullable=False),
+        sa.Column("temperature_max", sa.Float(), nullable=False),
+        sa.Column("temperature_sum", sa.Float(), nullable=False),
+        sa.Column("humidite_min", sa.Float(), nullable=False),
+        sa.Column("humidite_max", sa.Float(), nullable=False),
+        sa.Column("humidite_sum", sa.Float(), nullable=False),
+        sa.Column("pression_min", sa.Float(), nullable=False),
+        sa.Column("pression_max", sa.Float(), nullable=False),
+        sa.Column("pression_sum", sa.Float(), nullable=False),
+        sa.Column("batterie_first", sa.Float(), nullable=False),
+        sa.Column("batterie_last", sa.Float(), nullable=False),
+        sa.Column("lat_min", sa.Float(), nullable=False),
+        sa.Column("lat_max", sa.Float(), nullable=False),
+        sa.Column("lon_min", sa.Float(), nullable=False),
+        sa.Column("lon_max", sa.Float(), nullable=False),
+    )
+
+    # One pass over the existing measures; new ones are merged on insert.
+    op.execute(
+        """
+        INSERT INTO session_stats
+        SELECT
+            session_id,
+            count(*),
+            min(ts),
+            max(ts),
+            min(temperature), max(temperature), sum(temperature),
+            min(humidite), max(humidite), sum(humidite),
+            min(pression), max(pression), sum(pression),
+            (array_agg(batterie ORDER BY ts ASC))[1],
+            (array_agg(batterie ORDER BY ts DESC))[1],
+            min(lat), max(lat),
+            min(lon), max(lon)
+        FROM measures
+        GROUP BY session_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("session_stats")
@@ -0,0 +1,81 @@
+"""add time-bucketed measure rollups
+
+Revision ID: 0007_measure_rollups
+Revises: 0006_session_stats
+Create Date: 2026-10-17 13:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_measure_rollups"
+down_revision = "0006_session_stats"
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the rollups resolutions and bucket query at the time of this
+# revision: the backfill must not change with the application's settings.
+ROLLUP_RESOLUTIONS_S = (10, 60, 900)
+ROLLUP_METRICS = ("temperature", "humidite", "pression", "batterie", "distance_m")
+ROLLUP_COLUMNS = ", ".join(
+    f"{metric}_{aggregate}" for metric in ROLLUP_METRICS for aggregate in ("min", "max", "sum", "last")
+)
+ROLLUP_AGGREGATES = ", ".join(
+    f"min({metric}), max({metric}), sum({metric}), (array_agg({metric} ORDER BY ts DESC))[1]"
+    for metric in ROLLUP_METRICS
+)
+BACKFILL_SQL = f"""
+INSERT INTO measure_rollups (
+    session_id, resolution_s, bucket_start, sample_count, last_ts,
+    {ROLLUP_COLUMNS}
+)
+SELECT
+    session_id,
+    :resolution_s,
+    to_timestamp(floor(extract(epoch FROM ts) / :resolution_s) * :resolution_s) AT TIME ZONE 'UTC',
+    count(*),
+    max(ts),
+    {ROLLUP_AGGREGATES}
+FROM measures
+GROUP BY session_id, 3
+"""
+
+
+def upgrade():
+    op.create_table(
+        "measure_rollups",
+        sa.Column("session_id", sa.String(), sa.ForeignKey("sessions.id"), primary_key=True),
+        sa.Column("resolution_s", sa.Integer(), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("sample_count", sa.Integer(), nullable=False),
+        sa.Column("last_ts", sa.DateTime(), nullable=False),
+        sa.Column("temperature_min", sa.Float(), nullable=False),
+        sa.Column("temperature_max", sa.Float(), nullable=False),
+        sa.Column("temperature_sum", sa.Float(), nullable=False),
+        sa.Column("temperature_last", sa.Float(), nullable=False),
+        sa.Column("humidite_min", sa.Float(), nullable=False),
+        sa.Column("humidite_max", sa.Float(), nullable=False),
+        sa.Column("humidite_sum", sa.Float(), nullable=False),
+        sa.Column("humidite_last", sa.Float(), nullable=False),
+        sa.Column("pression_min", sa.Float(), nullable=False),
+        sa.Column("pression_max", sa.Float(), nullable=False),
+        sa.Column("pression_sum", sa.Float(), nullable=False),
+        sa.Column("pression_last", sa.Float(), nullable=False),
+        sa.Column("batterie_min", sa.Float(), nullable=False),
+        sa.Column("batterie_max", sa.Float(), nullable=False),
+        sa.Column("batterie_sum", sa.Float(), nullable=False),
+        sa.Column("batterie_last", sa.Float(), nullable=False),
+        sa.Column("distance_m_min", sa.Float(), nullable=False),
+        sa.Column("distance_m_max", sa.Float(), nullable=False),
+        sa.Column("distance_m_sum", sa.Float(), nullable=False),
+        sa.Column("distance_m_last", sa.Float(), nullable=False),
+    )
+
+    # Existing sessions: same aggregation the rebuild job runs.
+    bind = op.get_bind()
+    for resolution_s in ROLLUP_RESOLUTIONS_S:
+        bind.execute(sa.text(BACKFILL_SQL), {"resolution_s": resolution_s})
+
+
+def downgrade():
+    op.drop_table("measure_rollups")
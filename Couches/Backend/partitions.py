@@ -0,0 +1,105 @@
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+MEASURE_PARTITIONS_AHEAD = int(os.getenv("MEASURE_PARTITIONS_AHEAD", "2"))
+MEASURE_RETENTION_MONTHS = int(os.getenv("MEASURE_RETENTION_MONTHS", "0"))
+MEASURE_RETENTION_MODE = os.getenv("MEASURE_RETENTION_MODE", "drop")
+MEASURE_PARTITION_CHECK_S = float(os.getenv("MEASURE_PARTITION_CHECK_S", "3600"))
+
+PARTITION_NAME_RE = re.compile(r"^measures_p(\d{4})_(\d{2})$")
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start):
+    return f"measures_p{start.year:04d}_{start.month:02d}"
+
+
+def partition_start(name):
+    match = PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(conn):
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = 'measures' AND pg_table_is_visible(c.oid)"
+            )
+        ).scalar()
+    )
+
+
+def list_partitions(conn):
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = 'measures' AND pg_table_is_visible(parent.oid)"
+        )
+    )
+    return [row[0] for row in rows]
+
+
+def ensure_partitions(conn, now, ahead=MEASURE_PARTITIONS_AHEAD, behind=0):
+    created = []
+    existing = set(list_partitions(conn))
+    current = month_start(now)
+    for offset in range(-behind, ahead + 1):
+        start = add_months(current, offset)
+        name = partition_name(start)
+        if name in existing:
+            continue
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF measures "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def expire_partitions(conn, now, retention_months=MEASURE_RETENTION_MONTHS, mode=MEASURE_RETENTION_MODE):
+    # A partition expires once its whole month is older than the retention window.
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -retention_months)
+    expired = []
+    for name in sorted(list_partitions(conn)):
+        start = partition_start(name)
+        if start is None or add_months(start, 1) > cutoff:
+            continue
+        if mode == "detach":
+            conn.execute(text(f"ALTER TABLE measures DETACH PARTITION {name}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    return expired
+
+
+def run_partition_maintenance(engine, now=None):
+    now = now or datetime.utcnow()
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"created": [], "expired": []}
+        created = ensure_partitions(conn, now)
+        expired = expire_partitions(conn, now)
+    return {"created": created, "expired": expired}
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", "200000"))
+KDF_WORKERS = int(os.getenv("KDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+KDF_QUEUE_MAX = int(os.getenv("KDF_QUEUE_MAX", "32"))
+
+
+def hash_password(password, iterations=PASSWORD_ITERATIONS):
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations
+    ).hex()
+    return f"pbkdf2_sha256${iterations}${salt}${digest}"
+
+
+def verify_password(password, encoded):
+    try:
+        algo, iterations, salt, expected = encoded.split("$", 3)
+        if algo != "pbkdf2_sha256":
+            return False
+        digest = hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode("utf-8"),
+            salt.encode("utf-8"),
+            int(iterations),
+        ).hex()
+        return hmac.compare_digest(digest, expected)
+    except Exception:
+        return False
+
+
+def needs_rehash(encoded, iterations=PASSWORD_ITERATIONS):
+    algo, stored_iterations = encoded.split("$", 2)[:2]
+    return algo != "pbkdf2_sha256" or int(stored_iterations) != iterations
+
+
+def verify_and_rehash(password, encoded, iterations=PASSWORD_ITERATIONS):
+    """Return (valid, new_encoded); new_encoded is set when the stored hash
+    used another iteration count and should be replaced."""
+    if not verify_password(password, encoded):
+        return False, None
+    if needs_rehash(encoded, iterations):
+        return True, hash_password(password, iterations)
+    return True, None
+
+
+class KdfSaturated(Exception):
+    pass
+
+
+class KdfPool:
+    """Runs password hashing in worker processes, off the API's threadpool.
+
+    At most workers + queue_max calls are admitted at once; beyond that run()
+    raises KdfSaturated straight away so the caller can answer 503 instead of
+    queueing logins for seconds.
+    """
+
+    def __init__(self, workers=KDF_WORKERS, queue_max=KDF_QUEUE_MAX):
+        self.workers = workers
+        self.limit = workers + queue_max
+        self.executor = None
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stats = {
+            "calls": 0,
+            "rejected": 0,
+            "max_pending": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        }
+
+    def _executor(self):
+        if self.executor is None:
+            # spawn: workers only import this module, not the forked API state.
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def run(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.limit:
+                self.stats["rejected"] += 1
+                raise KdfSaturated("password hashing is saturated, retry shortly")
+            self.pending += 1
+            self.stats["max_pending"] = max(self.stats["max_pending"], self.pending)
+            executor = self._executor()
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with self.lock:
+                self.pending -= 1
+                self.stats["calls"] += 1
+                self.stats["latency_ms_total"] += elapsed_ms
+                self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], elapsed_ms)
+
+    def stop(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["pending"] = self.pending
+            stats["workers"] = self.workers
+        total_ms = stats.pop("latency_ms_total")
+        stats["latency_ms_avg"] = round(total_ms / stats["calls"], 2) if stats["calls"] else None
+        stats["latency_ms_max"] = round(stats["latency_ms_max"], 2)
+        return stats
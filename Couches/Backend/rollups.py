@@ -0,0 +1,180 @@
+"""Time-bucketed rollups of measures at a few fixed resolutions.
+
+Rollups are merged on ingest by the measure writer. To rebuild them from raw
+measures (Postgres only), run from the repository root:
+
+    python -m Couches.Backend.rollups --all
+    python -m Couches.Backend.rollups --session <session_id>
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, create_engine, delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from Couches.Backend.db import DATABASE_URL, MeasureRollup, Session
+
+ROLLUP_RESOLUTIONS_S = tuple(
+    sorted(int(value) for value in os.getenv("ROLLUP_RESOLUTIONS_S", "10,60,900").split(","))
+)
+ROLLUP_METRICS = ("temperature", "humidite", "pression", "batterie", "distance_m")
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(ts, resolution_s):
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % resolution_s)
+
+
+def aggregate_rows(rows, resolutions=ROLLUP_RESOLUTIONS_S):
+    buckets = {}
+    for row in rows:
+        for resolution_s in resolutions:
+            key = (row["session_id"], resolution_s, bucket_start(row["ts"], resolution_s))
+            current = buckets.get(key)
+            if current is None:
+                current = {
+                    "session_id": key[0],
+                    "resolution_s": resolution_s,
+                    "bucket_start": key[2],
+                    "sample_count": 0,
+                    "last_ts": row["ts"],
+                }
+                for metric in ROLLUP_METRICS:
+                    current[f"{metric}_min"] = row[metric]
+                    current[f"{metric}_max"] = row[metric]
+                    current[f"{metric}_sum"] = 0.0
+                    current[f"{metric}_last"] = row[metric]
+                buckets[key] = current
+
+            current["sample_count"] += 1
+            newest = row["ts"] >= current["last_ts"]
+            if newest:
+                current["last_ts"] = row["ts"]
+            for metric in ROLLUP_METRICS:
+                value = row[metric]
+                current[f"{metric}_min"] = min(current[f"{metric}_min"], value)
+                current[f"{metric}_max"] = max(current[f"{metric}_max"], value)
+                current[f"{metric}_sum"] += value
+                if newest:
+                    current[f"{metric}_last"] = value
+    return list(buckets.values())
+
+
+def upsert_rollups(conn, rows):
+    """Merge a batch of measure rows into measure_rollups on conn's transaction."""
+    partials = aggregate_rows(rows)
+    if not partials:
+        return
+
+    if conn.dialect.name == "postgresql":
+        insert, least, greatest = postgresql.insert, func.least, func.greatest
+    else:
+        insert, least, greatest = sqlite.insert, func.min, func.max
+
+    table = MeasureRollup.__table__
+    stmt = insert(table)
+    new, old = stmt.excluded, table.c
+    newer = new.last_ts >= old.last_ts
+    values = {
+        "sample_count": old.sample_count + new.sample_count,
+        "last_ts": greatest(old.last_ts, new.last_ts),
+    }
+    for metric in ROLLUP_METRICS:
+        values[f"{metric}_min"] = least(old[f"{metric}_min"], new[f"{metric}_min"])
+        values[f"{metric}_max"] = greatest(old[f"{metric}_max"], new[f"{metric}_max"])
+        values[f"{metric}_sum"] = old[f"{metric}_sum"] + new[f"{metric}_sum"]
+        values[f"{metric}_last"] = case((newer, new[f"{metric}_last"]), else_=old[f"{metric}_last"])
+
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[old.session_id, old.resolution_s, old.bucket_start], set_=values
+        ),
+        partials,
+    )
+
+
+def pick_resolution(duration_s, points, resolutions=ROLLUP_RESOLUTIONS_S):
+    # Coarsest resolution that still yields at least `points` buckets.
+    for resolution_s in sorted(resolutions, reverse=True):
+        if duration_s / resolution_s >= points:
+            return resolution_s
+    return min(resolutions)
+
+
+def rollup_payload(rollup):
+    count = rollup.sample_count
+    payload = {"ts": rollup.bucket_start.isoformat(), "count": count}
+    for metric in ROLLUP_METRICS:
+        payload[metric] = {
+            "min": getattr(rollup, f"{metric}_min"),
+            "max": getattr(rollup, f"{metric}_max"),
+            "avg": round(getattr(rollup, f"{metric}_sum") / count, 3),
+            "last": getattr(rollup, f"{metric}_last"),
+        }
+    return payload
+
+
+REBUILD_SQL = """
+INSERT INTO measure_rollups (
+    session_id, resolution_s, bucket_start, sample_count, last_ts,
+    {columns}
+)
+SELECT
+    session_id,
+    :resolution_s,
+    to_timestamp(floor(extract(epoch FROM ts) / :resolution_s) * :resolution_s) AT TIME ZONE 'UTC',
+    count(*),
+    max(ts),
+    {aggregates}
+FROM measures
+WHERE session_id = :session_id
+GROUP BY session_id, 3
+"""
+
+
+def _rebuild_statement():
+    columns, aggregates = [], []
+    for metric in ROLLUP_METRICS:
+        columns += [f"{metric}_min", f"{metric}_max", f"{metric}_sum", f"{metric}_last"]
+        aggregates += [
+            f"min({metric})",
+            f"max({metric})",
+            f"sum({metric})",
+            f"(array_agg({metric} ORDER BY ts DESC))[1]",
+        ]
+    return text(REBUILD_SQL.format(columns=", ".join(columns), aggregates=", ".join(aggregates)))
+
+
+def rebuild_session_rollups(conn, session_id, resolutions=ROLLUP_RESOLUTIONS_S):
+    conn.execute(delete(MeasureRollup.__table__).where(MeasureRollup.session_id == session_id))
+    statement = _rebuild_statement()
+    for resolution_s in resolutions:
+        conn.execute(statement, {"session_id": session_id, "resolution_s": resolution_s})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild measure rollups from raw measures")
+    parser.add_argument("--session", action="append", default=[], help="Session id (repeatable)")
+    parser.add_argument("--all", action="store_true", help="Rebuild every session")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, future=True)
+    session_ids = list(args.session)
+    if args.all:
+        with engine.connect() as conn:
+            session_ids = [row[0] for row in conn.execute(select(Session.id))]
+    if not session_ids:
+        parser.error("pass --session or --all")
+
+    for session_id in session_ids:
+        with engine.begin() as conn:
+            rebuild_session_rollups(conn, session_id)
+        print(f"{session_id}: rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from Couches.Backend.db import SessionStats
+
+METRICS = ("temperature", "humidite", "pression")
+
+
+def aggregate_rows(rows):
+    """Fold measure rows into one partial session_stats row per session."""
+    stats = {}
+    for row in rows:
+        current = stats.get(row["session_id"])
+        if current is None:
+            current = {
+                "session_id": row["session_id"],
+                "sample_count": 0,
+                "first_ts": row["ts"],
+                "last_ts": row["ts"],
+                "batterie_first": row["batterie"],
+                "batterie_last": row["batterie"],
+                "lat_min": row["lat"],
+                "lat_max": row["lat"],
+                "lon_min": row["lon"],
+                "lon_max": row["lon"],
+            }
+            for metric in METRICS:
+                current[f"{metric}_min"] = row[metric]
+                current[f"{metric}_max"] = row[metric]
+                current[f"{metric}_sum"] = 0.0
+            stats[row["session_id"]] = current
+
+        current["sample_count"] += 1
+        if row["ts"] < current["first_ts"]:
+            current["first_ts"] = row["ts"]
+            current["batterie_first"] = row["batterie"]
+        if row["ts"] >= current["last_ts"]:
+            current["last_ts"] = row["ts"]
+            current["batterie_last"] = row["batterie"]
+        current["lat_min"] = min(current["lat_min"], row["lat"])
+        current["lat_max"] = max(current["lat_max"], row["lat"])
+        current["lon_min"] = min(current["lon_min"], row["lon"])
+        current["lon_max"] = max(current["lon_max"], row["lon"])
+        for metric in METRICS:
+            current[f"{metric}_min"] = min(current[f"{metric}_min"], row[metric])
+            current[f"{metric}_max"] = max(current[f"{metric}_max"], row[metric])
+            current[f"{metric}_sum"] += row[metric]
+    return list(stats.values())
+
+
+def upsert_session_stats(conn, rows):
+    """Merge a batch of measure rows into session_stats on conn's transaction."""
+    partials = aggregate_rows(rows)
+    if not partials:
+        return
+
+    if conn.dialect.name == "postgresql":
+        insert, least, greatest = postgresql.insert, func.least, func.greatest
+    else:
+        # SQLite's multi-argument min()/max() are its LEAST/GREATEST.
+        insert, least, greatest = sqlite.insert, func.min, func.max
+
+    table = SessionStats.__table__
+    stmt = insert(table)
+    new, old = stmt.excluded, table.c
+    values = {
+        "sample_count": old.sample_count + new.sample_count,
+        "first_ts": least(old.first_ts, new.first_ts),
+        "last_ts": greatest(old.last_ts, new.last_ts),
+        "batterie_first": case(
+            (new.first_ts < old.first_ts, new.batterie_first), else_=old.batterie_first
+        ),
+        "batterie_last": case(
+            (new.last_ts >= old.last_ts, new.batterie_last), else_=old.batterie_last
+        ),
+    }
+    for column in ("lat", "lon") + METRICS:
+        values[f"{column}_min"] = least(old[f"{column}_min"], new[f"{column}_min"])
+        values[f"{column}_max"] = greatest(old[f"{column}_max"], new[f"{column}_max"])
+    for metric in METRICS:
+        values[f"{metric}_sum"] = old[f"{metric}_sum"] + new[f"{metric}_sum"]
+
+    conn.execute(stmt.on_conflict_do_update(index_elements=[old.session_id], set_=values), partials)
+
+
+def stats_payload(stats):
+    if stats is None or not stats.sample_count:
+        return None
+    count = stats.sample_count
+    payload = {
+        "sample_count": count,
+        "first_ts": stats.first_ts.isoformat(),
+        "last_ts": stats.last_ts.isoformat(),
+        "duration_s": (stats.last_ts - stats.first_ts).total_seconds(),
+        "battery_drop": round(stats.batterie_first - stats.batterie_last, 2),
+        "bbox": {
+            "min_lat": stats.lat_min,
+            "min_lon": stats.lon_min,
+            "max_lat": stats.lat_max,
+            "max_lon": stats.lon_max,
+        },
+    }
+    for metric in METRICS:
+        payload[metric] = {
+            "min": getattr(stats, f"{metric}_min"),
+            "max": getattr(stats, f"{metric}_max"),
+            "avg": round(getattr(stats, f"{metric}_sum") / count, 2),
+        }
+    return payload
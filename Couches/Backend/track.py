@@ -0,0 +1,162 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from Couches.Backend.db import Measure, SessionLocal
+from Couches.Backend.export import after_cursor, encode_cursor, session_rows_query
+
+TRACK_CACHE_MAX = int(os.getenv("TRACK_CACHE_MAX", "256"))
+TRACK_MIN_TOLERANCE_M = float(os.getenv("TRACK_MIN_TOLERANCE_M", "0.5"))
+
+EARTH_RADIUS_M = 6371000.0
+# Web Mercator ground resolution at zoom 0 on the equator, in metres per pixel.
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def tolerance_for_zoom(zoom, latitude):
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def simplify_indices(points, tolerance_m):
+    """Douglas-Peucker on (lat, lon) points; returns the indices to keep.
+
+    Distances use a local equirectangular projection, which is accurate well
+    below a metre over the extent of a run.
+    """
+    n = len(points)
+    if n < 3:
+        return list(range(n))
+
+    kx = EARTH_RADIUS_M * math.cos(math.radians(points[0][0])) * math.pi / 180.0
+    ky = EARTH_RADIUS_M * math.pi / 180.0
+    xy = [(lon * kx, lat * ky) for lat, lon in points]
+    tolerance_sq = tolerance_m * tolerance_m
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        worst, worst_sq = None, tolerance_sq
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if length_sq == 0.0:
+                t = 0.0
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+            ex, ey = ax + t * dx - px, ay + t * dy - py
+            dist_sq = ex * ex + ey * ey
+            if dist_sq > worst_sq:
+                worst, worst_sq = i, dist_sq
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def encode_polyline(points, precision=5):
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        ilat = int(round(lat * factor))
+        ilon = int(round(lon * factor))
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
+
+
+def clip_to_bbox(points, bbox):
+    # Splits the track into the runs that touch the viewport, keeping one
+    # vertex on each side so segments crossing the edge still get drawn.
+    min_lat, min_lon, max_lat, max_lon = bbox
+    inside = [min_lat <= lat <= max_lat and min_lon <= lon <= max_lon for lat, lon in points]
+    runs, current = [], []
+    for i, point in enumerate(points):
+        near = inside[i] or (i > 0 and inside[i - 1]) or (i + 1 < len(points) and inside[i + 1])
+        if near:
+            current.append(point)
+        elif current:
+            runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+    return runs
+
+
+class TrackCache:
+    """Simplified tracks per (session, tolerance), extended as measures arrive.
+
+    Each entry keeps the vertices that are final plus the raw points after the
+    second-to-last kept vertex. A refresh only loads measures past the stored
+    cursor and re-simplifies that short tail.
+    """
+
+    def __init__(self, max_entries=TRACK_CACHE_MAX):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "points_loaded": 0}
+
+    def _entry(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+            self.stats["misses"] += 1
+            entry = {"lock": threading.Lock(), "cursor": None, "frozen": [], "tail": [], "track": []}
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            return entry
+
+    def track(self, run_session, tolerance_m):
+        tolerance_m = max(round(tolerance_m, 1), TRACK_MIN_TOLERANCE_M)
+        entry = self._entry((run_session.id, tolerance_m))
+        with entry["lock"]:
+            new_points = self._load_new_points(run_session, entry)
+            if new_points or not entry["track"]:
+                self._extend(entry, new_points, tolerance_m)
+            return entry["track"], tolerance_m
+
+    def _load_new_points(self, run_session, entry):
+        query = after_cursor(
+            session_rows_query(run_session, Measure.ts, Measure.id, Measure.lat, Measure.lon),
+            entry["cursor"],
+        )
+        with SessionLocal() as db:
+            rows = db.execute(query).all()
+        if rows:
+            entry["cursor"] = encode_cursor(rows[-1][0], rows[-1][1])
+            self.stats["points_loaded"] += len(rows)
+        return [(row[2], row[3]) for row in rows]
+
+    def _extend(self, entry, new_points, tolerance_m):
+        tail = entry["tail"] + new_points
+        kept = simplify_indices(tail, tolerance_m)
+        if len(kept) > 2:
+            entry["frozen"].extend(tail[i] for i in kept[:-2])
+            tail = tail[kept[-2]:]
+            kept = [0, kept[-1] - kept[-2]]
+        entry["tail"] = tail
+        entry["track"] = entry["frozen"] + [tail[i] for i in kept]
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        return stats
@@ -1,28 +1,22 @@
 import asyncio
-import json
-import time
-import os
 
 import aiocoap
 import aiocoap.resource as resource
 
+from Couches.CoAPServices.observe import SensorResource, deadband
 from Couches.Couche1.EndDevices.Batterie import BatterieSensor
 
 
-class BatteryResource(resource.Resource):
+class BatteryResource(SensorResource):
+    deadbands = {"batterie": deadband("batterie", 1.0)}
+
     def __init__(self):
         super().__init__()
         self.sensor = BatterieSensor(niveau_initial=100)
-        self.key = os.getenv("SHARED_KEY", "zolis-key")
 
-    async def render_get(self, request):
+    def sample(self):
         self.sensor.simulate_drain(taux_drain=0.3)
-        payload = {
-            "batterie": self.sensor.get_niveau(),
-            "timestamp": time.time(),
-            "key": self.key,
-        }
-        return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
+        return {"batterie": self.sensor.get_niveau()}
 
 
 def main():
@@ -1,30 +1,24 @@
 import asyncio
-import json
-import time
-import os
 
 import aiocoap
 import aiocoap.resource as resource
 
+from Couches.CoAPServices.observe import SensorResource, deadband
 from Couches.Couche1.EndDevices.GPS import GPSSensor
 
 
-class GPSResource(resource.Resource):
+class GPSResource(SensorResource):
+    # ~3 m at Paris latitude.
+    deadbands = {"lat": deadband("lat", 0.00003), "lon": deadband("lon", 0.00004)}
+
     def __init__(self):
         super().__init__()
         self.sensor = GPSSensor(latitude=48.8566, longitude=2.3522)
-        self.key = os.getenv("SHARED_KEY", "zolis-key")
 
-    async def render_get(self, request):
+    def sample(self):
         self.sensor.simulate_movement(delta_latitude=0.0004, delta_longitude=0.0003)
         lat, lon = self.sensor.get_coordinates()
-        payload = {
-            "lat": lat,
-            "lon": lon,
-            "timestamp": time.time(),
-            "key": self.key,
-        }
-        return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
+        return {"lat": lat, "lon": lon}
 
 
 def main():
@@ -1,13 +1,18 @@
 import asyncio
+import ipaddress
 import json
 import os
 import random
-import socket
 import time
+from functools import partial
 
 import aiocoap
 import aiocoap.resource as resource
 
+from Couches.CoAPServices.observe import SensorObservations
+from Couches.CoAPServices.resolver import AddressFile, HostResolver
+from Couches.CoAPServices.transport import TransportRacer
+
 
 COAP_GPS_HOST = os.getenv("COAP_GPS_HOST", "coap-gps")
 COAP_BATTERY_HOST = os.getenv("COAP_BATTERY_HOST", "coap-batt")
@@ -21,9 +26,19 @@ USE_THREAD_URI = os.getenv("USE_THREAD_URI", "1") == "1"
 STRICT_THREAD = os.getenv("STRICT_THREAD", "0") == "1"
 THREAD_TRY_TIMEOUT = float(os.getenv("THREAD_TRY_TIMEOUT", "1.0"))
 IPV4_TRY_TIMEOUT = float(os.getenv("IPV4_TRY_TIMEOUT", "2.5"))
+DEVICE_TIMEOUT = float(os.getenv("DEVICE_TIMEOUT", "2.5"))
+SENSOR_FRESH_S = float(os.getenv("SENSOR_FRESH_S", "1.0"))
+OBSERVE_SENSORS = os.getenv("OBSERVE_SENSORS", "1") == "1"
 
 CANDIDATES = ["gps", "temperature", "batterie"]
 
+# Learned Thread/IPv4 preference and RTTs, per shared sensor.
+transports = TransportRacer()
+resolver = HostResolver()
+gps_addr = AddressFile(GPS_ADDR_FILE)
+battery_addr = AddressFile(BATTERY_ADDR_FILE)
+temp_addr = AddressFile(TEMP_ADDR_FILE)
+
 
 class LeaderState:
     def __init__(self):
@@ -43,61 +58,168 @@ async def coap_get(protocol, uri, timeout_s=3.0):
     return json.loads(payload)
 
 
-def _resolve_ipv4(host):
-    try:
-        return socket.gethostbyname(host)
-    except Exception:
-        return host
-
-
-def _addr_from_file(path):
-    if not path:
-        return None
-    try:
-        with open(path, "r", encoding="utf-8") as handle:
-            addr = handle.read().strip()
-        return addr or None
-    except Exception:
-        return None
-
-
-def _coap_sensor_uris(addr_file, host, resource_name):
+async def _coap_sensor_uris(addr_file, host, resource_name):
     thread_uri = None
     if USE_THREAD_URI:
-        addr = _addr_from_file(addr_file)
+        addr = addr_file.read()
         if addr:
             thread_uri = f"coap://[{addr}]/{resource_name}"
         elif STRICT_THREAD:
-            raise RuntimeError(f"thread address missing for {resource_name}: {addr_file}")
-    ipv4_uri = f"coap://{_resolve_ipv4(host)}/{resource_name}"
+            raise RuntimeError(f"thread address missing for {resource_name}: {addr_file.path}")
+    ipv4_uri = f"coap://{await resolver.resolve(host)}/{resource_name}"
     return thread_uri, ipv4_uri
 
 
 async def coap_get_with_fallback(protocol, addr_file, host, resource_name):
-    errors = []
-    thread_uri, ipv4_uri = _coap_sensor_uris(addr_file, host, resource_name)
-
+    thread_uri, ipv4_uri = await _coap_sensor_uris(addr_file, host, resource_name)
+    candidates = []
     if thread_uri:
-        try:
-            return await coap_get(protocol, thread_uri, timeout_s=THREAD_TRY_TIMEOUT)
-        except Exception as exc:
-            errors.append(f"{thread_uri} -> {type(exc).__name__}: {exc}")
-            if STRICT_THREAD:
-                raise RuntimeError(
-                    f"{resource_name} unreachable in strict thread mode; {' | '.join(errors)}"
-                )
+        candidates.append(("thread", thread_uri, THREAD_TRY_TIMEOUT))
+    # Strict mode never falls back to IPv4 once a Thread address is known.
+    if not (STRICT_THREAD and thread_uri):
+        candidates.append(("ipv4", ipv4_uri, IPV4_TRY_TIMEOUT))
 
     try:
-        return await coap_get(protocol, ipv4_uri, timeout_s=IPV4_TRY_TIMEOUT)
+        return await transports.race(
+            resource_name,
+            candidates,
+            lambda uri, timeout_s: coap_get(protocol, uri, timeout_s=timeout_s),
+        )
+    except RuntimeError as exc:
+        mode = " in strict thread mode" if STRICT_THREAD and thread_uri else ""
+        raise RuntimeError(f"{resource_name} unreachable{mode}; {exc}")
+
+
+def _device_uri(addr, resource_name):
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        raise RuntimeError(f"invalid device address for {resource_name}: {addr!r}")
+    host = f"[{ip}]" if ip.version == 6 else str(ip)
+    return f"coap://{host}/{resource_name}"
+
+
+async def coap_get_device(protocol, addr, resource_name):
+    # A runner's own sensor: no fallback to the shared hosts, whose readings
+    # would belong to somebody else.
+    uri = _device_uri(addr, resource_name)
+    try:
+        return await coap_get(protocol, uri, timeout_s=DEVICE_TIMEOUT)
     except Exception as exc:
-        errors.append(f"{ipv4_uri} -> {type(exc).__name__}: {exc}")
-        raise RuntimeError(f"{resource_name} unreachable; {' | '.join(errors)}")
+        raise RuntimeError(f"{resource_name} unreachable; {uri} -> {type(exc).__name__}: {exc}")
+
+
+class SensorReadings:
+    """Recent sensor readings, shared between concurrent collects.
+
+    A reading younger than fresh_s is served from memory, and a collect that
+    needs a reading already being fetched waits for that request instead of
+    sending its own, so radio traffic follows the sample rate rather than the
+    number of callers. Failures are not cached: the next collect retries.
+
+    With observations, a sensor's latest notification is served first; the
+    GET path only covers sensors whose observation is not up yet or has not
+    notified within the collect cadence.
+    """
+
+    def __init__(self, fresh_s=SENSOR_FRESH_S, observations=None):
+        self.fresh_s = fresh_s
+        self.observations = observations
+        self.entries = {}
+        self.flights = {}
+        self.stats = {"hits": 0, "shared": 0, "fetches": 0, "errors": 0}
+
+    async def get(self, key, fetch, observe_uri=None):
+        if self.observations is not None and observe_uri is not None:
+            value = self.observations.latest(key)
+            if value is not None:
+                return value
+            self.observations.ensure(key, observe_uri)
+
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and now - entry[0] < self.fresh_s:
+            self.stats["hits"] += 1
+            return entry[1]
+
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.stats["shared"] += 1
+        else:
+            self.stats["fetches"] += 1
+            self._prune(now)
+            flight = asyncio.ensure_future(fetch())
+            self.flights[key] = flight
+            flight.add_done_callback(lambda done: self._landed(key, now, done))
+        # shield: a cancelled collect must not cancel the fetch others wait on.
+        return await asyncio.shield(flight)
+
+    def _landed(self, key, started, flight):
+        self.flights.pop(key, None)
+        if flight.cancelled():
+            return
+        if flight.exception() is not None:
+            self.stats["errors"] += 1
+            return
+        # Age is counted from the request, not the response.
+        self.entries[key] = (started, flight.result())
+
+    def _prune(self, now):
+        stale = [key for key, entry in self.entries.items() if now - entry[0] >= self.fresh_s]
+        for key in stale:
+            del self.entries[key]
+
+
+def _device_observe_uri(addr, resource_name):
+    async def uri():
+        return _device_uri(addr, resource_name)
+
+    return uri
+
+
+def _shared_observe_uri(addr_file, host, resource_name):
+    async def uri():
+        thread_uri, ipv4_uri = await _coap_sensor_uris(addr_file, host, resource_name)
+        # Observe over the path the GET races currently prefer.
+        if thread_uri and (STRICT_THREAD or transports.preferred.get(resource_name) != "ipv4"):
+            return thread_uri
+        return ipv4_uri
+
+    return uri
+
+
+def _sensor_requests(protocol, readings, devices):
+    # Keyed by sensor address (None for the shared sensors) and resource.
+    if devices:
+        return tuple(
+            readings.get(
+                (devices.get(device), resource_name),
+                partial(coap_get_device, protocol, devices.get(device), resource_name),
+                _device_observe_uri(devices.get(device), resource_name),
+            )
+            for device, resource_name in (("gps", "gps"), ("batterie", "battery"), ("temperature", "temperature"))
+        )
+    return tuple(
+        readings.get(
+            (None, resource_name),
+            partial(coap_get_with_fallback, protocol, addr_file, host, resource_name),
+            _shared_observe_uri(addr_file, host, resource_name),
+        )
+        for addr_file, host, resource_name in (
+            (gps_addr, COAP_GPS_HOST, "gps"),
+            (battery_addr, COAP_BATTERY_HOST, "battery"),
+            (temp_addr, COAP_TEMP_HOST, "temperature"),
+        )
+    )
 
 
 class CollectResource(resource.Resource):
-    def __init__(self, state):
+    def __init__(self, state, protocol, readings=None):
         super().__init__()
         self.state = state
+        # One client context for the leader's lifetime, shared by every collect.
+        self.protocol = protocol
+        self.readings = readings if readings is not None else SensorReadings()
 
     async def render_post(self, request):
         self.state.maybe_rotate()
@@ -108,16 +230,9 @@ class CollectResource(resource.Resource):
         if data.get("key") != SHARED_KEY:
             return aiocoap.Message(code=aiocoap.UNAUTHORIZED, payload=b"invalid key")
 
-        protocol = await aiocoap.Context.create_client_context()
-        try:
-            gps_task = coap_get_with_fallback(protocol, GPS_ADDR_FILE, COAP_GPS_HOST, "gps")
-            batt_task = coap_get_with_fallback(
-                protocol, BATTERY_ADDR_FILE, COAP_BATTERY_HOST, "battery"
-            )
-            temp_task = coap_get_with_fallback(protocol, TEMP_ADDR_FILE, COAP_TEMP_HOST, "temperature")
-            gps, batt, temp = await asyncio.gather(gps_task, batt_task, temp_task)
-        finally:
-            await protocol.shutdown()
+        devices = data.get("devices") if isinstance(data.get("devices"), dict) else None
+
+        gps, batt, temp = await asyncio.gather(*_sensor_requests(self.protocol, self.readings, devices))
 
         payload = {
             "leader_id": self.state.current_leader,
@@ -131,9 +246,11 @@ class CollectResource(resource.Resource):
 
 def main():
     state = LeaderState()
-    root = resource.Site()
-    root.add_resource(["collect"], CollectResource(state))
     loop = asyncio.get_event_loop()
+    protocol = loop.run_until_complete(aiocoap.Context.create_client_context())
+    observations = SensorObservations(protocol) if OBSERVE_SENSORS else None
+    root = resource.Site()
+    root.add_resource(["collect"], CollectResource(state, protocol, SensorReadings(observations=observations)))
     loop.run_until_complete(aiocoap.Context.create_server_context(root, bind=("0.0.0.0", 5683)))
     print("coap-leader listening on 0.0.0.0:5683", flush=True)
     loop.run_forever()
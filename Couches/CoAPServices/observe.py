@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import time
+
+import aiocoap
+import aiocoap.resource as resource
+
+OBSERVE_PERIOD_S = float(os.getenv("OBSERVE_PERIOD_S", "2"))
+OBSERVE_KEEPALIVE_S = float(os.getenv("OBSERVE_KEEPALIVE_S", str(4 * OBSERVE_PERIOD_S)))
+OBSERVE_STALE_S = float(os.getenv("OBSERVE_STALE_S", str(OBSERVE_KEEPALIVE_S + OBSERVE_PERIOD_S + 1)))
+OBSERVE_IDLE_S = float(os.getenv("OBSERVE_IDLE_S", "60"))
+# Backend collect cadence (SCHEDULE_INTERVAL_S): older notifications are not
+# served, so a collect never stores a reading it already stored.
+OBSERVE_MAX_AGE_S = float(os.getenv("OBSERVE_MAX_AGE_S", "2.5"))
+OBSERVE_RETRY_S = float(os.getenv("OBSERVE_RETRY_S", "5"))
+OBSERVE_TIMEOUT_S = float(os.getenv("OBSERVE_TIMEOUT_S", "2.5"))
+
+
+def deadband(metric, default):
+    return float(os.getenv(f"OBSERVE_DEADBAND_{metric.upper()}", str(default)))
+
+
+class SensorResource(resource.ObservableResource):
+    """Sensor reading that can be observed (RFC 7641).
+
+    Subclasses implement sample() and list their metrics' deadbands. While
+    observed, the sensor is sampled every period_s and observers are notified when a metric moved
+    by more than its deadband since the last reading sent, or after
+    keepalive_s without a notification. Plain GETs always get a fresh sample
+    and do not count as a notification.
+    """
+
+    deadbands = {}
+
+    def __init__(self, period_s=OBSERVE_PERIOD_S, keepalive_s=OBSERVE_KEEPALIVE_S):
+        super().__init__()
+        self.period_s = period_s
+        self.keepalive_s = keepalive_s
+        self.key = os.getenv("SHARED_KEY", "zolis-key")
+        self.ticker = None
+        self.current = None
+        self.sent = None
+        self.sent_at = 0.0
+        self.stats = {"samples": 0, "notifications": 0, "observers": 0}
+
+    def sample(self):
+        raise NotImplementedError
+
+    def _sample(self):
+        self.stats["samples"] += 1
+        self.current = dict(self.sample(), timestamp=time.time())
+        return self.current
+
+    def moved(self, previous, values):
+        return any(
+            abs(values[metric] - previous[metric]) > band
+            for metric, band in self.deadbands.items()
+            if values.get(metric) is not None and previous.get(metric) is not None
+        )
+
+    def update_observation_count(self, newcount):
+        self.stats["observers"] = newcount
+        if newcount and self.ticker is None:
+            self.ticker = asyncio.ensure_future(self._tick())
+        elif not newcount and self.ticker is not None:
+            self.ticker.cancel()
+            self.ticker = None
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.period_s)
+            values = self._sample()
+            due = time.monotonic() - self.sent_at >= self.keepalive_s
+            if due or self.sent is None or self.moved(self.sent, values):
+                self.stats["notifications"] += 1
+                # Observers get the reading re-rendered through render_get.
+                self.updated_state()
+
+    async def render_get(self, request):
+        if request.opt.observe is None:
+            payload = dict(self._sample(), key=self.key)
+            return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
+        # Registration or notification: what observers get is what was sent.
+        values = self.current if self.ticker is not None and self.current is not None else self._sample()
+        self.sent = values
+        self.sent_at = time.monotonic()
+        payload = dict(values, key=self.key)
+        return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
+
+
+class SensorObservations:
+    """Observations the leader keeps open on the sensors it reads.
+
+    latest(key) returns the last notified reading while it is younger than
+    max_age_s, and None otherwise so the caller reads the sensor itself. An
+    observation silent for longer than stale_s (the sensors' keepalive plus a
+    period) is restarted, and one nobody asked about for idle_s (a runner that
+    stopped) is dropped.
+    """
+
+    def __init__(
+        self,
+        protocol,
+        stale_s=OBSERVE_STALE_S,
+        idle_s=OBSERVE_IDLE_S,
+        retry_s=OBSERVE_RETRY_S,
+        max_age_s=OBSERVE_MAX_AGE_S,
+    ):
+        self.protocol = protocol
+        self.stale_s = stale_s
+        self.max_age_s = max_age_s
+        self.idle_s = idle_s
+        self.retry_s = retry_s
+        self.entries = {}
+        self.stats = {"started": 0, "served": 0, "notifications": 0, "restarts": 0, "unsupported": 0, "dropped": 0}
+
+    def latest(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        entry["used"] = now
+        if entry["value"] is not None and now - entry["at"] < self.max_age_s:
+            self.stats["served"] += 1
+            return entry["value"]
+        return None
+
+    def ensure(self, key, uri):
+        """Observe key's sensor; uri() is awaited for its current URI."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            return
+        self.stats["started"] += 1
+        entry = {"value": None, "at": 0.0, "used": time.monotonic()}
+        self.entries[key] = entry
+        entry["task"] = asyncio.ensure_future(self._observe(key, entry, uri))
+
+    def _store(self, entry, response):
+        if not response.code.is_successful():
+            raise RuntimeError(f"observation refused: {response.code}")
+        entry["value"] = json.loads(response.payload.decode("utf-8", errors="replace"))
+        entry["at"] = time.monotonic()
+        self.stats["notifications"] += 1
+
+    def _idle(self, entry):
+        return time.monotonic() - entry["used"] >= self.idle_s
+
+    async def _observe(self, key, entry, uri):
+        try:
+            while not self._idle(entry):
+                pending = None
+                try:
+                    request = aiocoap.Message(code=aiocoap.GET, uri=await uri(), observe=0)
+                    pending = self.protocol.request(request)
+                    first = await asyncio.wait_for(pending.response, OBSERVE_TIMEOUT_S)
+                    if first.opt.observe is None:
+                        # Sensor without Observe support: leave it to polling.
+                        self.stats["unsupported"] += 1
+                        await asyncio.sleep(self.idle_s)
+                        continue
+                    self._store(entry, first)
+                    notifications = pending.observation.__aiter__()
+                    while not self._idle(entry):
+                        # The sensor notifies at least every keepalive: silence
+                        # means the observation died on its side.
+                        response = await asyncio.wait_for(notifications.__anext__(), self.stale_s)
+                        self._store(entry, response)
+                except Exception:
+                    # Includes StopAsyncIteration: the sensor ended it.
+                    self.stats["restarts"] += 1
+                finally:
+                    if pending is not None and pending.observation is not None and not pending.observation.cancelled:
+                        pending.observation.cancel()
+                if not self._idle(entry):
+                    await asyncio.sleep(self.retry_s)
+        finally:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+            self.stats["dropped"] += 1
+
+    def stop(self):
+        for entry in list(self.entries.values()):
+            entry["task"].cancel()
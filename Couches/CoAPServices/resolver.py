@@ -0,0 +1,111 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import time
+
+DNS_TTL_S = float(os.getenv("DNS_TTL_S", "30"))
+DNS_NEGATIVE_TTL_S = float(os.getenv("DNS_NEGATIVE_TTL_S", "5"))
+ADDR_FILE_CHECK_S = float(os.getenv("ADDR_FILE_CHECK_S", "1.0"))
+
+
+class HostResolver:
+    """IPv4 lookups that never block the event loop, cached per host.
+
+    Lookups run through the loop's getaddrinfo (in its executor) and are
+    shared between concurrent callers. getaddrinfo does not expose record
+    TTLs, so answers are kept for ttl_s and failures for negative_ttl_s.
+    When a lookup fails after a success, the last good address keeps being
+    served; with none, the host name itself is returned, as before.
+    """
+
+    def __init__(self, ttl_s=DNS_TTL_S, negative_ttl_s=DNS_NEGATIVE_TTL_S):
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.entries = {}
+        self.flights = {}
+        self.stats = {"hits": 0, "lookups": 0, "shared": 0, "failures": 0}
+
+    async def resolve(self, host):
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+
+        entry = self.entries.get(host)
+        if entry is not None and time.monotonic() < entry["expires"]:
+            self.stats["hits"] += 1
+            return entry["addr"] or host
+
+        flight = self.flights.get(host)
+        if flight is not None:
+            self.stats["shared"] += 1
+        else:
+            self.stats["lookups"] += 1
+            flight = asyncio.ensure_future(self._lookup(host))
+            self.flights[host] = flight
+            flight.add_done_callback(lambda done: self.flights.pop(host, None))
+        addr = await asyncio.shield(flight)
+        return addr or host
+
+    async def _lookup(self, host):
+        previous = self.entries.get(host)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM
+            )
+            addr = infos[0][4][0]
+        except (OSError, IndexError):
+            self.stats["failures"] += 1
+            addr = previous["addr"] if previous is not None else None
+            self.entries[host] = {"addr": addr, "expires": time.monotonic() + self.negative_ttl_s}
+            return addr
+        self.entries[host] = {"addr": addr, "expires": time.monotonic() + self.ttl_s}
+        return addr
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["hosts"] = {host: entry["addr"] for host, entry in self.entries.items()}
+        return stats
+
+
+class AddressFile:
+    """Address written by Couches/Openthread/node_start.sh into a .addr file.
+
+    The file is stat()ed at most every check_s seconds and only re-read when
+    its inode, mtime or size changed, instead of being opened on every
+    collect. read() returns None while the file is missing or empty.
+    """
+
+    def __init__(self, path, check_s=ADDR_FILE_CHECK_S):
+        self.path = path
+        self.check_s = check_s
+        self.addr = None
+        self.signature = None
+        self.checked_at = None
+        self.reloads = 0
+
+    def read(self):
+        if not self.path:
+            return None
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_s:
+            return self.addr
+        self.checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.signature = None
+            self.addr = None
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self.signature:
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    self.addr = handle.read().strip() or None
+            except OSError:
+                self.addr = None
+            self.signature = signature
+            self.reloads += 1
+        return self.addr
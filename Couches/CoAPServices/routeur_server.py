@@ -1,13 +1,14 @@
 import asyncio
 import json
 import os
-import socket
 import time
 
 import aiocoap
 import aiocoap.resource as resource
 
 from Couches.CONF import CONF
+from Couches.CoAPServices.resolver import AddressFile, HostResolver
+from Couches.CoAPServices.transport import TransportRacer
 
 COAP_LEADER_HOST = os.getenv("COAP_LEADER_HOST", "coap-leader")
 LEADER_ADDR_FILE = os.getenv("LEADER_ADDR_FILE", "")
@@ -18,6 +19,11 @@ THREAD_TRY_TIMEOUT = float(os.getenv("THREAD_TRY_TIMEOUT", "1.0"))
 IPV4_TRY_TIMEOUT = float(os.getenv("IPV4_TRY_TIMEOUT", "4.0"))
 ROUTEUR_PUBLISH_MQTT = os.getenv("ROUTEUR_PUBLISH_MQTT", "0") == "1"
 
+# Learned Thread/IPv4 preference and RTT towards the leader.
+transports = TransportRacer()
+resolver = HostResolver()
+leader_addr = AddressFile(LEADER_ADDR_FILE)
+
 
 def mqtt_client():
     import paho.mqtt.client as mqtt
@@ -41,45 +47,42 @@ async def coap_post(protocol, uri, payload, timeout_s=3.0):
     return json.loads(data)
 
 
-def _resolve_ipv4(host):
-    try:
-        return socket.gethostbyname(host)
-    except Exception:
-        return host
-
-
 def leader_uri():
     if USE_THREAD_URI and LEADER_ADDR_FILE:
-        try:
-            with open(LEADER_ADDR_FILE, "r", encoding="utf-8") as handle:
-                addr = handle.read().strip()
-            if addr:
-                return f"coap://[{addr}]/collect"
-        except Exception:
-            pass
+        addr = leader_addr.read()
+        if addr:
+            return f"coap://[{addr}]/collect"
     if STRICT_THREAD:
         raise RuntimeError(f"thread address missing for leader: {LEADER_ADDR_FILE}")
     return None
 
 
-async def collect_from_leader(protocol):
+async def collect_from_leader(protocol, devices=None):
     errors = []
     candidates = []
     try:
         thread_uri = leader_uri()
         if thread_uri:
-            candidates.append((thread_uri, THREAD_TRY_TIMEOUT))
+            candidates.append(("thread", thread_uri, THREAD_TRY_TIMEOUT))
     except Exception as exc:
         errors.append(f"thread-uri -> {type(exc).__name__}: {exc}")
 
     if not STRICT_THREAD:
-        candidates.append((f"coap://{_resolve_ipv4(COAP_LEADER_HOST)}/collect", IPV4_TRY_TIMEOUT))
+        leader_host = await resolver.resolve(COAP_LEADER_HOST)
+        candidates.append(("ipv4", f"coap://{leader_host}/collect", IPV4_TRY_TIMEOUT))
 
-    for uri, timeout_s in candidates:
+    body = {"key": SHARED_KEY}
+    if devices:
+        body["devices"] = devices
+    if candidates:
         try:
-            return await coap_post(protocol, uri, {"key": SHARED_KEY}, timeout_s=timeout_s)
-        except Exception as exc:
-            errors.append(f"{uri} -> {type(exc).__name__}: {exc}")
+            return await transports.race(
+                "leader",
+                candidates,
+                lambda uri, timeout_s: coap_post(protocol, uri, body, timeout_s=timeout_s),
+            )
+        except RuntimeError as exc:
+            errors.append(str(exc))
 
     raise RuntimeError("leader unreachable; " + " | ".join(errors))
 
@@ -97,9 +100,13 @@ class CollectResource(resource.Resource):
         if data.get("key") != SHARED_KEY:
             return aiocoap.Message(code=aiocoap.UNAUTHORIZED, payload=b"invalid key")
 
+        # Optional target sensor set (a runner's registered devices) for the leader.
+        devices = data.get("devices") if isinstance(data.get("devices"), dict) else None
+        session_id = data.get("session_id") if isinstance(data.get("session_id"), str) else None
+
         protocol = await aiocoap.Context.create_client_context()
         try:
-            leader_payload = await collect_from_leader(protocol)
+            leader_payload = await collect_from_leader(protocol, devices)
         except Exception as exc:
             payload = json.dumps({"error": str(exc)}).encode("utf-8")
             return aiocoap.Message(code=aiocoap.INTERNAL_SERVER_ERROR, payload=payload)
@@ -123,7 +130,12 @@ class CollectResource(resource.Resource):
         }
 
         if self.client is not None:
-            self.client.publish(CONF.MQTT_TOPIC, json.dumps(payload))
+            # Tell MQTT consumers whose reading this is and that the requester
+            # already has it: a device-targeted sample belongs to one runner.
+            message = dict(payload, source="collect", targeted=devices is not None)
+            if session_id:
+                message["session_id"] = session_id
+            self.client.publish(CONF.MQTT_TOPIC, json.dumps(message))
 
         return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
 
@@ -1,30 +1,30 @@
 import asyncio
-import json
-import time
-import os
 
 import aiocoap
 import aiocoap.resource as resource
 
+from Couches.CoAPServices.observe import SensorResource, deadband
 from Couches.Couche1.EndDevices.Temperature import TemperatureSensor
 
 
-class TemperatureResource(resource.Resource):
+class TemperatureResource(SensorResource):
+    deadbands = {
+        "temperature": deadband("temperature", 0.5),
+        "humidite": deadband("humidite", 2.0),
+        "pression": deadband("pression", 1.0),
+    }
+
     def __init__(self):
         super().__init__()
         self.sensor = TemperatureSensor(location="Paris")
-        self.key = os.getenv("SHARED_KEY", "zolis-key")
 
-    async def render_get(self, request):
+    def sample(self):
         self.sensor.simulate_temperature_change()
-        payload = {
+        return {
             "temperature": self.sensor.temp,
             "humidite": self.sensor.humidite,
             "pression": self.sensor.pression,
-            "timestamp": time.time(),
-            "key": self.key,
         }
-        return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
 
 
 def main():
@@ -0,0 +1,126 @@
+import asyncio
+import os
+
+TRANSPORT_STAGGER_S = float(os.getenv("TRANSPORT_STAGGER_S", "0.15"))
+TRANSPORT_MIN_TIMEOUT_S = float(os.getenv("TRANSPORT_MIN_TIMEOUT_S", "0.2"))
+TRANSPORT_MAX_BACKOFF = 4
+
+
+def _retrieve(task):
+    # Losers may fail after the race is decided; keep asyncio from warning.
+    if not task.cancelled():
+        task.exception()
+
+
+def _failure(task):
+    if task.cancelled():
+        return asyncio.CancelledError()
+    return task.exception()
+
+
+class TransportRacer:
+    """Races the transports to a peer (Thread, IPv4), happy-eyeballs style.
+
+    Candidates start in order of preference: the next one after stagger_s, or
+    as soon as the previous one fails. The first answer wins and the others
+    are cancelled. For every peer and transport a smoothed RTT (RFC 6298) is
+    kept to size the attempt timeouts, and the last winner goes first next
+    time.
+    """
+
+    def __init__(self, stagger_s=TRANSPORT_STAGGER_S, min_timeout_s=TRANSPORT_MIN_TIMEOUT_S):
+        self.stagger_s = stagger_s
+        self.min_timeout_s = min_timeout_s
+        self.preferred = {}
+        self.paths = {}
+        self.stats = {"races": 0, "raced": 0, "failed": 0, "wins": {}}
+
+    def timeout(self, peer, transport, default_s):
+        path = self.paths.get((peer, transport))
+        if path is None:
+            return default_s
+        rto = (path["srtt"] + 4.0 * path["rttvar"]) * (2 ** path["backoff"])
+        return min(default_s, max(self.min_timeout_s, rto))
+
+    def ordered(self, peer, candidates):
+        preferred = self.preferred.get(peer)
+        return sorted(candidates, key=lambda candidate: candidate[0] != preferred)
+
+    def _observe(self, peer, transport, rtt):
+        path = self.paths.get((peer, transport))
+        if path is None:
+            self.paths[(peer, transport)] = {"srtt": rtt, "rttvar": rtt / 2.0, "backoff": 0}
+            return
+        path["rttvar"] = 0.75 * path["rttvar"] + 0.25 * abs(path["srtt"] - rtt)
+        path["srtt"] = 0.875 * path["srtt"] + 0.125 * rtt
+        path["backoff"] = 0
+
+    def _failed(self, peer, transport):
+        path = self.paths.get((peer, transport))
+        if path is not None:
+            path["backoff"] = min(path["backoff"] + 1, TRANSPORT_MAX_BACKOFF)
+
+    async def race(self, peer, candidates, attempt):
+        """Return the first answer of attempt(uri, timeout_s) over candidates.
+
+        candidates are (transport, uri, default_timeout_s) tuples. Raises
+        RuntimeError listing every failure when none of them answers.
+        """
+        loop = asyncio.get_running_loop()
+        waiting = self.ordered(peer, candidates)
+        # Alone, a candidate gets its full timeout: there is nothing to race.
+        adaptive = len(waiting) > 1
+        pending = {}
+        errors = []
+        self.stats["races"] += 1
+
+        def launch():
+            transport, uri, default_s = waiting.pop(0)
+            timeout_s = self.timeout(peer, transport, default_s) if adaptive else default_s
+            task = asyncio.ensure_future(attempt(uri, timeout_s))
+            task.add_done_callback(_retrieve)
+            pending[task] = (transport, uri, loop.time())
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.stagger_s if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # The running attempts are slow: give the next path a go.
+                    self.stats["raced"] += 1
+                    launch()
+                    continue
+                for task in sorted(done, key=lambda task: _failure(task) is not None):
+                    transport, uri, started = pending.pop(task)
+                    exc = _failure(task)
+                    if exc is None:
+                        self._observe(peer, transport, loop.time() - started)
+                        self.preferred[peer] = transport
+                        self.stats["wins"][transport] = self.stats["wins"].get(transport, 0) + 1
+                        return task.result()
+                    self._failed(peer, transport)
+                    errors.append(f"{uri} -> {type(exc).__name__}: {exc}")
+                if waiting:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        self.stats["failed"] += 1
+        raise RuntimeError(" | ".join(errors))
+
+    def snapshot(self):
+        peers = {}
+        for (peer, transport), path in self.paths.items():
+            peers.setdefault(peer, {"preferred": self.preferred.get(peer)})[transport] = {
+                "srtt_ms": round(path["srtt"] * 1000.0, 1),
+                "rttvar_ms": round(path["rttvar"] * 1000.0, 1),
+                "backoff": path["backoff"],
+            }
+        stats = dict(self.stats)
+        stats["wins"] = dict(self.stats["wins"])
+        stats["peers"] = peers
+        return stats
@@ -9,76 +9,52 @@ from flask import Flask, Response, jsonify, redirect, render_template, request,
 import paho.mqtt.client as mqtt
 
 from Couches.CONF import CONF
+from Couches.WebUI.backend_client import (
+    BackendBusy,
+    BackendPool,
+    BackendUnavailable,
+    CoalescingGets,
+    SessionExistsCache,
+)
+from Couches.WebUI.session_latest import SessionLatestStore
 
 BROKER_HOST = CONF.MQTT_BROKER_ADDRESS
 BROKER_PORT = CONF.MQTT_BROKER_PORT
-TOPIC = CONF.MQTT_TOPIC
 CLIENT_ID = CONF.MQTT_CLIENT_ID
-SUB_TOPIC = os.getenv("MQTT_SUB_TOPIC", "/tracking/#")
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "zolis-dev-secret")
 BACKEND_HTTP = os.getenv("BACKEND_HTTP", "http://backend:8000")
 AUTH_SESSION_KEYS = ("session_id", "runner_id", "runner_name", "runner_email")
+PASSTHROUGH_HEADERS = ("X-Next-Cursor", "Content-Disposition", "Cache-Control", "X-Accel-Buffering")
+backend_pool = BackendPool(BACKEND_HTTP)
+backend_gets = CoalescingGets(backend_pool)
+session_exists_cache = SessionExistsCache()
+# Must exceed the backend's SSE keepalive interval.
+STREAM_READ_TIMEOUT_S = float(os.getenv("STREAM_READ_TIMEOUT_S", "45"))
 
-latest_data = {
-    "gps": {"latitude": 0.0, "longitude": 0.0},
-    "temperature": None,
-    "humidite": None,
-    "pression": None,
-    "batterie": None,
-    "topic": TOPIC,
-    "ts": None,
-}
+session_latest = SessionLatestStore()
+VIEWER_REAP_S = float(os.getenv("VIEWER_REAP_S", "5"))
 
-_lock = threading.Lock()
 
-
-def set_latest(data):
-    with _lock:
-        latest_data.clear()
-        latest_data.update(data)
-        latest_data["topic"] = TOPIC
-        latest_data["ts"] = time.time()
-
-
-def coerce_payload(payload):
-    try:
-        data = json.loads(payload)
-    except json.JSONDecodeError:
-        return None
-
-    if isinstance(data, str):
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError:
-            return None
-
-    if isinstance(data, dict):
-        return data
-
-    return None
-
-
-def on_message(client, userdata, msg):
-    payload = msg.payload.decode("utf-8", errors="replace")
-    data = coerce_payload(payload)
-    if data is None:
-        return
-
-    if "gps" in data and isinstance(data["gps"], dict):
-        set_latest(data)
+def on_connect(client, userdata, flags, reason_code, properties):
+    session_latest.attach(client)
 
 
 def mqtt_worker():
     while True:
         try:
             client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=CLIENT_ID)
-            client.on_message = on_message
+            client.on_connect = on_connect
+            client.on_message = session_latest.on_message
             client.connect(BROKER_HOST, BROKER_PORT, 60)
-            client.subscribe(SUB_TOPIC)
-            client.loop_forever()
+            # paho's network thread reconnects by itself from here on.
+            client.loop_start()
+            while True:
+                time.sleep(VIEWER_REAP_S)
+                session_latest.expire_idle()
         except Exception:
+            session_latest.detach()
             time.sleep(2)
 
 
@@ -102,18 +78,20 @@ def _clear_auth_session():
 def _backend_session_exists(session_id):
     if not session_id:
         return False
-    url = f"{BACKEND_HTTP}/api/sessions/{session_id}"
-    req = urllib.request.Request(url, method="GET")
+    cached = session_exists_cache.get(session_id)
+    if cached is not None:
+        return cached
     try:
-        with urllib.request.urlopen(req, timeout=3):
-            return True
-    except urllib.error.HTTPError as exc:
-        if exc.code == 404:
-            return False
-        return True
-    except Exception:
+        resp = backend_gets.get(f"/api/sessions/{session_id}", timeout_s=3)
+    except BackendUnavailable:
         # Do not force logout on transient backend/network issues.
         return True
+    if resp.status == 404:
+        session_exists_cache.set(session_id, False)
+        return False
+    if resp.status == 200:
+        session_exists_cache.set(session_id, True)
+    return True
 
 
 @app.get("/")
@@ -196,8 +174,24 @@ def set_current_session():
 
 @app.get("/api/latest")
 def api_latest():
-    with _lock:
-        return jsonify(latest_data)
+    session_id = _current_session_id()
+    if not session_id:
+        return jsonify({"error": "unauthorized"}), 401
+    data = session_latest.watch(session_id)
+    if data is not None:
+        return jsonify(data)
+
+    # Nothing received over MQTT yet for this session: ask the backend once.
+    path = f"/api/sessions/{session_id}/latest"
+    try:
+        resp = backend_gets.get(path)
+    except BackendUnavailable:
+        resp = None
+    if resp is not None and resp.status == 200:
+        data = json.loads(resp.body)
+        session_latest.seed(session_id, data)
+        return jsonify(data)
+    return _forward_backend(path, invalidate_session_on_404=True)
 
 
 def _is_session_not_found_body(body_bytes):
@@ -209,6 +203,39 @@ def _is_session_not_found_body(body_bytes):
     return "session not found" in detail
 
 
+def _passthrough_headers(resp):
+    return {name: resp.headers[name] for name in PASSTHROUGH_HEADERS if resp.headers.get(name)}
+
+
+def _stream_backend(path, query_string=None, timeout_s=30):
+    url = f"{BACKEND_HTTP}{path}"
+    if query_string:
+        url = f"{url}?{query_string.decode('utf-8')}"
+    try:
+        resp = urllib.request.urlopen(urllib.request.Request(url, method="GET"), timeout=timeout_s)
+    except urllib.error.HTTPError as exc:
+        return Response(exc.read(), status=exc.code, content_type="application/json")
+    except Exception as exc:
+        return jsonify({"error": "backend unavailable", "detail": str(exc)}), 502
+
+    def relay():
+        with resp:
+            while True:
+                # read1 returns whatever has arrived, so events are relayed as
+                # soon as the backend emits them instead of filling 64 KB first.
+                chunk = resp.read1(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+    return Response(
+        relay(),
+        status=resp.status,
+        content_type=resp.headers.get("Content-Type", "application/octet-stream"),
+        headers=_passthrough_headers(resp),
+    )
+
+
 def _forward_backend(
     path,
     method="GET",
@@ -216,38 +243,49 @@ def _forward_backend(
     query_string=None,
     invalidate_session_on_404=False,
 ):
-    url = f"{BACKEND_HTTP}{path}"
     if query_string:
-        url = f"{url}?{query_string.decode('utf-8')}"
+        path = f"{path}?{query_string.decode('utf-8')}"
 
-    data = None
+    body = None
     headers = {}
     if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
+        body = json.dumps(payload).encode("utf-8")
         headers["Content-Type"] = "application/json"
 
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
     timeout_s = 15 if path == "/api/collect" else 10
-    attempts = 1 if path == "/api/collect" else 3
-    last_error = "unknown error"
+    try:
+        if method == "GET":
+            resp = backend_gets.get(path, timeout_s=timeout_s)
+        else:
+            resp = backend_pool.request(method, path, body=body, headers=headers, timeout_s=timeout_s)
+    except BackendBusy as exc:
+        return jsonify({"error": "backend busy", "detail": str(exc)}), 503
+    except BackendUnavailable as exc:
+        return jsonify({"error": "backend unavailable", "detail": str(exc)}), 502
+
+    if resp.status >= 400:
+        if invalidate_session_on_404 and resp.status == 404 and _is_session_not_found_body(resp.body):
+            session_exists_cache.invalidate(_current_session_id())
+            _clear_auth_session()
+            return jsonify({"error": "session expired"}), 401
+        return Response(resp.body, status=resp.status, content_type="application/json")
+    return Response(
+        resp.body,
+        status=resp.status,
+        content_type=resp.headers.get("Content-Type", "application/json"),
+        headers=_passthrough_headers(resp),
+    )
 
-    for _ in range(attempts):
-        try:
-            with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-                body = resp.read()
-                content_type = resp.headers.get("Content-Type", "application/json")
-                return Response(body, status=resp.status, content_type=content_type)
-        except urllib.error.HTTPError as exc:
-            body = exc.read()
-            if invalidate_session_on_404 and exc.code == 404 and _is_session_not_found_body(body):
-                _clear_auth_session()
-                return jsonify({"error": "session expired"}), 401
-            return Response(body, status=exc.code, content_type="application/json")
-        except Exception as exc:
-            last_error = str(exc)
-            time.sleep(0.4)
-
-    return jsonify({"error": "backend unavailable", "detail": last_error}), 502
+
+@app.get("/api/proxy/metrics")
+def api_proxy_metrics():
+    return jsonify(
+        {
+            "pool": backend_pool.snapshot(),
+            "coalesced_gets": backend_gets.snapshot(),
+            "session_latest": session_latest.snapshot(),
+        }
+    )
 
 
 @app.post("/api/backend/login")
@@ -281,6 +319,22 @@ def api_backend_collect():
     )
 
 
+@app.route("/api/backend/schedule", methods=["GET", "POST", "DELETE"])
+def api_backend_schedule():
+    session_id = _current_session_id()
+    if not session_id:
+        return jsonify({"error": "unauthorized"}), 401
+    payload = None
+    if request.method == "POST":
+        payload = request.get_json(silent=True) or {}
+    return _forward_backend(
+        f"/api/sessions/{session_id}/schedule",
+        method=request.method,
+        payload=payload,
+        invalidate_session_on_404=True,
+    )
+
+
 @app.get("/api/backend/latest")
 def api_backend_latest():
     session_id = _current_session_id()
@@ -293,6 +347,14 @@ def api_backend_latest():
     return _forward_backend("/api/latest", method="GET")
 
 
+@app.get("/api/backend/stream")
+def api_backend_stream():
+    session_id = _current_session_id()
+    if not session_id:
+        return jsonify({"error": "unauthorized"}), 401
+    return _stream_backend(f"/api/sessions/{session_id}/stream", timeout_s=STREAM_READ_TIMEOUT_S)
+
+
 @app.get("/api/backend/sessions/<session_id>")
 def api_backend_session(session_id):
     return _forward_backend(f"/api/sessions/{session_id}", method="GET")
@@ -307,6 +369,40 @@ def api_backend_measures(session_id):
     )
 
 
+@app.get("/api/backend/sessions/<session_id>/measures/export")
+def api_backend_measures_export(session_id):
+    return _stream_backend(
+        f"/api/sessions/{session_id}/measures/export",
+        query_string=request.query_string,
+    )
+
+
+@app.get("/api/backend/sessions/<session_id>/measures/columns")
+def api_backend_measures_columns(session_id):
+    return _stream_backend(
+        f"/api/sessions/{session_id}/measures/columns",
+        query_string=request.query_string,
+    )
+
+
+@app.get("/api/backend/sessions/<session_id>/track")
+def api_backend_track(session_id):
+    return _forward_backend(
+        f"/api/sessions/{session_id}/track",
+        method="GET",
+        query_string=request.query_string,
+    )
+
+
+@app.get("/api/backend/sessions/<session_id>/rollups")
+def api_backend_rollups(session_id):
+    return _forward_backend(
+        f"/api/sessions/{session_id}/rollups",
+        method="GET",
+        query_string=request.query_string,
+    )
+
+
 @app.get("/api/backend/my-sessions")
 def api_backend_my_sessions():
     runner_id = _current_runner_id()
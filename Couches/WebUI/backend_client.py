@@ -0,0 +1,201 @@
+import http.client
+import os
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "16"))
+BACKEND_MAX_INFLIGHT = int(os.getenv("BACKEND_MAX_INFLIGHT", "32"))
+BACKEND_ACQUIRE_TIMEOUT_S = float(os.getenv("BACKEND_ACQUIRE_TIMEOUT_S", "5"))
+# uvicorn closes idle keep-alive connections after 5 s; drop ours a bit before.
+BACKEND_IDLE_S = float(os.getenv("BACKEND_IDLE_S", "4"))
+PROXY_GET_COALESCE_S = float(os.getenv("PROXY_GET_COALESCE_S", "0.5"))
+SESSION_CHECK_TTL_S = float(os.getenv("SESSION_CHECK_TTL_S", "10"))
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "DELETE")
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+BackendResponse = namedtuple("BackendResponse", ["status", "headers", "body"])
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+class BackendBusy(BackendUnavailable):
+    pass
+
+
+class BackendPool:
+    """Keep-alive HTTP/1.1 connections to the backend, shared by Flask threads.
+
+    At most max_inflight requests run at once; callers beyond that wait up to
+    acquire_timeout_s and then get BackendBusy instead of piling up threads.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        size=BACKEND_POOL_SIZE,
+        max_inflight=BACKEND_MAX_INFLIGHT,
+        acquire_timeout_s=BACKEND_ACQUIRE_TIMEOUT_S,
+        idle_s=BACKEND_IDLE_S,
+    ):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.size = size
+        self.idle_s = idle_s
+        self.acquire_timeout_s = acquire_timeout_s
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "connects": 0, "reused": 0, "retries": 0, "busy": 0, "errors": 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def _checkout(self, timeout_s):
+        now = time.monotonic()
+        with self.lock:
+            while self.idle:
+                # Most recently used first: the warmest connection is the one
+                # least likely to have been closed by the server.
+                conn, released_at = self.idle.pop()
+                if now - released_at < self.idle_s:
+                    self.stats["reused"] += 1
+                    conn.sock.settimeout(timeout_s)
+                    return conn, True
+                conn.close()
+            self.stats["connects"] += 1
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout_s), False
+
+    def _checkin(self, conn):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def request(self, method, path, body=None, headers=None, timeout_s=10):
+        if not self.slots.acquire(timeout=self.acquire_timeout_s):
+            self._count("busy")
+            raise BackendBusy("too many concurrent backend requests")
+        self._count("requests")
+        try:
+            while True:
+                conn, reused = self._checkout(timeout_s)
+                try:
+                    conn.request(method, path, body=body, headers=headers or {})
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except Exception as exc:
+                    conn.close()
+                    # A pooled connection can still be closed under us; replay
+                    # on a fresh one, but never replay a non-idempotent call.
+                    if reused and method in IDEMPOTENT_METHODS and isinstance(exc, STALE_CONNECTION_ERRORS):
+                        self._count("retries")
+                        continue
+                    self._count("errors")
+                    raise BackendUnavailable(str(exc)) from exc
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._checkin(conn)
+                return BackendResponse(resp.status, resp.msg, data)
+        finally:
+            self.slots.release()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["idle"] = len(self.idle)
+        return stats
+
+
+class CoalescingGets:
+    """Shares one backend GET between callers asking for the same path.
+
+    Callers arriving while a GET is in flight, or up to window_s after it
+    finished, get its response instead of issuing their own. Many tabs
+    polling the same session then cost one backend call per window.
+    """
+
+    def __init__(self, pool, window_s=PROXY_GET_COALESCE_S):
+        self.pool = pool
+        self.window_s = window_s
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def get(self, path, timeout_s=10):
+        now = time.monotonic()
+        with self.lock:
+            self.stats["calls"] += 1
+            expired = [
+                key
+                for key, flight in self.flights.items()
+                if flight["done_at"] is not None and now - flight["done_at"] > self.window_s
+            ]
+            for key in expired:
+                del self.flights[key]
+            flight = self.flights.get(path)
+            leader = flight is None
+            if leader:
+                flight = {"event": threading.Event(), "done_at": None, "response": None, "error": None}
+                self.flights[path] = flight
+            else:
+                self.stats["coalesced"] += 1
+
+        if leader:
+            try:
+                flight["response"] = self.pool.request("GET", path, timeout_s=timeout_s)
+            except BackendUnavailable as exc:
+                flight["error"] = exc
+            finally:
+                with self.lock:
+                    flight["done_at"] = time.monotonic()
+                    if flight["error"] is not None and self.flights.get(path) is flight:
+                        # Do not serve a failure to later callers.
+                        del self.flights[path]
+                flight["event"].set()
+        elif not flight["event"].wait(timeout_s):
+            raise BackendUnavailable("timed out waiting for a shared backend request")
+
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["response"]
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+class SessionExistsCache:
+    """Short-lived memo of backend answers to "does this session exist"."""
+
+    def __init__(self, ttl_s=SESSION_CHECK_TTL_S):
+        self.ttl_s = ttl_s
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(session_id, None)
+                return None
+            return entry[1]
+
+    def set(self, session_id, exists):
+        now = time.monotonic()
+        with self.lock:
+            if len(self.entries) >= 1024:
+                self.entries = {k: v for k, v in self.entries.items() if v[0] >= now}
+            self.entries[session_id] = (now + self.ttl_s, exists)
+
+    def invalidate(self, session_id):
+        with self.lock:
+            self.entries.pop(session_id, None)
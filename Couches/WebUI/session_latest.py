@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+from Couches.Couche3.Codec import decode_sample
+
+SESSION_TOPIC = os.getenv("MQTT_SESSION_TOPIC", "/tracking/{session_id}/latest")
+VIEWER_IDLE_S = float(os.getenv("VIEWER_IDLE_S", "30"))
+
+
+class SessionLatestStore:
+    """Latest sample of each watched session, fed by on-demand MQTT subscriptions.
+
+    A session is subscribed the first time a viewer asks for it and
+    unsubscribed once nobody has asked for idle_s seconds, so the broker only
+    sends us the sessions someone is actually looking at.
+    """
+
+    def __init__(self, topic_template=SESSION_TOPIC, idle_s=VIEWER_IDLE_S):
+        self.topic_prefix, self.topic_suffix = topic_template.split("{session_id}")
+        self.idle_s = idle_s
+        self.client = None
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats = {"subscribes": 0, "unsubscribes": 0, "messages": 0, "hits": 0, "misses": 0}
+
+    def topic(self, session_id):
+        return f"{self.topic_prefix}{session_id}{self.topic_suffix}"
+
+    def session_for_topic(self, topic):
+        if not (topic.startswith(self.topic_prefix) and topic.endswith(self.topic_suffix)):
+            return None
+        session_id = topic[len(self.topic_prefix):len(topic) - len(self.topic_suffix)]
+        return session_id if session_id and "/" not in session_id else None
+
+    def attach(self, client):
+        # Called on every (re)connect: the broker forgot our subscriptions.
+        with self.lock:
+            self.client = client
+            session_ids = list(self.entries)
+        for session_id in session_ids:
+            client.subscribe(self.topic(session_id))
+
+    def detach(self):
+        with self.lock:
+            self.client = None
+
+    def watch(self, session_id):
+        """Mark session_id as viewed and return its latest sample, if any."""
+        with self.lock:
+            entry = self.entries.get(session_id)
+            subscribe = entry is None
+            if subscribe:
+                entry = {"latest": None}
+                self.entries[session_id] = entry
+                self.stats["subscribes"] += 1
+            entry["seen"] = time.monotonic()
+            latest = entry["latest"]
+            self.stats["hits" if latest is not None else "misses"] += 1
+            client = self.client
+        if subscribe and client is not None:
+            client.subscribe(self.topic(session_id))
+        return dict(latest) if latest is not None else None
+
+    def seed(self, session_id, data):
+        # Fill a watched session from another source unless MQTT got there first.
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is not None and entry["latest"] is None:
+                entry["latest"] = data
+
+    def on_message(self, client, userdata, msg):
+        session_id = self.session_for_topic(msg.topic)
+        if session_id is None:
+            return
+        # JSON or CBOR, depending on the backend's MQTT_ENCODING.
+        data = decode_sample(msg.payload, session_id)
+        if data is None or not isinstance(data.get("gps"), dict):
+            return
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None:
+                return
+            previous = entry["latest"]
+            if previous is None or (data.get("ts") or 0) >= (previous.get("ts") or 0):
+                entry["latest"] = data
+            self.stats["messages"] += 1
+
+    def expire_idle(self):
+        cutoff = time.monotonic() - self.idle_s
+        with self.lock:
+            idle = [session_id for session_id, entry in self.entries.items() if entry["seen"] < cutoff]
+            for session_id in idle:
+                del self.entries[session_id]
+            self.stats["unsubscribes"] += len(idle)
+            client = self.client
+        if client is not None:
+            for session_id in idle:
+                client.unsubscribe(self.topic(session_id))
+        return idle
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["watched"] = len(self.entries)
+        return stats
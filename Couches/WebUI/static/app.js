@@ -27,9 +27,15 @@ const path = L.polyline([], { color: "#47e1d6", weight: 3 }).addTo(map);
 
 let lastUpdate = 0;
 let collectInFlight = false;
-let lastCollectTs = 0;
 let lastCollectError = "";
-const COLLECT_INTERVAL_MS = 2500;
+let lastScheduleCheck = 0;
+const SCHEDULE_CHECK_MS = 5000;
+let liveSource = null;
+let lastEventAt = 0;
+let lastStreamAttempt = 0;
+// Longer than the backend's keepalive ping interval.
+const LIVE_STALE_MS = 20000;
+const STREAM_RETRY_MS = 10000;
 
 function formatCoord(value) {
   if (Number.isFinite(value)) {
@@ -65,16 +71,44 @@ async function parseJsonSafe(response) {
   }
 }
 
-async function triggerCollect(force = false) {
+async function ensureSchedule() {
+  // Sampling runs server-side and starts with the session; viewers only restart
+  // a schedule the backend lost, e.g. across a restart.
   const now = Date.now();
-  if (!force && now - lastCollectTs < COLLECT_INTERVAL_MS) {
+  if (!sessionId || now - lastScheduleCheck < SCHEDULE_CHECK_MS) {
     return;
   }
+  lastScheduleCheck = now;
+  try {
+    let res = await fetch(`${backend}/schedule`, { cache: "no-store" });
+    let status = await parseJsonSafe(res);
+    if (res.ok && !status.running) {
+      res = await fetch(`${backend}/schedule`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: "{}",
+      });
+      status = await parseJsonSafe(res);
+    }
+    if (res.status === 401) {
+      window.location.href = "/login";
+      return;
+    }
+    if (!res.ok) {
+      lastCollectError = status.detail || status.error || `HTTP ${res.status}`;
+      return;
+    }
+    lastCollectError = status.last_error || "";
+  } catch (err) {
+    lastCollectError = "backend indisponible";
+  }
+}
+
+async function triggerCollect() {
   if (collectInFlight) {
     return;
   }
   collectInFlight = true;
-  lastCollectTs = now;
   try {
     const res = await fetch(`${backend}/collect`, { method: "POST" });
     if (!res.ok) {
@@ -97,8 +131,8 @@ async function triggerCollect(force = false) {
 
 async function refresh() {
   try {
-    triggerCollect().catch(() => {});
-    const response = await fetch(`${backend}/latest`, { cache: "no-store" });
+    // Served from the WebUI's own MQTT-fed memory of this session.
+    const response = await fetch("/api/latest", { cache: "no-store" });
     if (!response.ok) {
       const payload = await parseJsonSafe(response);
       const reason = (payload.detail || payload.error || "").toLowerCase();
@@ -110,61 +144,138 @@ async function refresh() {
       setFallbackCards();
       return;
     }
-    const data = await parseJsonSafe(response);
-    if (!data || !data.gps) {
-      updateStatus("idle", "Aucune donnée capteur reçue");
-      setFallbackCards();
-      return;
-    }
+    render(await parseJsonSafe(response));
+  } catch (err) {
+    updateStatus("error", "Erreur réseau avec le backend");
+    setFallbackCards();
+  }
+}
 
-    const lat = Number(data.gps.latitude);
-    const lng = Number(data.gps.longitude);
-    if (!Number.isFinite(lat) || !Number.isFinite(lng)) {
-      updateStatus("idle", "Position invalide");
-      setFallbackCards();
-      return;
-    }
+function render(data) {
+  if (!data || !data.gps) {
+    updateStatus("idle", "Aucune donnée capteur reçue");
+    setFallbackCards();
+    return;
+  }
+
+  const lat = Number(data.gps.latitude);
+  const lng = Number(data.gps.longitude);
+  if (!Number.isFinite(lat) || !Number.isFinite(lng)) {
+    updateStatus("idle", "Position invalide");
+    setFallbackCards();
+    return;
+  }
 
-    marker.setLatLng([lat, lng]);
-    path.addLatLng([lat, lng]);
-    if (Date.now() - lastUpdate > 4000) {
-      map.setView([lat, lng], 15, { animate: true });
-    } else {
-      map.panTo([lat, lng], { animate: true });
+  marker.setLatLng([lat, lng]);
+  path.addLatLng([lat, lng]);
+  if (Date.now() - lastUpdate > 4000) {
+    map.setView([lat, lng], 15, { animate: true });
+  } else {
+    map.panTo([lat, lng], { animate: true });
+  }
+
+  coordsEl.textContent = `${formatCoord(lat)}, ${formatCoord(lng)}`;
+  tempEl.textContent = data.temperature !== null && data.temperature !== undefined
+    ? `${Number(data.temperature).toFixed(1)} °C`
+    : "--";
+  humiditeEl.textContent = data.humidite !== null && data.humidite !== undefined
+    ? `${Number(data.humidite).toFixed(1)} %`
+    : "--";
+  pressionEl.textContent = data.pression !== null && data.pression !== undefined
+    ? `${Number(data.pression).toFixed(0)} hPa`
+    : "--";
+  battEl.textContent = data.batterie !== null && data.batterie !== undefined
+    ? `${Number(data.batterie).toFixed(0)} %`
+    : "--";
+  distanceEl.textContent = data.distance_m !== null && data.distance_m !== undefined
+    ? `${Number(data.distance_m).toFixed(1)} m`
+    : "--";
+  tsEl.textContent = data.ts
+    ? new Date(data.ts * 1000).toLocaleTimeString("fr-FR")
+    : "--";
+
+  const statusMessage = lastCollectError
+    ? `Flux partiel: ${lastCollectError}`
+    : "Flux capteurs actif";
+  updateStatus("live", statusMessage);
+  lastUpdate = Date.now();
+  if (sessionId && data.distance_m !== null && data.distance_m !== undefined) {
+    distanceTotalEl.textContent = `Total: ${Number(data.distance_m).toFixed(1)} m`;
+  }
+}
+
+function startLiveStream() {
+  // One push stream per viewer; the backend drops our oldest pending samples
+  // if we fall behind, so the map always converges on the latest state.
+  lastStreamAttempt = Date.now();
+  liveSource = new EventSource(`${backend}/stream`);
+  liveSource.onmessage = (event) => {
+    lastEventAt = Date.now();
+    try {
+      render(JSON.parse(event.data));
+    } catch (err) {
+      // ignore malformed event
     }
+  };
+  liveSource.addEventListener("ping", () => {
+    lastEventAt = Date.now();
+  });
+  liveSource.onerror = () => {
+    // EventSource retries by itself unless the server refused the stream.
+    if (liveSource && liveSource.readyState === EventSource.CLOSED) {
+      liveSource = null;
+    }
+  };
+}
 
-    coordsEl.textContent = `${formatCoord(lat)}, ${formatCoord(lng)}`;
-    tempEl.textContent = data.temperature !== null && data.temperature !== undefined
-      ? `${Number(data.temperature).toFixed(1)} °C`
-      : "--";
-    humiditeEl.textContent = data.humidite !== null && data.humidite !== undefined
-      ? `${Number(data.humidite).toFixed(1)} %`
-      : "--";
-    pressionEl.textContent = data.pression !== null && data.pression !== undefined
-      ? `${Number(data.pression).toFixed(0)} hPa`
-      : "--";
-    battEl.textContent = data.batterie !== null && data.batterie !== undefined
-      ? `${Number(data.batterie).toFixed(0)} %`
-      : "--";
-    distanceEl.textContent = data.distance_m !== null && data.distance_m !== undefined
-      ? `${Number(data.distance_m).toFixed(1)} m`
-      : "--";
-    tsEl.textContent = data.ts
-      ? new Date(data.ts * 1000).toLocaleTimeString("fr-FR")
-      : "--";
-
-    const statusMessage = lastCollectError
-      ? `Flux partiel: ${lastCollectError}`
-      : "Flux capteurs actif";
-    updateStatus("live", statusMessage);
-    lastUpdate = Date.now();
-    if (sessionId) {
-      loadSessionMeta();
+function tick() {
+  ensureSchedule().catch(() => {});
+  const now = Date.now();
+  if (!liveSource && sessionId && window.EventSource && now - lastStreamAttempt > STREAM_RETRY_MS) {
+    startLiveStream();
+  }
+  // Polling fallback while the stream is down or silent.
+  if (!liveSource || now - lastEventAt > LIVE_STALE_MS) {
+    refresh();
+  }
+}
+
+function decodePolyline(encoded) {
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+  while (index < encoded.length) {
+    for (const axis of [0, 1]) {
+      let result = 0;
+      let shift = 0;
+      let byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      const delta = result & 1 ? ~(result >> 1) : result >> 1;
+      if (axis === 0) {
+        lat += delta;
+      } else {
+        lng += delta;
+      }
     }
-  } catch (err) {
-    updateStatus("error", "Erreur réseau avec le backend");
-    setFallbackCards();
+    points.push([lat / 1e5, lng / 1e5]);
   }
+  return points;
+}
+
+let historyLoaded = false;
+
+async function fetchTrack(zoom) {
+  const res = await fetch(`${backend}/sessions/${sessionId}/track?zoom=${Math.round(zoom)}`);
+  if (!res.ok) {
+    throw new Error("history");
+  }
+  const track = await res.json();
+  return (track.polylines || []).flatMap(decodePolyline);
 }
 
 async function loadHistory() {
@@ -173,13 +284,10 @@ async function loadHistory() {
     return;
   }
   try {
-    const res = await fetch(`${backend}/sessions/${sessionId}/measures`);
-    if (!res.ok) {
-      throw new Error("history");
-    }
-    const measures = await res.json();
-    const latlngs = measures.map((m) => [m.lat, m.lon]);
+    // Server-side simplified track, detailed enough for street-level zoom.
+    const latlngs = await fetchTrack(Math.max(map.getZoom(), 17));
     path.setLatLngs(latlngs);
+    historyLoaded = true;
     if (latlngs.length > 0) {
       map.fitBounds(path.getBounds(), { padding: [30, 30] });
     }
@@ -188,13 +296,24 @@ async function loadHistory() {
   }
 }
 
+map.on("zoomend", async () => {
+  if (!historyLoaded || !sessionId) {
+    return;
+  }
+  try {
+    path.setLatLngs(await fetchTrack(map.getZoom()));
+  } catch (err) {
+    // keep the current track
+  }
+});
+
 if (loadHistoryBtn) {
   loadHistoryBtn.addEventListener("click", loadHistory);
 }
 
 async function collectNow() {
   try {
-    await triggerCollect(true);
+    await triggerCollect();
     if (lastCollectError) {
       alert(`Collect impossible: ${lastCollectError}`);
     }
@@ -223,8 +342,8 @@ async function loadSessionMeta() {
   }
 }
 
-setInterval(refresh, 1000);
-refresh();
+setInterval(tick, 1000);
+tick();
 loadSessionMeta();
 if (sessionId) {
   loadHistory();
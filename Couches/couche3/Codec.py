@@ -0,0 +1,151 @@
+import json
+import struct
+
+# Préfixe CBOR "self-describe" (tag 55799) : permet de distinguer un message
+# CBOR d'un message JSON sans métadonnées MQTT.
+CBOR_MAGIC = b"\xd9\xd9\xf7"
+SAMPLE_SCHEMA_VERSION = 1
+# Schéma v1 : [version, ts, lat, lon, temperature, humidite, pression, batterie, distance_m]
+SAMPLE_FIELDS = ("ts", "lat", "lon", "temperature", "humidite", "pression", "batterie", "distance_m")
+
+
+def _head(major, value):
+    if value < 24:
+        return bytes([(major << 5) | value])
+    if value < 0x100:
+        return bytes([(major << 5) | 24, value])
+    if value < 0x10000:
+        return bytes([(major << 5) | 25]) + struct.pack(">H", value)
+    if value < 0x100000000:
+        return bytes([(major << 5) | 26]) + struct.pack(">I", value)
+    return bytes([(major << 5) | 27]) + struct.pack(">Q", value)
+
+
+def cbor_dumps(value):
+    """Encode en CBOR (RFC 8949) le sous-ensemble utile : None, bool, int,
+    float, str, bytes, list/tuple et dict."""
+    if value is None:
+        return b"\xf6"
+    if value is True:
+        return b"\xf5"
+    if value is False:
+        return b"\xf4"
+    if isinstance(value, int):
+        return _head(0, value) if value >= 0 else _head(1, -1 - value)
+    if isinstance(value, float):
+        return b"\xfb" + struct.pack(">d", value)
+    if isinstance(value, str):
+        encoded = value.encode("utf-8")
+        return _head(3, len(encoded)) + encoded
+    if isinstance(value, (bytes, bytearray)):
+        return _head(2, len(value)) + bytes(value)
+    if isinstance(value, (list, tuple)):
+        return _head(4, len(value)) + b"".join(cbor_dumps(item) for item in value)
+    if isinstance(value, dict):
+        return _head(5, len(value)) + b"".join(
+            cbor_dumps(key) + cbor_dumps(item) for key, item in value.items()
+        )
+    raise TypeError(f"type non encodable en CBOR : {type(value).__name__}")
+
+
+def _decode(data, offset):
+    initial = data[offset]
+    major, info = initial >> 5, initial & 0x1F
+    offset += 1
+    if major == 7:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info in (22, 23):
+            return None, offset
+        if info == 25:
+            return struct.unpack_from(">e", data, offset)[0], offset + 2
+        if info == 26:
+            return struct.unpack_from(">f", data, offset)[0], offset + 4
+        if info == 27:
+            return struct.unpack_from(">d", data, offset)[0], offset + 8
+        raise ValueError(f"valeur simple CBOR non supportée : {info}")
+
+    if info < 24:
+        argument = info
+    elif info <= 27:
+        size = 1 << (info - 24)
+        argument = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    else:
+        raise ValueError("longueur CBOR indéfinie non supportée")
+
+    if major == 0:
+        return argument, offset
+    if major == 1:
+        return -1 - argument, offset
+    if major == 2:
+        return bytes(data[offset:offset + argument]), offset + argument
+    if major == 3:
+        return bytes(data[offset:offset + argument]).decode("utf-8"), offset + argument
+    if major == 4:
+        items = []
+        for _ in range(argument):
+            item, offset = _decode(data, offset)
+            items.append(item)
+        return items, offset
+    if major == 5:
+        mapping = {}
+        for _ in range(argument):
+            key, offset = _decode(data, offset)
+            mapping[key], offset = _decode(data, offset)
+        return mapping, offset
+    # major 6 : tag, on ne garde que la valeur étiquetée.
+    return _decode(data, offset)
+
+
+def cbor_loads(data):
+    value, offset = _decode(data, 0)
+    if offset != len(data):
+        raise ValueError("octets en trop après la valeur CBOR")
+    return value
+
+
+def encode_sample(sample, encoding="cbor"):
+    """Sérialise un échantillon traité (format de /latest) pour les topics /tracking."""
+    if encoding == "json":
+        return json.dumps(sample).encode("utf-8")
+    gps = sample.get("gps") or {}
+    values = {
+        "ts": sample.get("ts"),
+        "lat": gps.get("latitude"),
+        "lon": gps.get("longitude"),
+    }
+    for field in SAMPLE_FIELDS[3:]:
+        values[field] = sample.get(field)
+    return CBOR_MAGIC + cbor_dumps([SAMPLE_SCHEMA_VERSION] + [values[field] for field in SAMPLE_FIELDS])
+
+
+def decode_sample(payload, session_id=None):
+    """Inverse de encode_sample, quel que soit l'encodage ; None si illisible."""
+    if payload.startswith(CBOR_MAGIC):
+        try:
+            values = cbor_loads(payload)
+        except (ValueError, IndexError, struct.error, UnicodeDecodeError):
+            return None
+        if (
+            not isinstance(values, list)
+            or len(values) <= len(SAMPLE_FIELDS)
+            or values[0] != SAMPLE_SCHEMA_VERSION
+        ):
+            return None
+        fields = dict(zip(SAMPLE_FIELDS, values[1:]))
+        sample = {"gps": {"latitude": fields.pop("lat"), "longitude": fields.pop("lon")}}
+        sample.update(fields)
+        if session_id is not None:
+            sample["session_id"] = session_id
+        return sample
+
+    try:
+        data = json.loads(payload.decode("utf-8", errors="replace"))
+        if isinstance(data, str):
+            data = json.loads(data)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
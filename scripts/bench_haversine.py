@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compare the scalar haversine used by the collect path with the NumPy
+version used by the distance backfill, on a synthetic GPS track."""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from Couches.Backend.app import haversine_m
+from Couches.Backend.distance import cumulative_distance_m
+
+
+def random_walk(count):
+    lat, lon = 48.8566, 2.3522
+    lats, lons = [], []
+    for _ in range(count):
+        lat += random.uniform(-0.0005, 0.0005)
+        lon += random.uniform(-0.0005, 0.0005)
+        lats.append(lat)
+        lons.append(lon)
+    return lats, lons
+
+
+def scalar_cumulative(lats, lons):
+    total = 0.0
+    out = [0.0]
+    for i in range(1, len(lats)):
+        total += haversine_m(lats[i - 1], lons[i - 1], lats[i], lons[i])
+        out.append(round(total, 2))
+    return out
+
+
+def best_of(repeat, fn, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scalar vs vectorized haversine")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lats, lons = random_walk(args.points)
+    lat_array, lon_array = np.array(lats), np.array(lons)
+
+    scalar_s, scalar = best_of(args.repeat, scalar_cumulative, lats, lons)
+    vector_s, vector = best_of(args.repeat, cumulative_distance_m, lat_array, lon_array)
+
+    print(f"points:      {args.points}")
+    print(f"scalar:      {scalar_s * 1000:.1f} ms")
+    print(f"vectorized:  {vector_s * 1000:.1f} ms  ({scalar_s / vector_s:.1f}x)")
+    print(f"max |diff|:  {np.max(np.abs(np.array(scalar) - vector)):.4f} m")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
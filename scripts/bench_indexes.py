@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Seed a large measures table and time the hot read queries with and without
+the indexes declared on the models (see migration 0003_hot_path_indexes).
+
+Needs a PostgreSQL database reachable through DATABASE_URL. Seeding uses
+generate_series so millions of rows are created server-side in seconds.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text
+
+from Couches.Backend.db import Base, Measure, Runner, Session, engine
+from Couches.Backend.partitions import ensure_partitions, is_partitioned
+
+INDEXED_TABLES = [Measure.__table__, Session.__table__, Runner.__table__]
+
+QUERIES = {
+    "session_latest": (
+        "SELECT * FROM measures WHERE session_id = :session_id ORDER BY ts DESC LIMIT 1",
+        "session",
+    ),
+    "session_measures": (
+        "SELECT * FROM measures WHERE session_id = :session_id ORDER BY ts ASC LIMIT 1000",
+        "session",
+    ),
+    "runner_sessions": (
+        "SELECT * FROM sessions WHERE runner_id = :runner_id ORDER BY started_at DESC LIMIT 100",
+        "runner",
+    ),
+    "runner_by_email": (
+        "SELECT * FROM runners WHERE lower(email) = :email LIMIT 1",
+        "email",
+    ),
+}
+
+
+def seed(conn, runners, sessions_per_runner, measures):
+    sessions = runners * sessions_per_runner
+    per_session = max(1, measures // sessions)
+    print(f"seeding {runners} runners, {sessions} sessions, {per_session * sessions} measures")
+    conn.execute(text("TRUNCATE measures, sessions, runner_devices, runner_credentials, runners"))
+    if is_partitioned(conn):
+        # Seeded rows go back one second per measure.
+        ensure_partitions(conn, datetime.utcnow(), behind=per_session * sessions // (28 * 86400) + 1)
+    conn.execute(
+        text(
+            "INSERT INTO runners (id, name, email, created_at) "
+            "SELECT 'bench-r' || i, 'Runner ' || i, 'runner' || i || '@bench.local', now() "
+            "FROM generate_series(1, :runners) AS i"
+        ),
+        {"runners": runners},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO sessions (id, runner_id, started_at, total_distance_m) "
+            "SELECT 'bench-s' || i, 'bench-r' || (1 + (i - 1) % :runners), "
+            "now() - (i || ' minutes')::interval, 0 "
+            "FROM generate_series(1, :sessions) AS i"
+        ),
+        {"runners": runners, "sessions": sessions},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO measures "
+            "(id, session_id, ts, lat, lon, temperature, humidite, pression, batterie, distance_m) "
+            "SELECT md5(random()::text || i)::uuid, 'bench-s' || (1 + (i - 1) % :sessions), "
+            "now() - (i || ' seconds')::interval, 48.85 + random() / 100, 2.35 + random() / 100, "
+            "20, 50, 1013, 100 - (i % 100), i "
+            "FROM generate_series(1, :total) AS i"
+        ),
+        {"sessions": sessions, "total": per_session * sessions},
+    )
+
+
+def set_indexes(conn, enabled):
+    for table in INDEXED_TABLES:
+        for index in table.indexes:
+            if enabled:
+                index.create(conn, checkfirst=True)
+            else:
+                index.drop(conn, checkfirst=True)
+    conn.execute(text("ANALYZE"))
+
+
+def params_for(kind, runners, sessions):
+    if kind == "session":
+        return {"session_id": f"bench-s{random.randint(1, sessions)}"}
+    runner = random.randint(1, runners)
+    if kind == "runner":
+        return {"runner_id": f"bench-r{runner}"}
+    return {"email": f"runner{runner}@bench.local"}
+
+
+def time_queries(conn, iterations, runners, sessions):
+    results = {}
+    for name, (sql, kind) in QUERIES.items():
+        statement = text(sql)
+        samples = []
+        for _ in range(iterations):
+            params = params_for(kind, runners, sessions)
+            started = time.perf_counter()
+            conn.execute(statement, params).fetchall()
+            samples.append((time.perf_counter() - started) * 1000.0)
+        samples.sort()
+        results[name] = (
+            statistics.median(samples),
+            samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot read queries before/after indexes")
+    parser.add_argument("--runners", type=int, default=1000)
+    parser.add_argument("--sessions-per-runner", type=int, default=5)
+    parser.add_argument("--measures", type=int, default=2_000_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse previously seeded rows")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Error: this benchmark needs PostgreSQL (DATABASE_URL)", file=sys.stderr)
+        return 1
+
+    sessions = args.runners * args.sessions_per_runner
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        set_indexes(conn, enabled=False)
+        if not args.skip_seed:
+            seed(conn, args.runners, args.sessions_per_runner, args.measures)
+
+    report = {}
+    for phase, enabled in (("before", False), ("after", True)):
+        with engine.begin() as conn:
+            set_indexes(conn, enabled=enabled)
+            report[phase] = time_queries(conn, args.iterations, args.runners, sessions)
+
+    print(f"{'query':<18} {'p50 before':>11} {'p99 before':>11} {'p50 after':>10} {'p99 after':>10}")
+    for name in QUERIES:
+        before_p50, before_p99 = report["before"][name]
+        after_p50, after_p99 = report["after"][name]
+        print(
+            f"{name:<18} {before_p50:>9.2f}ms {before_p99:>9.2f}ms "
+            f"{after_p50:>8.2f}ms {after_p99:>8.2f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compare insert throughput and primary key index size of measure ids:
+random uuid4 strings (the original schema) against UUIDv7 stored as uuid.
+
+Needs a PostgreSQL database reachable through DATABASE_URL. Works on scratch
+tables that are dropped afterwards.
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, Uuid, insert, text
+
+from Couches.Backend.db import engine, uuid7
+
+VARIANTS = {
+    "uuid4_text": (String, lambda: str(uuid.uuid4())),
+    "uuid7_native": (Uuid, uuid7),
+}
+
+
+def scratch_table(metadata, name, id_type):
+    return Table(
+        f"bench_measures_{name}",
+        metadata,
+        Column("id", id_type, primary_key=True),
+        Column("session_id", String, nullable=False),
+        Column("ts", DateTime, nullable=False),
+        Column("lat", Float, nullable=False),
+        Column("lon", Float, nullable=False),
+        Column("distance_m", Float, nullable=False),
+    )
+
+
+def run_variant(table, make_id, rows, batch):
+    started = time.perf_counter()
+    for offset in range(0, rows, batch):
+        now = datetime.utcnow()
+        payload = [
+            {
+                "id": make_id(),
+                "session_id": "bench-session",
+                "ts": now,
+                "lat": 48.85,
+                "lon": 2.35,
+                "distance_m": float(offset + i),
+            }
+            for i in range(min(batch, rows - offset))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(table), payload)
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        index_bytes = conn.execute(
+            text("SELECT pg_relation_size(:name)"), {"name": f"{table.name}_pkey"}
+        ).scalar()
+    return rows / elapsed, index_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark measure primary key layouts")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Error: this benchmark needs PostgreSQL (DATABASE_URL)", file=sys.stderr)
+        return 1
+
+    metadata = MetaData()
+    tables = {name: scratch_table(metadata, name, id_type) for name, (id_type, _) in VARIANTS.items()}
+    metadata.drop_all(bind=engine)
+    metadata.create_all(bind=engine)
+    try:
+        print(f"{'variant':<14} {'rows/s':>10} {'pkey size':>12}")
+        for name, (_, make_id) in VARIANTS.items():
+            rate, index_bytes = run_variant(tables[name], make_id, args.rows, args.batch)
+            print(f"{name:<14} {rate:>10.0f} {index_bytes / 1024 / 1024:>9.1f} MB")
+    finally:
+        metadata.drop_all(bind=engine)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Collect throughput as the number of runners grows.
+
+Starts an in-process CoAP routeur on 127.0.0.1:5683 that answers /collect
+after a simulated mesh latency (one runner's mesh is made slow), then drives
+the backend's coalesced_collect() for every runner's device set in a loop.
+Compares one routeur request at a time (the old single-tenant behaviour)
+against the bounded concurrent fan-out.
+
+No database is needed; nothing is persisted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("COAP_ROUTEUR_HOST", "127.0.0.1")
+
+import aiocoap
+import aiocoap.resource as resource
+
+import Couches.Backend.app as backend
+
+
+class FakeRouteur(resource.Resource):
+    def __init__(self, latency_s, slow_gps, slow_latency_s):
+        super().__init__()
+        self.latency_s = latency_s
+        self.slow_gps = slow_gps
+        self.slow_latency_s = slow_latency_s
+
+    async def render_post(self, request):
+        data = json.loads(request.payload.decode("utf-8"))
+        devices = data.get("devices") or {}
+        slow = devices.get("gps") == self.slow_gps
+        await asyncio.sleep(self.slow_latency_s if slow else self.latency_s)
+        payload = {
+            "gps": {"latitude": 48.85, "longitude": 2.35},
+            "temperature": 20.0,
+            "humidite": 50.0,
+            "pression": 1013.0,
+            "batterie": 90.0,
+        }
+        return aiocoap.Message(payload=json.dumps(payload).encode("utf-8"))
+
+
+def runner_devices(count):
+    return [
+        {"gps": f"fd00::{i:x}:1", "batterie": f"fd00::{i:x}:2", "temperature": f"fd00::{i:x}:3"}
+        for i in range(1, count + 1)
+    ]
+
+
+async def drive(runners, duration_s, concurrency):
+    # Every iteration must reach the routeur; do not reuse fresh results.
+    backend.COLLECT_COALESCE_S = 0.0
+    backend.app.state.collect_flights = {}
+    backend.app.state.collect_slots = asyncio.Semaphore(concurrency)
+    latencies = {i: [] for i in range(len(runners))}
+    deadline = time.perf_counter() + duration_s
+
+    async def runner_loop(index, devices):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await backend.coalesced_collect(devices)
+            latencies[index].append(time.perf_counter() - started)
+
+    await asyncio.gather(*(runner_loop(i, devices) for i, devices in enumerate(runners)))
+    total = sum(len(values) for values in latencies.values())
+    # Runner 0 has the slow mesh; the others show whether it holds them back.
+    others = [value for i, values in latencies.items() if i != 0 for value in values]
+    p50_ms = statistics.median(others) * 1000.0 if others else float("nan")
+    return total / duration_s, p50_ms
+
+
+async def main_async(args):
+    runners_all = runner_devices(max(args.runners))
+    root = resource.Site()
+    root.add_resource(
+        ["collect"],
+        FakeRouteur(args.latency_ms / 1000.0, runners_all[0]["gps"], args.slow_latency_ms / 1000.0),
+    )
+    server = await aiocoap.Context.create_server_context(root, bind=("127.0.0.1", 5683))
+    try:
+        print(f"{'runners':>8} {'mode':>12} {'collects/s':>12} {'p50 others ms':>14}")
+        for count in args.runners:
+            runners = runners_all[:count]
+            for label, concurrency in (("sequential", 1), ("fan-out", args.concurrency)):
+                rate, p50_ms = await drive(runners, args.duration, concurrency)
+                print(f"{count:>8} {label:>12} {rate:>12.1f} {p50_ms:>14.1f}")
+    finally:
+        protocol = getattr(backend.app.state, "coap_client", None)
+        if protocol is not None:
+            await protocol.shutdown()
+        await server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-runner collect fan-out")
+    parser.add_argument("--runners", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--slow-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--concurrency", type=int, default=backend.COLLECT_MAX_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
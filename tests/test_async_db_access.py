@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from starlette.concurrency import run_in_threadpool
+
+import Couches.Backend.app as backend
+from Couches.Backend.cache import TTLCache
+from Couches.Backend.db import run_db
+
+DB_DELAY_S = 0.2
+
+
+class SlowDb:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get(self, model, key):
+        time.sleep(DB_DELAY_S)
+        return SimpleNamespace(id=key, started_at=datetime(2026, 1, 1))
+
+    def query(self, model):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def first(self):
+        return None
+
+
+def test_latest_reads_do_not_queue_behind_collects(monkeypatch):
+    raw = {
+        "gps": {"latitude": 48.8566, "longitude": 2.3522},
+        "temperature": 20.0,
+        "humidite": 50.0,
+        "pression": 1013.0,
+        "batterie": 80.0,
+    }
+
+    async def fake_collect(devices=None, session_id=None):
+        return raw
+
+    async def fake_persist(session_id, payload):
+        await run_db(time.sleep, DB_DELAY_S)
+
+    monkeypatch.setattr(backend, "SessionLocal", SlowDb)
+    monkeypatch.setattr(backend, "coalesced_collect", fake_collect)
+    monkeypatch.setattr(backend, "_persist_measure", fake_persist)
+    monkeypatch.setattr(backend, "read_cache", TTLCache())
+    monkeypatch.setattr(
+        backend.app.state,
+        "session_runtime",
+        {f"s{i}": {"last_point": None, "total_distance_m": 0.0} for i in range(8)},
+        raising=False,
+    )
+
+    async def read_latest():
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        # Served like the sync route: on the request threadpool, not on the
+        # executor the collects' DB work is queued on.
+        payload = await run_in_threadpool(backend.get_session_latest, "s0")
+        return payload, time.perf_counter() - started
+
+    async def run():
+        started = time.perf_counter()
+        collects = [backend.collect_session_sample(f"s{i}") for i in range(8)]
+        results = await asyncio.gather(read_latest(), *collects)
+        return results[0], time.perf_counter() - started
+
+    (payload, latest_s), collects_s = asyncio.run(run())
+
+    assert payload["session_id"] == "s0" and payload["ts"] is None
+    # Eight collects hold the DB executor for four rounds of slow calls; the
+    # read only pays for its own query.
+    assert collects_s >= 4 * DB_DELAY_S
+    assert latest_s < 2 * DB_DELAY_S
@@ -1,9 +1,9 @@
-from Couches.Backend.app import _hash_password, _verify_password
+from Couches.Backend.passwords import hash_password, verify_password
 
 
 def test_password_hash_and_verify():
     password = "very-secure-password"
-    encoded = _hash_password(password)
+    encoded = hash_password(password)
     assert encoded.startswith("pbkdf2_sha256$")
-    assert _verify_password(password, encoded)
-    assert not _verify_password("wrong-password", encoded)
+    assert verify_password(password, encoded)
+    assert not verify_password("wrong-password", encoded)
@@ -0,0 +1,174 @@
+import asyncio
+from types import SimpleNamespace
+
+import Couches.Backend.app as backend
+
+
+def test_concurrent_collects_share_one_routeur_call(monkeypatch):
+    calls = []
+
+    async def fake_collect(devices=None, session_id=None):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"gps": {"latitude": 1.0, "longitude": 2.0}}
+
+    monkeypatch.setattr(backend, "coap_collect", fake_collect)
+    monkeypatch.setattr(backend.app.state, "collect_flights", {}, raising=False)
+    for key in backend.collect_stats:
+        monkeypatch.setitem(backend.collect_stats, key, 0)
+
+    async def run():
+        return await asyncio.gather(*(backend.coalesced_collect() for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+    assert backend.collect_stats["routeur_calls"] == 1
+    assert backend.collect_stats["coalesced"] == 4
+
+
+def test_runners_are_collected_independently(monkeypatch):
+    fast = {"gps": "fd00::1", "batterie": "fd00::2", "temperature": "fd00::3"}
+    slow = {"gps": "fd00::11", "batterie": "fd00::12", "temperature": "fd00::13"}
+    calls = []
+
+    async def fake_collect(devices=None, session_id=None):
+        calls.append(devices["gps"])
+        await asyncio.sleep(0.3 if devices is slow else 0.01)
+        return {"gps": devices["gps"]}
+
+    monkeypatch.setattr(backend, "coap_collect", fake_collect)
+    monkeypatch.setattr(backend.app.state, "collect_flights", {}, raising=False)
+
+    async def timed(devices):
+        started = asyncio.get_running_loop().time()
+        result = await backend.coalesced_collect(devices)
+        return result, asyncio.get_running_loop().time() - started
+
+    async def run():
+        return await asyncio.gather(timed(slow), timed(fast), timed(dict(fast)))
+
+    (slow_result, _), (fast_result, fast_s), (shared_result, _) = asyncio.run(run())
+
+    assert sorted(calls) == ["fd00::1", "fd00::11"]
+    assert (slow_result, fast_result, shared_result) == ({"gps": "fd00::11"}, {"gps": "fd00::1"}, {"gps": "fd00::1"})
+    assert fast_s < 0.2
+
+
+def test_same_session_collects_store_one_row(monkeypatch):
+    stored = []
+
+    async def fake_sample(session_id):
+        await asyncio.sleep(0.05)
+        stored.append(session_id)
+        return {"session_id": session_id, "n": len(stored)}
+
+    monkeypatch.setattr(backend, "_collect_session_sample", fake_sample)
+    monkeypatch.setattr(backend.app.state, "session_flights", {}, raising=False)
+    monkeypatch.setattr(backend, "COLLECT_COALESCE_S", 60.0)
+    for key in backend.collect_stats:
+        monkeypatch.setitem(backend.collect_stats, key, 0)
+
+    async def run():
+        # A schedule tick and a "collect now" at once, then one right after.
+        joined = await asyncio.gather(*(backend.collect_session_sample("s1") for _ in range(2)))
+        again = await backend.collect_session_sample("s1")
+        other = await backend.collect_session_sample("s2")
+        return joined, again, other
+
+    joined, again, other = asyncio.run(run())
+
+    assert stored == ["s1", "s2"]
+    assert joined == [{"session_id": "s1", "n": 1}] * 2 and again == joined[0]
+    assert other == {"session_id": "s2", "n": 2}
+    assert backend.collect_stats["session_coalesced"] == 2
+
+
+def test_flight_freshness_counts_from_completion(monkeypatch):
+    calls = []
+
+    async def slow_collect(devices=None, session_id=None):
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"gps": {}}
+
+    monkeypatch.setattr(backend, "coap_collect", slow_collect)
+    monkeypatch.setattr(backend.app.state, "collect_flights", {}, raising=False)
+    monkeypatch.setattr(backend, "COLLECT_COALESCE_S", 0.15)
+
+    async def run():
+        await backend.coalesced_collect()
+        # Started 0.2 s ago but finished just now: still fresh.
+        await backend.coalesced_collect()
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_landed_flights_are_dropped_after_the_coalescing_window(monkeypatch):
+    async def fake_collect(devices=None, session_id=None):
+        if devices is not None:
+            raise RuntimeError("runner unreachable")
+        return {"gps": {}}
+
+    flights = {}
+    monkeypatch.setattr(backend, "coap_collect", fake_collect)
+    monkeypatch.setattr(backend.app.state, "collect_flights", flights, raising=False)
+    monkeypatch.setattr(backend, "COLLECT_COALESCE_S", 0.1)
+
+    async def run():
+        await backend.coalesced_collect()
+        try:
+            await backend.coalesced_collect({"gps": "fd00::1", "batterie": "fd00::2", "temperature": "fd00::3"})
+        except RuntimeError:
+            pass
+        await asyncio.sleep(0)
+        # The failed flight can't be joined: it goes right away.
+        during = len(flights)
+        await asyncio.sleep(0.15)
+        return during
+
+    during = asyncio.run(run())
+    assert during == 1
+    assert flights == {}
+
+
+def test_concurrent_collects_use_their_own_confirmable_client(monkeypatch):
+    created, requests = [], []
+
+    class FakeContext:
+        def __init__(self):
+            created.append(self)
+
+        def request(self, message):
+            requests.append((self, message))
+
+            async def answer():
+                await asyncio.sleep(0.05)
+                return SimpleNamespace(payload=b'{"gps": {}}')
+
+            return SimpleNamespace(response=answer())
+
+    async def create_client_context():
+        return FakeContext()
+
+    monkeypatch.setattr(backend.aiocoap.Context, "create_client_context", create_client_context)
+    monkeypatch.setattr(backend.app.state, "coap_clients", [], raising=False)
+    monkeypatch.setattr(backend.app.state, "collect_slots", None, raising=False)
+    monkeypatch.setattr(backend, "COAP_ROUTEUR_HOST", "127.0.0.1")
+    first = {"gps": "fd00::1", "batterie": "fd00::2", "temperature": "fd00::3"}
+    second = {"gps": "fd00::11", "batterie": "fd00::12", "temperature": "fd00::13"}
+
+    async def run():
+        await asyncio.gather(backend.coap_collect(first), backend.coap_collect(second))
+        await backend.coap_collect(first)
+
+    asyncio.run(run())
+
+    # Two runners at once get two contexts; later collects reuse them.
+    assert len(created) == 2
+    assert len({id(context) for context, _ in requests[:2]}) == 2
+    assert requests[2][0] in created
+    # Confirmable, so CoAP retransmits a lost datagram.
+    assert all(message.mtype != backend.aiocoap.NON for _, message in requests)
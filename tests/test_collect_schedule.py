@@ -0,0 +1,115 @@
+import asyncio
+
+import Couches.Backend.app as backend
+
+
+def test_schedule_samples_until_stopped(monkeypatch):
+    samples = []
+
+    async def fake_sample(session_id):
+        samples.append(session_id)
+        return {}
+
+    monkeypatch.setattr(backend, "collect_session_sample", fake_sample)
+    monkeypatch.setattr(backend, "SCHEDULE_MIN_INTERVAL_S", 0.0)
+    monkeypatch.setattr(backend, "collect_schedules", {})
+
+    async def run():
+        backend.start_schedule("s1", interval_s=0.01)
+        # A second start only updates the cadence of the running schedule.
+        backend.start_schedule("s1", interval_s=0.01)
+        await asyncio.sleep(0.1)
+        status = backend._schedule_status("s1")
+        stopped = await backend.stop_schedule("s1")
+        return status, stopped
+
+    status, stopped = asyncio.run(run())
+
+    assert stopped
+    assert status["running"]
+    assert status["samples"] == len(samples) >= 3
+    assert set(samples) == {"s1"}
+    assert backend._schedule_status("s1") == {"session_id": "s1", "running": False}
+
+
+def test_unwatched_schedule_stops_itself_when_opted_in(monkeypatch):
+    async def fake_sample(session_id):
+        return {}
+
+    monkeypatch.setattr(backend, "collect_session_sample", fake_sample)
+    monkeypatch.setattr(backend, "SCHEDULE_MIN_INTERVAL_S", 0.0)
+    monkeypatch.setattr(backend, "SCHEDULE_IDLE_S", 0.1)
+    monkeypatch.setattr(backend, "collect_schedules", {})
+
+    async def run():
+        backend.start_schedule("watched", interval_s=0.01)
+        unwatched = backend.start_schedule("unwatched", interval_s=0.01)
+        for _ in range(10):
+            await asyncio.sleep(0.03)
+            backend.touch_schedule("watched")
+        running = sorted(backend.collect_schedules)
+        await backend.stop_schedule("watched")
+        return running, unwatched["task"]
+
+    running, unwatched_task = asyncio.run(run())
+
+    assert running == ["watched"]
+    assert unwatched_task.done() and not unwatched_task.cancelled()
+
+
+def test_new_session_stops_the_runners_previous_schedules(monkeypatch):
+    async def fake_sample(session_id):
+        return {}
+
+    monkeypatch.setattr(backend, "collect_session_sample", fake_sample)
+    monkeypatch.setattr(backend, "SCHEDULE_MIN_INTERVAL_S", 0.0)
+    monkeypatch.setattr(backend, "collect_schedules", {})
+
+    async def run():
+        old = backend.start_schedule("old", interval_s=0.01, runner_id="r1")
+        backend.start_schedule("new", interval_s=0.01, runner_id="r1")
+        backend.start_schedule("other", interval_s=0.01, runner_id="r2")
+        stopped = backend.stop_runner_schedules("r1", keep="new")
+        await asyncio.sleep(0)
+        running = sorted(backend.collect_schedules)
+        for session_id in running:
+            await backend.stop_schedule(session_id)
+        return stopped, running, old["task"]
+
+    stopped, running, old_task = asyncio.run(run())
+
+    assert stopped == ["old"]
+    assert running == ["new", "other"]
+    assert old_task.cancelled()
+
+
+def test_session_schedule_runs_without_viewers(monkeypatch):
+    samples = []
+
+    async def fake_sample(session_id):
+        samples.append(session_id)
+        return {}
+
+    monkeypatch.setattr(backend, "collect_session_sample", fake_sample)
+    monkeypatch.setattr(backend, "SCHEDULE_MIN_INTERVAL_S", 0.0)
+    monkeypatch.setattr(backend, "collect_schedules", {})
+
+    async def run():
+        # Nobody polls or streams: logging in is enough to keep recording.
+        backend.start_runner_schedule("r1", "old")
+        backend.start_schedule("old", interval_s=0.02, runner_id="r1")
+        backend.start_runner_schedule("r1", "old")
+        kept_interval = backend.collect_schedules["old"]["interval_s"]
+        await asyncio.sleep(0.05)
+        backend.start_runner_schedule("r1", "new")
+        await asyncio.sleep(0.05)
+        running = sorted(backend.collect_schedules)
+        for session_id in running:
+            await backend.stop_schedule(session_id)
+        return kept_interval, running
+
+    kept_interval, running = asyncio.run(run())
+
+    assert kept_interval == 0.02
+    assert running == ["new"]
+    assert "old" in samples and "new" in samples
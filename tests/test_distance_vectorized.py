@@ -0,0 +1,75 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import Couches.Backend.distance as distance
+from Couches.Backend.app import haversine_m
+from Couches.Backend.db import Base, Measure, Runner, Session, uuid7
+
+
+def _random_walk(count, seed=7):
+    rng = random.Random(seed)
+    lat, lon = 48.8566, 2.3522
+    points = []
+    for _ in range(count):
+        lat += rng.uniform(-0.001, 0.001)
+        lon += rng.uniform(-0.001, 0.001)
+        points.append((lat, lon))
+    return points
+
+
+def test_vectorized_haversine_matches_scalar():
+    points = _random_walk(500)
+    lats = np.array([p[0] for p in points])
+    lons = np.array([p[1] for p in points])
+
+    vectorized = distance.haversine_m_array(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    scalar = [haversine_m(*points[i], *points[i + 1]) for i in range(len(points) - 1)]
+
+    assert np.allclose(vectorized, scalar, rtol=0, atol=1e-6)
+
+
+def test_cumulative_distance_matches_collect_bookkeeping():
+    points = _random_walk(200)
+    total = 0.0
+    expected = [0.0]
+    for prev, cur in zip(points, points[1:]):
+        total += haversine_m(*prev, *cur)
+        expected.append(round(total, 2))
+
+    result = distance.cumulative_distance_m([p[0] for p in points], [p[1] for p in points])
+
+    assert np.allclose(result, expected, rtol=0, atol=0.011)
+
+
+def test_recompute_session_rewrites_distances(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(distance, "_worker_engine", engine)
+    points = _random_walk(30)
+    started = datetime(2026, 1, 1)
+    with sessionmaker(bind=engine)() as db:
+        db.add(Runner(id="r1", name="r", email="r@x"))
+        db.add(Session(id="s1", runner_id="r1", started_at=started, total_distance_m=-1.0))
+        for i, (lat, lon) in enumerate(points):
+            db.add(
+                Measure(
+                    id=uuid7(), session_id="s1", ts=started + timedelta(seconds=i),
+                    lat=lat, lon=lon, temperature=20.0, humidite=50.0, pression=1013.0,
+                    batterie=100.0, distance_m=0.0,
+                )
+            )
+        db.commit()
+
+    results = distance.backfill_distances(["s1"], workers=1)
+
+    expected = distance.cumulative_distance_m([p[0] for p in points], [p[1] for p in points])
+    with sessionmaker(bind=engine)() as db:
+        stored = [m.distance_m for m in db.query(Measure).order_by(Measure.ts)]
+        total = db.get(Session, "s1").total_distance_m
+    assert results == [("s1", 30, float(expected[-1]))]
+    assert np.allclose(stored, expected)
+    assert total == float(expected[-1])
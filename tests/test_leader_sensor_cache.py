@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from Couches.CoAPServices.leader_server import SensorReadings
+
+
+def test_concurrent_collects_share_one_fetch_and_reuse_fresh_readings():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"lat": 48.85, "lon": 2.35}
+
+    async def scenario():
+        readings = SensorReadings(fresh_s=60.0)
+        results = await asyncio.gather(*(readings.get((None, "gps"), fetch) for _ in range(10)))
+        again = await readings.get((None, "gps"), fetch)
+        return readings, results, again
+
+    readings, results, again = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(result == {"lat": 48.85, "lon": 2.35} for result in results)
+    assert again == results[0]
+    assert readings.stats == {"hits": 1, "shared": 9, "fetches": 1, "errors": 0}
+
+
+def test_stale_readings_and_failures_are_fetched_again():
+    outcomes = [RuntimeError("timeout"), {"batterie": 80}, {"batterie": 79}]
+
+    async def fetch():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario():
+        readings = SensorReadings(fresh_s=0.0)
+        with pytest.raises(RuntimeError):
+            await readings.get(("fd00::2", "battery"), fetch)
+        first = await readings.get(("fd00::2", "battery"), fetch)
+        second = await readings.get(("fd00::2", "battery"), fetch)
+        return readings, first, second
+
+    readings, first, second = asyncio.run(scenario())
+
+    assert (first, second) == ({"batterie": 80}, {"batterie": 79})
+    assert readings.stats["errors"] == 1
+    assert readings.stats["fetches"] == 3
+
+
+def test_cancelled_collect_does_not_cancel_the_shared_fetch():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return {"temperature": 21.0}
+
+    async def scenario():
+        readings = SensorReadings(fresh_s=60.0)
+        first = asyncio.ensure_future(readings.get((None, "temperature"), fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(readings.get((None, "temperature"), fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == {"temperature": 21.0}
+
+
+def test_observed_readings_are_served_without_polling():
+    class Observations:
+        def __init__(self):
+            self.values = {}
+            self.ensured = []
+
+        def latest(self, key):
+            return self.values.get(key)
+
+        def ensure(self, key, uri):
+            self.ensured.append(key)
+
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"batterie": 80}
+
+    async def uri():
+        return "coap://[fd00::2]/battery"
+
+    async def scenario():
+        observations = Observations()
+        readings = SensorReadings(fresh_s=0.0, observations=observations)
+        polled = await readings.get(("fd00::2", "battery"), fetch, uri)
+        observations.values[("fd00::2", "battery")] = {"batterie": 79}
+        observed = [await readings.get(("fd00::2", "battery"), fetch, uri) for _ in range(3)]
+        return observations, polled, observed
+
+    observations, polled, observed = asyncio.run(scenario())
+
+    assert polled == {"batterie": 80}
+    assert observed == [{"batterie": 79}] * 3
+    assert len(calls) == 1
+    assert observations.ensured == [("fd00::2", "battery")]
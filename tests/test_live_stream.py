@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+from Couches.Backend.live import LiveHub, iter_sse
+
+
+def test_slow_viewer_keeps_newest_samples():
+    async def scenario():
+        hub = LiveHub(queue_max=2)
+        slow = hub.subscribe("s1")
+        other = hub.subscribe("s2")
+        for ts in range(5):
+            hub.publish("s1", {"ts": ts})
+
+        assert [slow.get_nowait()["ts"] for _ in range(slow.qsize())] == [3, 4]
+        assert other.empty()
+        stats = hub.snapshot()
+        assert (stats["published"], stats["dropped"], stats["viewers"]) == (5, 3, 2)
+
+        hub.unsubscribe("s1", slow)
+        hub.unsubscribe("s2", other)
+        assert hub.snapshot()["sessions"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_sse_stream_sends_initial_then_published_samples():
+    async def scenario():
+        hub = LiveHub()
+        stream = iter_sse(hub, "s1", initial={"ts": 0}, keepalive_s=0.01)
+        assert (await stream.__anext__()).startswith(b"retry:")
+        first = await stream.__anext__()
+        assert json.loads(first.decode()[len("data: "):]) == {"ts": 0}
+
+        assert (await stream.__anext__()).startswith(b"event: ping")
+        hub.publish("s1", {"ts": 1})
+        assert json.loads((await stream.__anext__()).decode()[len("data: "):]) == {"ts": 1}
+
+        await stream.aclose()
+        assert hub.snapshot()["viewers"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import Couches.Backend.app as backend
+import Couches.Backend.export as export
+from Couches.Backend.db import Base, Measure, Runner, Session, uuid7
+
+
+def _seed(tmp_path, count):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    started = datetime(2026, 1, 1)
+    with factory() as db:
+        db.add(Runner(id="r1", name="r", email="r@x"))
+        db.add(Session(id="s1", runner_id="r1", started_at=started))
+        for i in range(count):
+            db.add(
+                Measure(
+                    id=uuid7(),
+                    session_id="s1",
+                    # Pairs of rows share a timestamp to exercise the id tie-break.
+                    ts=started + timedelta(seconds=i // 2),
+                    lat=48.0,
+                    lon=2.0,
+                    temperature=20.0,
+                    humidite=50.0,
+                    pression=1013.0,
+                    batterie=100.0,
+                    distance_m=float(i),
+                )
+            )
+        db.commit()
+    return factory
+
+
+def test_keyset_pages_cover_every_row_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, "SessionLocal", _seed(tmp_path, 25))
+
+    distances = []
+    cursor = None
+    while True:
+        response = Response()
+        page = backend.get_measures("s1", response, limit=7, cursor=cursor)
+        distances.extend(item["distance_m"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert distances == [float(i) for i in range(25)]
+
+
+def test_ndjson_export_streams_all_rows(tmp_path, monkeypatch):
+    factory = _seed(tmp_path, 12)
+    monkeypatch.setattr(export, "SessionLocal", factory)
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 5)
+    with factory() as db:
+        run_session = db.get(Session, "s1")
+        db.expunge(run_session)
+
+    chunks = list(export.iter_ndjson(run_session))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode("utf-8").splitlines()]
+
+    assert len(chunks) == 3
+    assert [row["distance_m"] for row in rows] == [float(i) for i in range(12)]
+
+
+def test_columnar_export_round_trips(tmp_path, monkeypatch):
+    factory = _seed(tmp_path, 9)
+    monkeypatch.setattr(export, "SessionLocal", factory)
+    with factory() as db:
+        run_session = db.get(Session, "s1")
+        db.expunge(run_session)
+
+    payload = export.encode_columnar(export.read_columns(run_session))
+    columns = export.decode_columnar(payload)
+
+    assert payload[:4] == b"ZOLC"
+    assert list(columns) == export.MEASURE_FIELDS
+    assert list(columns["distance_m"]) == [float(i) for i in range(9)]
+    # 2026-01-01T00:00:00Z in microseconds, then one second per pair of rows.
+    assert columns["ts"][0] == 1767225600 * 1_000_000
+    assert columns["ts"][8] - columns["ts"][0] == 4 * 1_000_000
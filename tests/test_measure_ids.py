@@ -0,0 +1,16 @@
+import time
+
+from Couches.Backend.db import uuid7
+
+
+def test_uuid7_is_versioned_and_time_ordered():
+    ids = [uuid7() for _ in range(5000)]
+    assert all(value.version == 7 for value in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_uuid7_embeds_unix_milliseconds():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    assert value.int >> 80 >= before
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from Couches.Backend.db import Base, Measure, Runner, Session, SessionStats, uuid7
+from Couches.Backend.session_stats import stats_payload
+from Couches.Backend.measure_writer import MeasureWriter
+
+
+def _row(session_id, distance_m, **values):
+    row = {
+        "id": uuid7(),
+        "session_id": session_id,
+        "ts": datetime.utcnow(),
+        "lat": 48.85,
+        "lon": 2.35,
+        "temperature": 20.0,
+        "humidite": 50.0,
+        "pression": 1013.0,
+        "batterie": 90.0,
+        "distance_m": distance_m,
+    }
+    row.update(values)
+    return row
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'measures.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            Runner.__table__.insert(),
+            {"id": "r1", "name": "r", "email": "r@x", "created_at": datetime.utcnow()},
+        )
+        conn.execute(
+            Session.__table__.insert(),
+            [
+                {"id": "s1", "runner_id": "r1", "started_at": datetime.utcnow(), "total_distance_m": 0.0},
+                {"id": "s2", "runner_id": "r1", "started_at": datetime.utcnow(), "total_distance_m": 0.0},
+            ],
+        )
+    return engine
+
+
+def test_writer_batches_rows_and_flushes_on_stop(tmp_path):
+    engine = _engine(tmp_path)
+    writer = MeasureWriter(engine, batch_size=4, flush_interval_s=60.0, max_queue=100)
+
+    async def run():
+        writer.start()
+        for i in range(5):
+            await writer.put(_row("s1", float(i * 10)))
+        await writer.put(_row("s2", 7.0))
+        await writer.stop()
+
+    asyncio.run(run())
+
+    stats = writer.snapshot()
+    assert stats["written"] == 6
+    assert stats["flushes"] == 2
+    assert stats["queue_depth"] == 0
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Measure.__table__)).scalar() == 6
+        totals = dict(conn.execute(select(Session.__table__.c.id, Session.__table__.c.total_distance_m)).all())
+    assert totals == {"s1": 40.0, "s2": 7.0}
+
+
+def test_session_stats_are_merged_across_flushes(tmp_path):
+    engine = _engine(tmp_path)
+    start = datetime(2026, 5, 1, 8, 0, 0)
+    writer = MeasureWriter(engine, batch_size=2, flush_interval_s=60.0, max_queue=100)
+
+    samples = [(18.0, 95.0, 48.1), (22.0, 94.0, 48.3), (20.0, 91.0, 48.2)]
+
+    async def run():
+        writer.start()
+        for i, (temperature, batterie, lat) in enumerate(samples):
+            ts = start + timedelta(seconds=30 * i)
+            await writer.put(
+                _row("s1", float(i), ts=ts, temperature=temperature, batterie=batterie, lat=lat)
+            )
+        await writer.stop()
+
+    asyncio.run(run())
+
+    with sessionmaker(bind=engine)() as db:
+        stats = stats_payload(db.get(SessionStats, "s1"))
+    assert writer.snapshot()["flushes"] == 2
+    assert stats["sample_count"] == 3
+    assert stats["duration_s"] == 60.0
+    assert stats["battery_drop"] == 4.0
+    assert stats["temperature"] == {"min": 18.0, "max": 22.0, "avg": 20.0}
+    assert stats["bbox"]["min_lat"] == 48.1
+    assert stats["bbox"]["max_lat"] == 48.3
+
+
+def test_failing_batch_only_drops_the_rows_that_cannot_be_written(tmp_path, monkeypatch):
+    import Couches.Backend.measure_writer as measure_writer
+
+    monkeypatch.setattr(measure_writer, "MEASURE_FLUSH_RETRIES", 1)
+    engine = _engine(tmp_path)
+    writer = MeasureWriter(engine, batch_size=10, flush_interval_s=60.0, max_queue=100)
+    rows = [_row("s1", float(i)) for i in range(4)] + [_row("s2", 3.0)]
+    # Same (id, ts) key as an earlier row of the batch: this one cannot be written.
+    rows.insert(2, dict(_row("s2", 1.0), id=rows[0]["id"], ts=rows[0]["ts"]))
+
+    async def run():
+        writer.start()
+        for row in rows:
+            await writer.put(row)
+        await writer.stop()
+
+    asyncio.run(run())
+
+    stats = writer.snapshot()
+    assert (stats["written"], stats["dropped"]) == (5, 1)
+    assert stats["split_flushes"] > 0
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Measure.__table__)).scalar() == 5
+        totals = dict(conn.execute(select(Session.__table__.c.id, Session.__table__.c.total_distance_m)).all())
+    assert totals == {"s1": 3.0, "s2": 3.0}
+
+
+def test_put_before_start_fails_clearly(tmp_path):
+    writer = MeasureWriter(_engine(tmp_path))
+
+    with pytest.raises(RuntimeError, match="before start"):
+        asyncio.run(writer.put(_row("s1", 0.0)))
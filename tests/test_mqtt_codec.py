@@ -0,0 +1,44 @@
+import json
+
+from Couches.Couche3.Codec import (
+    CBOR_MAGIC,
+    SAMPLE_SCHEMA_VERSION,
+    cbor_dumps,
+    cbor_loads,
+    decode_sample,
+    encode_sample,
+)
+
+SAMPLE = {
+    "gps": {"latitude": 48.8566, "longitude": 2.3522},
+    "temperature": 21.5,
+    "humidite": 40.0,
+    "pression": 1013.2,
+    "batterie": 87.0,
+    "distance_m": 1234.56,
+    "session_id": "5f0c2a8e-2a0b-4a57-9d7c-0a1e0d3f8c11",
+    "ts": 1760000000.123,
+}
+
+
+def test_cbor_round_trip():
+    value = {"a": [1, -1, 300, -70000, 2 ** 40, 1.5, None, True, False], "b": "été", "c": b"\x00\x01"}
+    assert cbor_loads(cbor_dumps(value)) == value
+    # Canonical encodings from RFC 8949 appendix A.
+    assert cbor_dumps(1000000) == bytes.fromhex("1a000f4240")
+    assert cbor_dumps(-100) == bytes.fromhex("3863")
+    assert cbor_loads(bytes.fromhex("f93e00")) == 1.5
+
+
+def test_sample_round_trip_and_size():
+    encoded = encode_sample(SAMPLE)
+    assert encoded.startswith(CBOR_MAGIC)
+    assert len(encoded) < len(json.dumps(SAMPLE)) / 2
+    assert decode_sample(encoded, SAMPLE["session_id"]) == SAMPLE
+
+
+def test_decode_accepts_json_and_rejects_unknown_schema():
+    assert decode_sample(encode_sample(SAMPLE, "json")) == SAMPLE
+    future = CBOR_MAGIC + cbor_dumps([SAMPLE_SCHEMA_VERSION + 1] + [0.0] * 8)
+    assert decode_sample(future) is None
+    assert decode_sample(b"not a sample") is None
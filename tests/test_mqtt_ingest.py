@@ -0,0 +1,148 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from Couches.Backend.ingest import MqttIngest
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    if data["value"] < 0:
+        raise ValueError("invalid")
+    return data["session_id"], data["value"]
+
+
+def test_samples_are_grouped_per_session_in_order():
+    handled = {}
+
+    async def handle(session_id, samples):
+        if session_id == "broken":
+            raise RuntimeError("boom")
+        handled.setdefault(session_id, []).extend(samples)
+
+    async def scenario():
+        ingest = MqttIngest(_decode, handle, batch_size=4)
+        ingest.start()
+
+        def paho_thread():
+            for value in range(10):
+                session_id = "s1" if value % 2 else "s2"
+                ingest.submit(json.dumps({"session_id": session_id, "value": value}).encode())
+            ingest.submit(json.dumps({"session_id": "s1", "value": -1}).encode())
+            ingest.submit(json.dumps({"session_id": "broken", "value": 1}).encode())
+
+        thread = threading.Thread(target=paho_thread)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.05)
+        await ingest.stop()
+        return ingest.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert handled == {"s1": [1, 3, 5, 7, 9], "s2": [0, 2, 4, 6, 8]}
+    assert (stats["received"], stats["invalid"], stats["handled"], stats["handler_errors"]) == (12, 1, 10, 1)
+    assert stats["batches"] >= 3
+
+
+def test_full_raw_queue_drops_instead_of_blocking():
+    async def handle(session_id, samples):
+        pass
+
+    async def scenario():
+        ingest = MqttIngest(_decode, handle, queue_max=2)
+        ingest.start()
+        for value in range(5):
+            ingest._enqueue(json.dumps({"session_id": "s1", "value": value}).encode())
+        await ingest.stop()
+        return ingest.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert (stats["received"], stats["dropped"], stats["handled"]) == (5, 3, 2)
+
+
+def test_unhashable_session_id_does_not_stop_the_decode_stage():
+    handled = []
+
+    async def handle(session_id, samples):
+        handled.extend(samples)
+
+    def decode(payload):
+        data = json.loads(payload)
+        return data["session_id"], data["value"]
+
+    async def scenario():
+        ingest = MqttIngest(decode, handle)
+        ingest.start()
+        ingest._enqueue(json.dumps({"session_id": [1], "value": 0}).encode())
+        await asyncio.sleep(0.01)
+        ingest._enqueue(json.dumps({"session_id": "s1", "value": 1}).encode())
+        await asyncio.wait_for(ingest.stop(), 1.0)
+        return ingest.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert handled == [1]
+    assert (stats["invalid"], stats["handled"]) == (1, 1)
+
+
+def test_backend_decoder_rejects_non_uuid_session_ids():
+    from Couches.Backend.app import _decode_mqtt_sample
+
+    sample = {
+        "gps": {"latitude": 48.85, "longitude": 2.35},
+        "temperature": 20.0,
+        "humidite": 50.0,
+        "pression": 1013.0,
+        "batterie": 90.0,
+    }
+    for session_id in ([1], 42, "not-a-uuid"):
+        with pytest.raises(ValueError):
+            _decode_mqtt_sample(json.dumps(dict(sample, session_id=session_id)).encode())
+
+    session_id = "0b8e6f52-6a0e-4d7e-9a53-1f2b3c4d5e6f"
+    decoded_id, values = _decode_mqtt_sample(json.dumps(dict(sample, session_id=session_id.upper())).encode())
+    assert decoded_id == session_id
+    assert values[0] == 48.85
+
+
+def test_routeur_echoes_of_backend_collects_are_skipped(monkeypatch):
+    from Couches.Backend.app import _decode_mqtt_sample, app
+
+    monkeypatch.setattr(app.state, "current_session_id", "0b8e6f52-6a0e-4d7e-9a53-1f2b3c4d5e6f", raising=False)
+    sample = {
+        "gps": {"latitude": 48.85, "longitude": 2.35},
+        "temperature": 20.0,
+        "humidite": 50.0,
+        "pression": 1013.0,
+        "batterie": 90.0,
+    }
+    echo = dict(sample, source="collect", targeted=False, session_id="1c9e6f52-6a0e-4d7e-9a53-1f2b3c4d5e6f")
+    targeted = dict(sample, source="collect", targeted=True)
+    assert _decode_mqtt_sample(json.dumps(echo).encode()) is None
+    assert _decode_mqtt_sample(json.dumps(targeted).encode()) is None
+
+    # Untagged telemetry is never filed under the runner who logged in last.
+    session_id, _ = _decode_mqtt_sample(json.dumps(sample).encode())
+    assert session_id is None
+
+
+def test_skipped_payloads_are_counted_apart_from_invalid_ones():
+    async def handle(session_id, samples):
+        pass
+
+    def decode(payload):
+        data = json.loads(payload)
+        return None if data.get("skip") else (data["session_id"], data["value"])
+
+    async def scenario():
+        ingest = MqttIngest(decode, handle)
+        ingest.start()
+        ingest._enqueue(json.dumps({"skip": True}).encode())
+        ingest._enqueue(json.dumps({"session_id": "s1", "value": 1}).encode())
+        ingest._enqueue(json.dumps({"session_id": None, "value": 2}).encode())
+        await ingest.stop()
+        return ingest.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert (stats["skipped"], stats["invalid"], stats["untagged"], stats["handled"]) == (1, 0, 1, 2)
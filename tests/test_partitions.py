@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from Couches.Backend.partitions import add_months, month_start, partition_name, partition_start
+
+
+def test_month_arithmetic_wraps_years():
+    assert month_start(datetime(2026, 12, 31, 23, 59)) == datetime(2026, 12, 1)
+    assert add_months(datetime(2026, 11, 1), 3) == datetime(2027, 2, 1)
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+
+
+def test_partition_names_round_trip():
+    start = datetime(2026, 3, 1)
+    assert partition_name(start) == "measures_p2026_03"
+    assert partition_start("measures_p2026_03") == start
+    assert partition_start("measures_default") is None
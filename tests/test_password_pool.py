@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+from Couches.Backend.passwords import (
+    KdfPool,
+    KdfSaturated,
+    hash_password,
+    needs_rehash,
+    verify_and_rehash,
+    verify_password,
+)
+
+
+def test_login_rehashes_when_iteration_count_changes():
+    encoded = hash_password("correct-horse", iterations=1000)
+    assert verify_and_rehash("correct-horse", encoded, iterations=1000) == (True, None)
+    assert verify_and_rehash("wrong-horse", encoded, iterations=2000) == (False, None)
+
+    valid, rehashed = verify_and_rehash("correct-horse", encoded, iterations=2000)
+    assert valid
+    assert rehashed.split("$")[1] == "2000"
+    assert verify_password("correct-horse", rehashed)
+    assert not needs_rehash(rehashed, iterations=2000)
+
+
+def test_pool_rejects_beyond_queue_limit():
+    async def scenario():
+        pool = KdfPool(workers=1, queue_max=0)
+        try:
+            busy = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+            await asyncio.sleep(0)
+            with pytest.raises(KdfSaturated):
+                await pool.run(hash_password, "x", 1000)
+            await busy
+
+            encoded = await pool.run(hash_password, "x", 1000)
+            assert verify_password("x", encoded)
+        finally:
+            pool.stop()
+        return pool.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert (stats["calls"], stats["rejected"], stats["pending"], stats["max_pending"]) == (2, 1, 0, 1)
+    assert stats["latency_ms_max"] >= 200
@@ -0,0 +1,63 @@
+import time
+
+from Couches.Backend.cache import TTLCache
+
+
+def test_lru_eviction_and_stats():
+    cache = TTLCache(max_entries=2, ttl_s=60)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    assert cache.get(("a",)) == 1
+    cache.set(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    stats = cache.snapshot()
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_entries=10, ttl_s=0.01)
+    cache.set(("latest", "s1"), {"ts": 1})
+    time.sleep(0.02)
+    assert cache.get(("latest", "s1")) is None
+    assert cache.snapshot()["expired"] == 1
+
+
+def test_add_keeps_value_written_through_meanwhile():
+    cache = TTLCache(max_entries=10, ttl_s=60)
+    cache.set(("latest", "s1"), {"ts": 2})
+    assert cache.add(("latest", "s1"), {"ts": 1}) == {"ts": 2}
+    cache.update(("latest", "s1"), lambda value: dict(value, distance_m=5.0))
+    assert cache.get(("latest", "s1")) == {"ts": 2, "distance_m": 5.0}
+
+
+def test_invalidate_prefix():
+    cache = TTLCache(max_entries=10, ttl_s=60)
+    cache.set(("runner_sessions", "r1", 100), [])
+    cache.set(("runner_sessions", "r1", 10), [])
+    cache.set(("runner_sessions", "r2", 100), [])
+    cache.invalidate_prefix(("runner_sessions", "r1"))
+    assert cache.get(("runner_sessions", "r2", 100)) == []
+    assert cache.snapshot()["entries"] == 1
+
+
+def test_add_checks_and_inserts_under_one_lock():
+    # A write-through set() must not slip in between add()'s check and insert.
+    cache = TTLCache(max_entries=4, ttl_s=60.0)
+    real_lock = cache.lock
+    acquired = []
+
+    class CountingLock:
+        def __enter__(self):
+            acquired.append(1)
+            return real_lock.__enter__()
+
+        def __exit__(self, *exc):
+            return real_lock.__exit__(*exc)
+
+    cache.lock = CountingLock()
+    assert cache.add("k", "loaded") == "loaded"
+    assert len(acquired) == 1
+    assert cache.get("k") == "loaded"
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import socket
+
+from Couches.CoAPServices.resolver import AddressFile, HostResolver
+
+
+def test_lookups_are_cached_shared_and_negatively_cached(monkeypatch):
+    calls = []
+    answers = {"coap-routeur": "172.18.0.5"}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        async def getaddrinfo(host, port, family=0, type=0):
+            calls.append(host)
+            await asyncio.sleep(0.01)
+            if host not in answers:
+                raise socket.gaierror("Name or service not known")
+            return [(socket.AF_INET, socket.SOCK_DGRAM, 17, "", (answers[host], 0))]
+
+        monkeypatch.setattr(loop, "getaddrinfo", getaddrinfo)
+        resolver = HostResolver(ttl_s=60.0, negative_ttl_s=60.0)
+        first = await asyncio.gather(*(resolver.resolve("coap-routeur") for _ in range(5)))
+        again = await resolver.resolve("coap-routeur")
+        missing = [await resolver.resolve("coap-missing") for _ in range(3)]
+        literal = await resolver.resolve("fd00::1")
+        return resolver, first, again, missing, literal
+
+    resolver, first, again, missing, literal = asyncio.run(scenario())
+
+    assert first == ["172.18.0.5"] * 5 and again == "172.18.0.5"
+    assert missing == ["coap-missing"] * 3
+    assert literal == "fd00::1"
+    assert calls == ["coap-routeur", "coap-missing"]
+    assert resolver.stats == {"hits": 3, "lookups": 2, "shared": 4, "failures": 1}
+
+
+def test_failed_refresh_keeps_the_last_good_address(monkeypatch):
+    answers = ["10.0.0.7", None]
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        async def getaddrinfo(host, port, family=0, type=0):
+            addr = answers.pop(0)
+            if addr is None:
+                raise socket.gaierror("temporary failure")
+            return [(socket.AF_INET, socket.SOCK_DGRAM, 17, "", (addr, 0))]
+
+        monkeypatch.setattr(loop, "getaddrinfo", getaddrinfo)
+        resolver = HostResolver(ttl_s=0.0, negative_ttl_s=60.0)
+        return [await resolver.resolve("coap-leader") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["10.0.0.7"] * 3
+
+
+def test_address_file_is_reread_only_when_it_changes(tmp_path):
+    path = tmp_path / "gps.addr"
+    watched = AddressFile(str(path), check_s=0.0)
+    assert watched.read() is None
+
+    path.write_text("fd00::1\n")
+    assert watched.read() == "fd00::1"
+    assert watched.read() == "fd00::1"
+    assert watched.reloads == 1
+
+    path.write_text("fd00::22\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert watched.read() == "fd00::22"
+    assert watched.reloads == 2
+
+    path.unlink()
+    assert watched.read() is None
+    assert AddressFile("").read() is None
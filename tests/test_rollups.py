@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from Couches.Backend.rollups import aggregate_rows, bucket_start, pick_resolution
+
+
+def _row(ts, temperature):
+    return {
+        "session_id": "s1",
+        "ts": ts,
+        "temperature": temperature,
+        "humidite": 50.0,
+        "pression": 1013.0,
+        "batterie": 90.0,
+        "distance_m": 0.0,
+    }
+
+
+def test_bucket_start_floors_to_resolution():
+    assert bucket_start(datetime(2026, 1, 1, 10, 7, 43), 60) == datetime(2026, 1, 1, 10, 7)
+    assert bucket_start(datetime(2026, 1, 1, 10, 7, 43), 900) == datetime(2026, 1, 1, 10, 0)
+
+
+def test_aggregate_tracks_min_max_sum_and_last():
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    rows = [_row(start + timedelta(seconds=s), t) for s, t in [(0, 20.0), (4, 24.0), (2, 18.0), (12, 21.0)]]
+    buckets = {
+        (b["resolution_s"], b["bucket_start"]): b for b in aggregate_rows(rows, resolutions=(10, 60))
+    }
+
+    first = buckets[(10, start)]
+    assert first["sample_count"] == 3
+    assert (first["temperature_min"], first["temperature_max"]) == (18.0, 24.0)
+    assert first["temperature_sum"] == 62.0
+    # "last" follows ts, not arrival order.
+    assert first["temperature_last"] == 24.0
+    assert buckets[(10, start + timedelta(seconds=10))]["sample_count"] == 1
+    assert buckets[(60, start)]["sample_count"] == 4
+
+
+def test_pick_resolution_prefers_coarsest_meeting_points():
+    resolutions = (10, 60, 900)
+    assert pick_resolution(4 * 3600, 10, resolutions) == 900
+    assert pick_resolution(4 * 3600, 200, resolutions) == 60
+    assert pick_resolution(4 * 3600, 1000, resolutions) == 10
+    assert pick_resolution(60, 1000, resolutions) == 10
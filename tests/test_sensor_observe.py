@@ -0,0 +1,100 @@
+import asyncio
+import socket
+import time
+
+import aiocoap
+import aiocoap.resource as resource
+
+from Couches.CoAPServices.observe import SensorObservations, SensorResource
+
+
+class FakeSensor(SensorResource):
+    deadbands = {"value": 1.0}
+
+    def __init__(self, steps, **kwargs):
+        super().__init__(**kwargs)
+        self.steps = list(steps)
+
+    def sample(self):
+        value = self.steps.pop(0) if len(self.steps) > 1 else self.steps[0]
+        return {"value": value}
+
+
+def _free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def test_deadband_ignores_small_moves():
+    sensor = FakeSensor([0.0])
+
+    assert not sensor.moved({"value": 0.0}, {"value": 0.9})
+    assert sensor.moved({"value": 0.0}, {"value": -1.5})
+    assert not sensor.moved({"value": None}, {"value": 5.0})
+
+
+def test_plain_gets_are_not_recorded_as_sent():
+    sensor = FakeSensor([1.0, 2.0])
+
+    async def scenario():
+        await sensor.render_get(aiocoap.Message(code=aiocoap.GET))
+        unsent = sensor.sent
+        await sensor.render_get(aiocoap.Message(code=aiocoap.GET, observe=0))
+        return unsent, sensor.sent
+
+    unsent, sent = asyncio.run(scenario())
+    assert unsent is None
+    assert sent["value"] == 2.0
+
+
+def test_notifications_older_than_max_age_are_not_served():
+    observations = SensorObservations(None, max_age_s=0.05)
+    observations.entries["value"] = {"value": {"value": 1.0}, "at": time.monotonic(), "used": 0.0}
+
+    assert observations.latest("value") == {"value": 1.0}
+    time.sleep(0.06)
+    assert observations.latest("value") is None
+
+
+def test_leader_serves_collects_from_open_observation():
+    port = _free_udp_port()
+    # Moves by less than the deadband at first, then jumps past it.
+    sensor = FakeSensor([0.0, 0.2, 0.4, 5.0], period_s=0.05, keepalive_s=60.0)
+
+    async def scenario():
+        root = resource.Site()
+        root.add_resource(["value"], sensor)
+        server = await aiocoap.Context.create_server_context(root, bind=("127.0.0.1", port))
+        client = await aiocoap.Context.create_client_context()
+        observations = SensorObservations(client, stale_s=5.0, idle_s=60.0, retry_s=0.1)
+
+        async def uri():
+            return f"coap://127.0.0.1:{port}/value"
+
+        try:
+            assert observations.latest("value") is None
+            observations.ensure("value", uri)
+            first = None
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                first = first or observations.latest("value")
+                latest = observations.latest("value")
+                if latest is not None and latest["value"] == 5.0:
+                    break
+            return first, latest, dict(observations.stats), dict(sensor.stats)
+        finally:
+            observations.stop()
+            await asyncio.sleep(0)
+            await client.shutdown()
+            await server.shutdown()
+
+    first, latest, stats, sensor_stats = asyncio.run(scenario())
+
+    assert first["value"] == 0.0 and first["key"] == "zolis-key"
+    assert latest["value"] == 5.0
+    # The initial response plus a single notification for the jump past the
+    # deadband; the small moves before it were not sent.
+    assert stats["notifications"] == 2
+    assert stats["restarts"] == 0
+    assert sensor_stats["notifications"] == 1
@@ -0,0 +1,20 @@
+from Couches.Backend.track import clip_to_bbox, encode_polyline, simplify_indices
+
+
+def test_encode_polyline_reference_example():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_simplify_drops_collinear_points_and_keeps_corners():
+    # Straight line north, then a right angle to the east.
+    points = [(48.0 + i * 0.0001, 2.0) for i in range(20)]
+    points += [(48.0019, 2.0 + i * 0.0001) for i in range(1, 20)]
+    kept = simplify_indices(points, tolerance_m=1.0)
+    assert kept == [0, 19, len(points) - 1]
+
+
+def test_clip_to_bbox_splits_runs_outside_viewport():
+    points = [(0.0, 0.0), (1.0, 1.0), (5.0, 5.0), (6.0, 6.0), (7.0, 7.0), (1.5, 1.5)]
+    runs = clip_to_bbox(points, (0.5, 0.5, 2.0, 2.0))
+    assert runs == [[(0.0, 0.0), (1.0, 1.0), (5.0, 5.0)], [(7.0, 7.0), (1.5, 1.5)]]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from Couches.CoAPServices.transport import TransportRacer
+
+CANDIDATES = [
+    ("thread", "coap://[fd00::1]/gps", 1.0),
+    ("ipv4", "coap://10.0.0.2/gps", 2.5),
+]
+
+
+def _attempts(delays, cancelled=None):
+    """attempt(uri, timeout_s) answering after delays[uri]; None means it fails."""
+
+    async def attempt(uri, timeout_s):
+        delay = delays[uri]
+        try:
+            if delay is None:
+                raise ConnectionError("no route")
+            await asyncio.sleep(delay)
+            return uri
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(uri)
+            raise
+
+    return attempt
+
+
+def test_slow_thread_is_raced_against_ipv4_and_the_loser_cancelled():
+    cancelled = []
+    attempt = _attempts({"coap://[fd00::1]/gps": 0.5, "coap://10.0.0.2/gps": 0.01}, cancelled)
+
+    async def scenario():
+        racer = TransportRacer(stagger_s=0.02)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await racer.race("gps", CANDIDATES, attempt)
+        elapsed = loop.time() - started
+        await asyncio.sleep(0)
+        return racer, result, elapsed
+
+    racer, result, elapsed = asyncio.run(scenario())
+
+    assert result == "coap://10.0.0.2/gps"
+    assert elapsed < 0.2
+    assert cancelled == ["coap://[fd00::1]/gps"]
+    assert racer.preferred["gps"] == "ipv4"
+    assert racer.ordered("gps", CANDIDATES)[0][0] == "ipv4"
+    assert racer.stats["raced"] == 1
+
+
+def test_failure_starts_the_next_path_without_waiting_for_the_stagger():
+    attempt = _attempts({"coap://[fd00::1]/gps": None, "coap://10.0.0.2/gps": 0.0})
+
+    async def scenario():
+        racer = TransportRacer(stagger_s=5.0)
+        return racer, await racer.race("gps", CANDIDATES, attempt)
+
+    racer, result = asyncio.run(asyncio.wait_for(scenario(), 1.0))
+
+    assert result == "coap://10.0.0.2/gps"
+    assert racer.stats["raced"] == 0
+
+
+def test_all_paths_failing_lists_every_error():
+    attempt = _attempts({"coap://[fd00::1]/gps": None, "coap://10.0.0.2/gps": None})
+
+    async def scenario():
+        await TransportRacer(stagger_s=0.01).race("gps", CANDIDATES, attempt)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        asyncio.run(scenario())
+
+    assert "coap://[fd00::1]/gps -> ConnectionError" in str(excinfo.value)
+    assert "coap://10.0.0.2/gps -> ConnectionError" in str(excinfo.value)
+
+
+def test_timeouts_follow_the_measured_rtt_and_back_off_on_failure():
+    racer = TransportRacer(min_timeout_s=0.001)
+    assert racer.timeout("leader", "thread", 1.0) == 1.0
+
+    for _ in range(20):
+        racer._observe("leader", "thread", 0.02)
+    learned = racer.timeout("leader", "thread", 1.0)
+    assert 0.02 <= learned < 0.03
+
+    racer._failed("leader", "thread")
+    assert racer.timeout("leader", "thread", 1.0) == pytest.approx(2 * learned)
+    for _ in range(10):
+        racer._failed("leader", "thread")
+    assert racer.timeout("leader", "thread", 1.0) == pytest.approx(16 * learned)
+
+    racer._observe("leader", "thread", 0.02)
+    assert racer.timeout("leader", "thread", 1.0) < 2 * learned
@@ -0,0 +1,88 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from Couches.WebUI.backend_client import BackendBusy, BackendPool, CoalescingGets
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        self.server.release.wait(5)
+        body = self.path.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.connections = server.requests = 0
+    server.release = threading.Event()
+    server.release.set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_reuses_keep_alive_connections(backend):
+    pool = BackendPool(f"http://127.0.0.1:{backend.server_address[1]}")
+    for i in range(5):
+        resp = pool.request("GET", f"/api/sessions/s{i}")
+        assert (resp.status, resp.body) == (200, f"/api/sessions/s{i}".encode())
+        assert resp.headers.get("content-type") == "text/plain"
+
+    assert backend.connections == 1
+    assert pool.snapshot()["reused"] == 4
+
+
+def test_pool_rejects_when_all_slots_are_busy(backend):
+    backend.release.clear()
+    pool = BackendPool(f"http://127.0.0.1:{backend.server_address[1]}", max_inflight=1, acquire_timeout_s=0.05)
+    holder = threading.Thread(target=pool.request, args=("GET", "/slow"))
+    holder.start()
+    while backend.requests == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(BackendBusy):
+        pool.request("GET", "/other")
+    backend.release.set()
+    holder.join()
+    assert pool.snapshot()["busy"] == 1
+
+
+def test_identical_gets_share_one_backend_call(backend):
+    backend.release.clear()
+    gets = CoalescingGets(BackendPool(f"http://127.0.0.1:{backend.server_address[1]}"), window_s=5)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gets.get("/api/sessions/s1/latest"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while backend.requests == 0:
+        time.sleep(0.001)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+
+    # A later caller inside the window is served the same response.
+    results.append(gets.get("/api/sessions/s1/latest"))
+    assert backend.requests == 1
+    assert {resp.body for resp in results} == {b"/api/sessions/s1/latest"}
+    assert gets.snapshot() == {"calls": 9, "coalesced": 8}
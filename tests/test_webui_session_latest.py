@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+from Couches.WebUI.session_latest import SessionLatestStore
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    def subscribe(self, topic):
+        self.calls.append(("subscribe", topic))
+
+    def unsubscribe(self, topic):
+        self.calls.append(("unsubscribe", topic))
+
+
+def _message(topic, payload):
+    return SimpleNamespace(topic=topic, payload=json.dumps(payload).encode("utf-8"))
+
+
+def test_subscribes_on_demand_and_serves_per_session_state():
+    store = SessionLatestStore(idle_s=60)
+    client = RecordingClient()
+    store.attach(client)
+
+    assert store.watch("s1") is None
+    assert store.watch("s1") is None
+    assert client.calls == [("subscribe", "/tracking/s1/latest")]
+
+    sample = {"gps": {"latitude": 1.0, "longitude": 2.0}, "ts": 10.0}
+    store.on_message(client, None, _message("/tracking/s1/latest", sample))
+    store.on_message(client, None, _message("/tracking/s2/latest", dict(sample, ts=11.0)))
+    store.on_message(client, None, _message("/tracking/s1/latest", dict(sample, ts=9.0)))
+
+    assert store.watch("s1") == sample
+    assert store.snapshot()["watched"] == 1
+
+    # A reconnect restores the subscriptions of watched sessions.
+    fresh = RecordingClient()
+    store.attach(fresh)
+    assert fresh.calls == [("subscribe", "/tracking/s1/latest")]
+
+
+def test_idle_sessions_are_unsubscribed():
+    store = SessionLatestStore(idle_s=0)
+    client = RecordingClient()
+    store.attach(client)
+    store.watch("s1")
+    store.seed("s1", {"gps": {}, "ts": 1.0})
+
+    assert store.expire_idle() == ["s1"]
+    assert client.calls[-1] == ("unsubscribe", "/tracking/s1/latest")
+    assert store.snapshot()["watched"] == 0